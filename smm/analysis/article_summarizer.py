@@ -1,14 +1,12 @@
-import sqlite3
 import pandas as pd
-from tqdm import tqdm
-import ollama
-import os
-
-# === Paths to the databases ===
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-GAZETA_DB = os.path.join(BASE_DIR, "data", "gazeta_articles.db")
-PODROBNO_DB = os.path.join(BASE_DIR, "data", "podrobno_articles.db")
-OUTPUT_DB = os.path.join(BASE_DIR, "data", "article_summaries.db")
+from llm.ollama_pool import run_parallel, CONCURRENCY
+from llm.llm_cache import cached_chat
+from analysis.comment_groups import index_groups, iter_with_comments
+from utils import perf
+from utils.db_utils import get_connection
+from analysis.map_reduce import (
+    map_reduce, chunk_text, chunk_comments, fits, CONTEXT_TOKENS, MAP_ARTICLE_PROMPT, MAP_COMMENTS_PROMPT,
+)
 
 # === Model and prompt template ===
 MODEL = "llama3.1:8b"  # or whatever your Ollama model is
@@ -25,11 +23,14 @@ SUMMARY_TEMPLATE = """
 """
 
 # === Load and normalize articles ===
-def load_articles_and_comments(db_path, article_table, comment_table):
-    conn = sqlite3.connect(db_path)
-    articles = pd.read_sql(f"SELECT * FROM {article_table}", conn)
-    comments = pd.read_sql(f"SELECT * FROM {comment_table}", conn)
-    conn.close()
+def load_articles_and_comments(conn, sources=("gazeta", "podrobno")):
+    placeholders = ", ".join("?" * len(sources))
+    articles = pd.read_sql(
+        f"SELECT * FROM articles WHERE source IN ({placeholders}) ORDER BY source, id", conn, params=sources
+    )
+    comments = pd.read_sql(
+        f"SELECT * FROM comments WHERE source IN ({placeholders}) ORDER BY id", conn, params=sources
+    )
 
     if "content" in articles.columns:
         articles = articles.rename(columns={"content": "text"})
@@ -38,82 +39,76 @@ def load_articles_and_comments(db_path, article_table, comment_table):
 
 # === Generate summary using Ollama ===
 def generate_summary(article, comments):
-    top_comments = "\n".join(comments[:5]) if comments else "Нет комментариев."
-    prompt = SUMMARY_TEMPLATE.format(article=article, comments=top_comments)
-
-    response = ollama.chat(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": prompt},
-        ]
-    )
-
-    return response["message"]["content"]
-
-# === Main summarization routine ===
-def summarize_articles():
-    print("Загружаем данные из обеих баз данных...")
-    gazeta_articles, gazeta_comments = load_articles_and_comments(GAZETA_DB, "articles", "comments")
-    podrobno_articles, podrobno_comments = load_articles_and_comments(PODROBNO_DB, "articles", "comments")
-
-    print("Подготовка базы данных итогов...")
+    comment_block = "\n".join(comments) if comments else "Нет комментариев."
+    prompt = SUMMARY_TEMPLATE.format(article=article, comments=comment_block)
 
-    # Standardize and combine
-    gazeta_articles["source"] = "gazeta"
-    podrobno_articles["source"] = "podrobno"
+    if not fits(prompt):
+        # Too long for one call: condense the article and the comment thread
+        # separately (map-reduce), then summarize the condensed versions
+        half = CONTEXT_TOKENS // 2
+        if not fits(article, half):
+            article = map_reduce(chunk_text(article), MAP_ARTICLE_PROMPT, MODEL, SYSTEM_PROMPT, half)
+        if not fits(comment_block, half):
+            comment_block = map_reduce(chunk_comments(comments), MAP_COMMENTS_PROMPT, MODEL, SYSTEM_PROMPT, half)
+        prompt = SUMMARY_TEMPLATE.format(article=article, comments=comment_block)
 
-    gazeta_comments["source"] = "gazeta"
-    podrobno_comments["source"] = "podrobno"
+    return cached_chat(MODEL, SYSTEM_PROMPT, prompt)
 
-    all_articles = pd.concat([gazeta_articles, podrobno_articles], ignore_index=True)
-    all_comments = pd.concat([gazeta_comments, podrobno_comments], ignore_index=True)
+# === Main summarization routine ===
+def summarize_articles(concurrency=CONCURRENCY):
+    print("Загружаем статьи и комментарии...")
+    conn = get_connection()
+    all_articles, all_comments = load_articles_and_comments(conn)
 
     # Drop articles with no text
     all_articles = all_articles[all_articles["text"].str.strip().astype(bool)]
 
-    # --- NEW: Filter out articles with no comments ---
-    article_ids_with_comments = set(all_comments['article_id'].unique())
-    all_articles = all_articles[all_articles['id'].isin(article_ids_with_comments)]
+    # Comments are grouped once by (source, article_id); every article then
+    # looks up its own rows instead of masking the whole comments frame
+    comment_index = index_groups(all_comments, ["source", "article_id"])
+
+    # --- Filter out articles with no comments ---
+    has_comments = [key in comment_index for key in zip(all_articles["source"], all_articles["id"])]
+    all_articles = all_articles[has_comments]
 
     print(f"Начинаем генерацию обзоров для {len(all_articles)} статей с комментариями...")
-    summaries = []
-
-    for _, article_row in tqdm(all_articles.iterrows(), total=len(all_articles), desc="Summarizing articles"):
-        article_id = article_row["id"]
-        source = article_row["source"]
-        title = article_row["title"]
-        article_text = article_row["text"]
-
-        # Filter comments for this article
-        article_comments = all_comments[
-            (all_comments["article_id"] == article_id) & (all_comments["source"] == source)
-        ]
-
-        comment_texts = article_comments["comment"].dropna().tolist()
-
-        try:
-            summary = generate_summary(article_text, comment_texts)
-        except Exception as e:
-            summary = f"[ERROR] {str(e)}"
-
-        summaries.append({
-            "source": source,
-            "article_id": article_id,
-            "title": title,
-            "summary": summary,
+    jobs = []
+    for article_row, article_comments in iter_with_comments(
+        all_articles, ["source", "id"], all_comments, ["source", "article_id"], indices=comment_index
+    ):
+        jobs.append({
+            "source": article_row["source"],
+            "article_id": article_row["id"],
+            "title": article_row["title"],
+            "text": article_row["text"],
+            "comments": article_comments["comment"].dropna().tolist(),
         })
 
-    # Save to DB
-    if os.path.exists(OUTPUT_DB):
-        print(f"🗑️ Deleting existing database: {OUTPUT_DB}")
-        os.remove(OUTPUT_DB)
-
-    print(f"Сохраняем в {OUTPUT_DB}...")
-    conn_out = sqlite3.connect(OUTPUT_DB)
-    pd.DataFrame(summaries).to_sql("summaries", conn_out, index=False)
-    conn_out.close()
-
+    # Replace the previous run's summaries
+    conn.execute("DELETE FROM article_summaries")
+    conn.commit()
+
+    # Rows are written as requests complete; the primary key keeps the
+    # table content independent of completion order
+    failed = 0
+    with perf.timed("summarize.articles", items=len(jobs)):
+        for _, job, summary in run_parallel(
+            lambda job: generate_summary(job["text"], job["comments"]),
+            jobs, concurrency=concurrency, desc="Summarizing articles",
+        ):
+            if isinstance(summary, Exception):
+                print(f"Ошибка при вызове Ollama для {job['source']}/{job['article_id']}: {summary}")
+                failed += 1
+                continue
+            conn.execute(
+                "INSERT OR REPLACE INTO article_summaries (source, article_id, title, summary) VALUES (?, ?, ?, ?)",
+                (job["source"], int(job["article_id"]), job["title"], summary),
+            )
+            conn.commit()
+
+    # The other summaries are saved, but the stage must not count as up to date
+    if failed:
+        raise RuntimeError(f"{failed} of {len(jobs)} articles could not be summarized")
     print("Обзоры статей успешно сохранены!")
 
 # === Entry point ===
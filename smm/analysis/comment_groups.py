@@ -0,0 +1,28 @@
+# comment_groups.py
+# One-pass grouping of comments by their parent article or post.
+
+
+def _group_by(keys):
+    # A single key groups on the column itself so lookups use plain values
+    return keys[0] if len(keys) == 1 else list(keys)
+
+
+# Map every key in `frame` to the positional indices of its rows. Built once
+# with a single groupby, so each later lookup is a dict access instead of a
+# boolean mask over the whole frame.
+def index_groups(frame, keys):
+    return frame.groupby(_group_by(keys), sort=False).indices
+
+
+# Yield (item, comments_frame) for every row of `items`, matching
+# items[item_keys] to frame[frame_keys]. Items without comments get an
+# empty frame. Pass `indices` from index_groups(frame, frame_keys) when the
+# caller already built it.
+def iter_with_comments(items, item_keys, frame, frame_keys, indices=None):
+    if indices is None:
+        indices = index_groups(frame, frame_keys)
+    empty = frame.iloc[:0]
+    for item in items.to_dict("records"):
+        key = item[item_keys[0]] if len(item_keys) == 1 else tuple(item[k] for k in item_keys)
+        rows = indices.get(key)
+        yield item, frame.iloc[rows] if rows is not None else empty
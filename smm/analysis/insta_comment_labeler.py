@@ -1,70 +1,127 @@
-import os
-import sqlite3
 import pandas as pd
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
-from torch.nn.functional import softmax
-from tqdm import tqdm
-
-def insta_sentiment():
-    # === CONFIG ===
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    INPUT_DB = os.path.join(BASE_DIR, "data", "instagram_comments.db")
-    OUTPUT_DB = os.path.join(BASE_DIR, "data", "instagram_sentiment.db")
-    AVG_DB = os.path.join(BASE_DIR, "data", "instagram_avg_sentiment.db")
-
-    # Remove output DBs if they exist
-    for db_path in [OUTPUT_DB, AVG_DB]:
-        if os.path.exists(db_path):
-            print(f"🗑️ Deleting existing database: {db_path}")
-            os.remove(db_path)
-
-    # Load tokenizer and model
-    tokenizer = AutoTokenizer.from_pretrained("blanchefort/rubert-base-cased-sentiment")
-    model = AutoModelForSequenceClassification.from_pretrained("blanchefort/rubert-base-cased-sentiment")
-
-    # Connect to input DB and read data
-    conn = sqlite3.connect(INPUT_DB)
-    df = pd.read_sql_query("SELECT * FROM comments", conn)
-    conn.close()
-
-    # Sentiment label mapping
-    label_map = {0: "negative", 1: "neutral", 2: "positive"}
-
-    # Sentiment classification function
-    def classify_sentiment(text):
-        if not isinstance(text, str) or text.strip() == "":
-            return "neutral"
-        inputs = tokenizer(text, return_tensors="pt", truncation=True, padding=True)
-        with torch.no_grad():
-            outputs = model(**inputs)
-            probs = softmax(outputs.logits, dim=1)
-            label = torch.argmax(probs).item()
-            return label_map[label]
-
-    # Apply sentiment analysis
-    tqdm.pandas(desc="🔍 Analyzing sentiment")
-    df["sentiment"] = df["comment"].progress_apply(classify_sentiment)
-
-    # Save sentiment-labeled comments
-    conn_out = sqlite3.connect(OUTPUT_DB)
-    df.to_sql("comments_with_sentiment", conn_out, index=False, if_exists="replace")
-    conn_out.close()
-    print(f"✅ Sentiment-labeled data saved to {OUTPUT_DB}")
-
-    # Compute majority sentiment per post
-    majority_df = (
-        df.groupby("post_caption")["sentiment"]
-        .agg(lambda x: x.value_counts().idxmax())
-        .reset_index()
-        .rename(columns={"sentiment": "average_sentiment"})
+from analysis.sentiment_engine import (
+    BACKEND, CHUNK_SIZE, MODEL_NAME, PROB_COLUMNS, SENTIMENTS, cache_revision, classify_chunks,
+)
+from analysis.mood_analyser import MAJORITY_SQL
+from analysis.relevance import update_relevance
+from utils.db_utils import get_connection, read_chunks, write_chunks
+
+COUNT_COLUMNS = [f"n_{label}" for label in SENTIMENTS]
+SUM_COLUMNS = [f"sum_{label}" for label in SENTIMENTS]
+AGGREGATE_COLUMNS = ["comments"] + COUNT_COLUMNS + SUM_COLUMNS
+
+# Add a delta (negative to retract comments) to a post's running totals
+UPSERT_AGGREGATE = f"""
+    INSERT INTO average_sentiment (post_url, post_caption, {", ".join(AGGREGATE_COLUMNS)})
+    VALUES (?, ?, {", ".join("?" for _ in AGGREGATE_COLUMNS)})
+    ON CONFLICT(post_url) DO UPDATE SET
+        post_caption = COALESCE(excluded.post_caption, post_caption),
+        {", ".join(f"{c} = {c} + excluded.{c}" for c in AGGREGATE_COLUMNS)}
+"""
+
+
+# Per-post comment count, label counts and probability sums
+def post_aggregates(df):
+    groups = df.groupby("post_url", sort=False)
+    labels = pd.get_dummies(pd.Categorical(df["sentiment"], categories=SENTIMENTS)).set_axis(COUNT_COLUMNS, axis=1)
+    aggregates = pd.concat([
+        groups.size().rename("comments"),
+        labels.groupby(df["post_url"].to_numpy(), sort=False).sum(),
+        groups[PROB_COLUMNS].sum().set_axis(SUM_COLUMNS, axis=1),
+    ], axis=1)
+    aggregates.insert(0, "post_caption", groups["post_caption"].first())
+    return aggregates
+
+
+def _apply(cursor, aggregates, sign=1):
+    cursor.executemany(UPSERT_AGGREGATE, (
+        (post_url, caption, *(sign * v for v in values))
+        for post_url, caption, *values in aggregates[["post_caption"] + AGGREGATE_COLUMNS].itertuples(name=None)
+    ))
+
+
+# Labelled comments matching `where`, read in chunks of chunk_size
+def _classified(conn, where, chunk_size=None):
+    for chunk in read_chunks(conn, f"""
+        SELECT cs.comment_id AS id, c.post_url, c.post_caption, cs.sentiment, {", ".join(f"cs.{c}" for c in PROB_COLUMNS)}
+        FROM comment_sentiment cs JOIN comments c ON c.id = cs.comment_id
+        WHERE cs.source = 'instagram' AND {where} AND cs.comment_id > ? ORDER BY cs.comment_id LIMIT ?
+    """, chunk_size=chunk_size):
+        yield chunk.astype({c: "float32" for c in PROB_COLUMNS})
+
+
+def _store(cursor, chunk):
+    cursor.executemany(
+        f"INSERT INTO comment_sentiment (comment_id, source, sentiment, {', '.join(PROB_COLUMNS)}) "
+        "VALUES (?, 'instagram', ?, ?, ?, ?)",
+        chunk[["id", "sentiment"] + PROB_COLUMNS].itertuples(index=False, name=None),
     )
+    _apply(cursor, post_aggregates(chunk))
+
+
+def _retract(cursor, chunk):
+    cursor.executemany("DELETE FROM comment_sentiment WHERE comment_id = ?", ((i,) for i in chunk["id"]))
+    _apply(cursor, post_aggregates(chunk), sign=-1)
+    cursor.execute("DELETE FROM average_sentiment WHERE comments <= 0")
+
+
+# Classify the relevant Instagram comments that have no label yet and fold
+# them into the per-post totals. Comments that stopped being relevant are
+# retracted the same way, so an ordinary run only touches what changed. A new
+# model, backend or `full=True` starts over.
+#
+# With chunk_size, comments stream through classification and are written
+# chunk by chunk, so memory does not grow with the table.
+def insta_sentiment(workers=None, threads_per_worker=None, backend=None, full=False, chunk_size=CHUNK_SIZE):
+    conn = get_connection()
+    cursor = conn.cursor()
+    update_relevance(conn)
+
+    revision = f"{MODEL_NAME}@{cache_revision(backend or BACKEND)}"
+    stored = cursor.execute("SELECT value FROM meta WHERE key = 'sentiment_revision'").fetchone()
+    if full or stored is None or stored[0] != revision:
+        cursor.execute("DELETE FROM comment_sentiment WHERE source = 'instagram'")
+        cursor.execute("DELETE FROM average_sentiment")
+        cursor.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('sentiment_revision', ?)", (revision,))
+        conn.commit()
+
+    # Labels whose comment is gone (a full rescrape re-inserts comments under new ids)
+    orphaned = cursor.execute("""
+        DELETE FROM comment_sentiment
+        WHERE source = 'instagram' AND NOT EXISTS (SELECT 1 FROM comments c WHERE c.id = comment_sentiment.comment_id)
+    """).rowcount
+    if orphaned:
+        # Nothing to subtract them from; rebuild the totals instead
+        cursor.execute("DELETE FROM average_sentiment")
+        list(write_chunks(conn, _classified(conn, "c.relevant = 1", chunk_size),
+                          lambda cursor, chunk: _apply(cursor, post_aggregates(chunk))))
+    conn.commit()
+
+    retracted = sum(len(chunk) for chunk in write_chunks(
+        conn, _classified(conn, "COALESCE(c.relevant, 0) != 1", chunk_size), _retract
+    ))
+
+    # Apply sentiment analysis in length-bucketed batches, one chunk at a time
+    new = read_chunks(conn, """
+        SELECT c.id, c.post_url, c.post_caption, c.comment FROM comments c
+        WHERE c.source = 'instagram' AND c.relevant = 1
+          AND NOT EXISTS (SELECT 1 FROM comment_sentiment cs WHERE cs.comment_id = c.id)
+          AND c.id > ? ORDER BY c.id LIMIT ?
+    """, chunk_size=chunk_size)
+    labelled = classify_chunks(
+        new, "comment", workers=workers, threads_per_worker=threads_per_worker, backend=backend
+    )
+    added = sum(len(chunk) for chunk in write_chunks(conn, labelled, _store))
+
+    # Majority labels in one pass once the totals are final; this also moves
+    # posts labelled under an older tie rule onto the current one
+    cursor.execute(f"UPDATE average_sentiment SET average_sentiment = {MAJORITY_SQL}")
+    conn.commit()
+
+    posts = cursor.execute("SELECT COUNT(*) FROM average_sentiment").fetchone()[0]
+    print(f"✅ Sentiment saved for {added} new comments, {retracted} retracted")
+    print(f"📊 Per-post sentiment up to date for {posts} posts")
 
-    # Save to new DB
-    conn_avg = sqlite3.connect(AVG_DB)
-    majority_df.to_sql("average_sentiment", conn_avg, index=False, if_exists="replace")
-    conn_avg.close()
-    print(f"📊 Majority sentiment per post saved to {AVG_DB}")
 
 if __name__ == "__main__":
-    insta_sentiment()
\ No newline at end of file
+    insta_sentiment()
@@ -1,92 +1,36 @@
 # insta_post_summarizer.py
 
-import sqlite3
 import pandas as pd
-import random
-import os
-import ollama
-from tqdm import tqdm
+from llm.ollama_pool import run_parallel, CONCURRENCY
+from llm.llm_cache import cached_chat
+from analysis.comment_groups import iter_with_comments
+from analysis.relevance import update_relevance
+from utils import perf
+from utils.db_utils import get_connection
+from analysis.map_reduce import map_reduce, chunk_comments, fits, MAP_COMMENTS_PROMPT
 
 # === CONFIG ===
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-INSTAGRAM_DB = os.path.join(BASE_DIR, "data", "instagram_comments.db")
-OUTPUT_DB = os.path.join(BASE_DIR, "data", "instagram_summaries.db")
-PROMPT_DIR = os.path.join(BASE_DIR, "prompts")
-MAX_COMMENTS = 50
 OLLAMA_MODEL = "llama3.1:8b"
-
-# === ENSURE PROMPT DIR EXISTS ===
-os.makedirs(PROMPT_DIR, exist_ok=True)
+SYSTEM_PROMPT = "Ты — аналитик социальных сетей. Делай краткие обзоры на русском языке."
 
 # === OLLAMA CHAT FUNCTION ===
+# Failures are raised, not returned as text, so they never land in
+# post_summaries as if they were summaries
 def call_llm(prompt: str, model: str = OLLAMA_MODEL) -> str:
-    try:
-        response = ollama.chat(
-            model=model,
-            messages=[
-                {"role": "system", "content": "Ты — аналитик социальных сетей. Делай краткие обзоры на русском языке."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return response['message']['content'].strip()
-    except Exception as e:
-        print("⚠️ Ошибка при вызове Ollama:", e)
-        return "[ERROR: Не удалось получить ответ от модели]"
-
-def summarize_insta():
-    # === VERIFY DB EXISTS ===
-    if not os.path.exists(INSTAGRAM_DB):
-        raise FileNotFoundError(f"Файл базы данных не найден: {INSTAGRAM_DB}")
-
-    # === LOAD DATA ===
-    print('Connecting to Instagram Database...')
-    conn = sqlite3.connect(INSTAGRAM_DB)
-    df = pd.read_sql("SELECT * FROM comments", conn)
-    conn.close()
-
-    # === GROUP BY POST ===
-    post_groups = df.groupby("post_url")
-
-    # === PREP OUTPUT DB ===
-    print('Connecting to Summary Database...')
-    # === CLEAN OUTPUT DB IF EXISTS ===
-    if os.path.exists(OUTPUT_DB):
-        print(f"🗑️ Deleting existing database: {OUTPUT_DB}")
-        os.remove(OUTPUT_DB)
-    out_conn = sqlite3.connect(OUTPUT_DB)
-    out_cursor = out_conn.cursor()
-    out_cursor.execute("""
-    CREATE TABLE IF NOT EXISTS post_summaries (
-        post_url TEXT PRIMARY KEY,
-        caption TEXT,
-        comment_count INTEGER,
-        summary TEXT
-    );
-    """)
-    out_conn.commit()
-
-    # === LOOP THROUGH POSTS ===
-    print('Starting Summary Loop...')
-    for post_url, group in tqdm(post_groups, desc="Summarizing posts"):
-        caption = group["post_caption"].iloc[0]
-        comments = group["comment"].dropna().astype(str).tolist()
-        comment_count = len(comments)
+    # Prompts and responses are kept in the LLM cache, so an unchanged
+    # post is not re-summarized
+    return cached_chat(model, SYSTEM_PROMPT, prompt).strip()
 
-        # Limit comments to prevent overloading context window
-        if len(comments) > MAX_COMMENTS:
-            random.seed(42)
-            comments = random.sample(comments, MAX_COMMENTS)
-
-        # === BUILD PROMPT ===
-        prompt = f"""Пост:
+# === BUILD PROMPT ===
+def build_prompt(caption, comment_count, comment_block):
+    prompt = f"""Пост:
     {caption.strip()}
     
     Комментарии ({comment_count}):
     """
-        for i, comment in enumerate(comments, 1):
-            prompt += f"{i}. {comment.strip()}\n"
+    prompt += comment_block
 
-        prompt += """
+    prompt += """
     
     Задача:
     На основе содержания поста и комментариев составь краткий аналитический обзор на русском языке. Укажи:
@@ -96,21 +40,64 @@ def summarize_insta():
     
     Будьте прямолинейны и прямолинейны в своих выводах и заключениях.
     """
+    return prompt
+
 
-        # === SAVE PROMPT FOR DEBUGGING ===
-        prompt_path = os.path.join(PROMPT_DIR, f"prompt_{hash(post_url)}.txt")
-        with open(prompt_path, "w", encoding="utf-8") as f:
-            f.write(prompt.strip())
+def summarize_post(caption, comments):
+    comment_block = "".join(f"{i}. {comment.strip()}\n" for i, comment in enumerate(comments, 1))
 
-        # === CALL OLLAMA CHAT ===
-        summary = call_llm(prompt)
+    # Every comment is covered: threads too long for one prompt are condensed
+    # chunk by chunk (map-reduce) instead of being sampled down
+    if not fits(comment_block):
+        comment_block = map_reduce(chunk_comments(comments), MAP_COMMENTS_PROMPT, OLLAMA_MODEL, SYSTEM_PROMPT)
 
-        # === STORE RESULT ===
-        out_cursor.execute("""
-            INSERT OR REPLACE INTO post_summaries (post_url, caption, comment_count, summary)
-            VALUES (?, ?, ?, ?)
-        """, (post_url, caption, comment_count, summary))
-        out_conn.commit()
+    return call_llm(build_prompt(caption, len(comments), comment_block))
 
-    out_conn.close()
-    print("✅ Все посты успешно проанализированы. Результаты сохранены в:", OUTPUT_DB)
+
+def summarize_insta(concurrency=CONCURRENCY):
+    # === LOAD DATA ===
+    print('Connecting to the database...')
+    conn = get_connection()
+    update_relevance(conn)
+    df = pd.read_sql("SELECT * FROM comments WHERE source = 'instagram' AND relevant = 1 ORDER BY id", conn)
+
+    # === GROUP BY POST ===
+    posts = df.drop_duplicates("post_url")[["post_url", "post_caption"]]
+
+    # === CLEAN PREVIOUS SUMMARIES ===
+    conn.execute("DELETE FROM post_summaries")
+    conn.commit()
+    out_cursor = conn.cursor()
+
+    # === COLLECT POSTS ===
+    print('Collecting posts...')
+    jobs = []
+    for post, group in iter_with_comments(posts, ["post_url"], df, ["post_url"]):
+        post_url = post["post_url"]
+        caption = post["post_caption"]
+        comments = group["comment"].dropna().astype(str).tolist()
+        comment_count = len(comments)
+
+        jobs.append((post_url, caption, comment_count, comments))
+
+    # === CALL OLLAMA CHAT, STORE RESULTS AS THEY COMPLETE ===
+    print('Starting Summary Loop...')
+    failed = 0
+    with perf.timed("summarize.posts", items=len(jobs)):
+        for _, (post_url, caption, comment_count, _), summary in run_parallel(
+            lambda job: summarize_post(job[1], job[3]), jobs, concurrency=concurrency, desc="Summarizing posts",
+        ):
+            if isinstance(summary, Exception):
+                print(f"⚠️ Ошибка при вызове Ollama для {post_url}: {summary}")
+                failed += 1
+                continue
+            out_cursor.execute("""
+                INSERT OR REPLACE INTO post_summaries (post_url, caption, comment_count, summary)
+                VALUES (?, ?, ?, ?)
+            """, (post_url, caption, comment_count, summary))
+            conn.commit()
+
+    # The other posts are saved, but the stage must not count as up to date
+    if failed:
+        raise RuntimeError(f"{failed} of {len(jobs)} posts could not be summarized")
+    print("✅ Все посты успешно проанализированы. Результаты сохранены в таблицу post_summaries")
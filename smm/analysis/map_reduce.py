@@ -0,0 +1,112 @@
+# map_reduce.py
+# Hierarchical summarization for inputs that do not fit one prompt.
+
+import re
+
+from llm.llm_cache import cached_chat
+from llm.ollama_pool import run_parallel, CONCURRENCY
+
+# === CONFIG ===
+CHARS_PER_TOKEN = 3        # Rough ratio for Russian/Uzbek text with llama tokenizers
+CHUNK_TOKENS = 1500        # Budget for one chunk sent to the map step
+CONTEXT_TOKENS = 4000      # Budget for the variable part of any single prompt
+
+MAP_ARTICLE_PROMPT = """
+ФРАГМЕНТ СТАТЬИ:
+{chunk}
+
+Кратко перескажи этот фрагмент статьи, сохранив факты, имена и цифры. Ответ на русском языке.
+"""
+
+MAP_COMMENTS_PROMPT = """
+КОММЕНТАРИИ:
+{chunk}
+
+Кратко опиши основные мнения и реакции в этих комментариях, отметь преобладающее настроение. Ответ на русском языке.
+"""
+
+REDUCE_PROMPT = """
+ЧАСТИЧНЫЕ ОБЗОРЫ:
+{chunk}
+
+Объедини эти обзоры в один краткий обзор без повторов. Ответ на русском языке.
+"""
+
+
+def approx_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _split_oversized(piece, budget):
+    # A single paragraph or comment larger than the budget is cut on word boundaries
+    words = piece.split()
+    parts, current = [], []
+    for word in words:
+        if current and approx_tokens(" ".join(current + [word])) > budget:
+            parts.append(" ".join(current))
+            current = []
+        current.append(word)
+    if current:
+        parts.append(" ".join(current))
+    # Words longer than the budget (URLs, emoji runs) are cut by characters
+    width = budget * CHARS_PER_TOKEN - 1
+    return [p[i:i + width] for p in parts for i in range(0, len(p), width)]
+
+
+# Greedily pack pieces, in order, into groups that each fit the budget.
+# Boundaries depend only on the pieces themselves, so an unchanged prefix
+# produces the same chunks (and cache hits) on the next run.
+def pack(pieces, budget=CHUNK_TOKENS, separator="\n"):
+    groups, current, used = [], [], 0
+    for piece in pieces:
+        for part in ([piece] if approx_tokens(piece) <= budget else _split_oversized(piece, budget)):
+            cost = approx_tokens(part + separator)
+            if current and used + cost > budget:
+                groups.append(current)
+                current, used = [], 0
+            current.append(part)
+            used += cost
+    if current:
+        groups.append(current)
+    return groups
+
+
+def chunk_text(text, budget=CHUNK_TOKENS):
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n|\n", text or "") if p.strip()]
+    return ["\n".join(group) for group in pack(paragraphs, budget)]
+
+
+def chunk_comments(comments, budget=CHUNK_TOKENS):
+    lines = [f"- {c.strip()}" for c in comments if isinstance(c, str) and c.strip()]
+    return ["\n".join(group) for group in pack(lines, budget)]
+
+
+def fits(text, budget=CONTEXT_TOKENS):
+    return approx_tokens(text) <= budget
+
+
+# Summarize every chunk in parallel (map), then merge partial summaries
+# level by level until they fit one prompt (reduce). Every call goes through
+# the LLM cache, so only chunks whose text changed are recomputed.
+def map_reduce(chunks, map_prompt, model, system, budget=CONTEXT_TOKENS, concurrency=CONCURRENCY):
+    if not chunks:
+        return ""
+
+    summaries = _summarize_all([map_prompt.format(chunk=c) for c in chunks], model, system, concurrency)
+    while len(summaries) > 1 and not fits("\n\n".join(summaries), budget):
+        groups = pack(summaries, budget // 2, separator="\n\n")
+        if len(groups) == len(summaries):
+            # Each summary alone fills half the budget; merging pairs still shrinks the list
+            groups = [summaries[i:i + 2] for i in range(0, len(summaries), 2)]
+        prompts = [REDUCE_PROMPT.format(chunk="\n\n".join(g)) for g in groups]
+        summaries = _summarize_all(prompts, model, system, concurrency)
+    return "\n\n".join(summaries)
+
+
+def _summarize_all(prompts, model, system, concurrency):
+    results = [None] * len(prompts)
+    for i, _, result in run_parallel(lambda p: cached_chat(model, system, p), prompts, concurrency=concurrency):
+        if isinstance(result, Exception):
+            raise result
+        results[i] = result.strip()
+    return results
@@ -1,56 +1,15 @@
 # mood_analyser.py
 
-import sqlite3
 import pandas as pd
 import numpy as np
 import re
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
-from torch.nn.functional import softmax
-from tqdm import tqdm
-import joblib
 import random
-import os
-
-def delete_irrelevant( db_path='instagram_comments.db'):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    keywords = [
-        # English
-        "uzbekistan", "tashkent", "government", "mirziyoyev", "reform", "tax", "taxes",
-        "economy", "salary", "price", "healthcare", "education", "internet", "protest",
-        "explosion", "accident", "fire", "rights", "law", "election", "police", "corruption",
-        "job", "jobs", "employee", "employment", "tariffs", "tarif",
-
-        # Russian
-        "Узбекистан", "Ташкент", "правительство", "Мирзиёев", "реформа", "налог", "налоги",
-        "экономика", "зарплата", "цена", "здравоохранение", "образование", "интернет", "протест",
-        "взрыв", "авария", "пожар", "права", "закон", "выборы", "полиция", "коррупция",
-        "работа", "рабочие места", "работник", "занятость", "тарифы", "тариф",
-
-        # Uzbek (Latin script)
-        "o'zbekiston", "toshkent", "hukumat", "mirziyoyev", "islohot", "soliq", "soliqlar",
-        "iqtisod", "maosh", "narx", "sog'liqni saqlash", "ta'lim", "internet", "norozilik",
-        "portlash", "avariya", "yong'in", "huquqlar", "qonun", "saylov", "politsiya",
-        "korruptsiya", "ish", "xodim", "bandlik", "tariflar", "tarif",
-    ]
-
-    like_clauses = " OR ".join([f"post_caption LIKE ?" for _ in keywords])
-    params = [f"%{kw}%" for kw in keywords]
-
-    query = f"""
-    DELETE FROM comments
-    WHERE NOT ({like_clauses})
-    """
-    cursor.execute(query, params)
-    deleted_count = cursor.rowcount
-    conn.commit()
-    conn.close()
-
-    print(f'Deleted {deleted_count} posts.')
-
+import time
+from analysis.relevance import update_relevance
+from utils import perf
+from utils.db_utils import CHUNK_SIZE, get_connection, read_chunks
 
+COMMENT_COLUMNS = ['article_id', 'source', 'scrape_date', 'comment']
 
 def clean_text(text):
     if not isinstance(text, str):
@@ -58,145 +17,191 @@ def clean_text(text):
     text = re.sub(r'<.*?>|@\w+|https?://\S+|www\.\S+', '', text)
     return re.sub(r'\s+', ' ', text).strip()
 
-def load_data():
-    # --- Podrobno ---
-    pod_articles = pd.read_sql("SELECT * FROM articles", sqlite3.connect("data/podrobno_articles.db"))
-    pod_emotions = pd.read_sql("SELECT * FROM emotions", sqlite3.connect("data/podrobno_articles.db"))
-    pod_articles['source'] = 'podrobno'
-    pod_articles['article_id'] = pod_articles['id'].astype(str) + 'podrobno'
-    pod_emotions['article_id'] = pod_emotions['article_id'].astype(str) + 'podrobno'
-
-    # --- Gazeta ---
-    gaz_articles = pd.read_sql("SELECT * FROM articles", sqlite3.connect("data/gazeta_articles.db"))
-    gaz_comments = pd.read_sql("SELECT * FROM comments", sqlite3.connect("data/gazeta_articles.db"))
-    gaz_articles['source'] = 'gazeta'
-    gaz_articles['article_id'] = gaz_articles['id'].astype(str) + 'gazeta'
-    gaz_comments['article_id'] = gaz_comments['article_id'].astype(str) + 'gazeta'
-
-    # --- Instagram ---
-    insta_path = "data/instagram_comments.db"
-
-    delete_irrelevant(insta_path)
-
-    if os.path.exists(insta_path):
-        insta_comments = pd.read_sql("SELECT * FROM comments", sqlite3.connect(insta_path))
-        insta_comments['source'] = 'instagram'
-        insta_comments['article_id'] = 'insta_' + insta_comments['id'].astype(str)
-        insta_comments = insta_comments.rename(columns={'comment': 'comment'})
-        insta_comments = insta_comments[['article_id', 'source', 'comment']]  # Keep it uniform
-    else:
-        insta_comments = pd.DataFrame(columns=['article_id', 'source', 'comment'])
+def load_data(chunk_size=CHUNK_SIZE):
+    started = time.perf_counter()
+    conn = get_connection()
+
+    # scrape_date comes from fetch_state; rows migrated from the old per-source
+    # databases have none and land in the "unknown" snapshot partition
+    # --- Articles (Gazeta + Podrobno) ---
+    articles = pd.read_sql("""
+        SELECT a.*, date(f.fetched_at, 'unixepoch') AS scrape_date
+        FROM articles a LEFT JOIN fetch_state f ON f.url = a.url
+        ORDER BY a.source, a.id
+    """, conn)
+    articles['article_id'] = articles['id'].astype(str) + articles['source']
+
+    # Irrelevant posts are flagged, not deleted; only relevant ones are analysed
+    update_relevance(conn)
+    comments = comment_chunks(conn, chunk_size)
+
+    # --- Podrobno emotions ---
+    emotions = pd.read_sql("""
+        SELECT e.*, date(f.fetched_at, 'unixepoch') AS scrape_date
+        FROM emotions e
+        LEFT JOIN articles a ON a.id = e.article_id
+        LEFT JOIN fetch_state f ON f.url = a.url
+        WHERE e.source = 'podrobno'
+    """, conn)
+    emotions['article_id'] = emotions['article_id'].astype(str) + 'podrobno'
 
     # --- Combine ---
-    articles = pd.concat([gaz_articles, pod_articles], ignore_index=True)
-    comments = pd.concat([gaz_comments[['article_id', 'comment']], insta_comments], ignore_index=True)
-    emotions = pod_emotions.copy()
+    # Streaming mode hands the comments on as a generator of chunks instead
+    if not chunk_size:
+        comments = list(comments)
+        comments = pd.concat(comments, ignore_index=True) if comments else pd.DataFrame(columns=COMMENT_COLUMNS)
 
+    loaded = len(articles) + (len(comments) if isinstance(comments, pd.DataFrame) else 0)
+    perf.record("analyze.load_data", time.perf_counter() - started, items=loaded)
     return articles, comments, emotions
 
-def analyze(articles, comments, emotions):
-    comments['clean_comment'] = comments['comment'].apply(clean_text)
-
-    tokenizer = AutoTokenizer.from_pretrained("blanchefort/rubert-base-cased-sentiment")
-    model = AutoModelForSequenceClassification.from_pretrained("blanchefort/rubert-base-cased-sentiment")
-
-    def classify(text):
-        if not text.strip():
-            return "neutral"
-        encoded = tokenizer(text, return_tensors='pt', truncation=True, padding=True)
-        with torch.no_grad():
-            logits = model(**encoded).logits
-        stars = torch.argmax(softmax(logits, dim=1)) + 1
-        return "negative" if stars <= 2 else "neutral" if stars == 3 else "positive"
-
-    tqdm.pandas()
-    comments['sentiment'] = comments['clean_comment'].progress_apply(classify)
+# Gazeta comments, then relevant Instagram comments, as DataFrames of at most
+# chunk_size rows (one DataFrame per source without it)
+def comment_chunks(conn, chunk_size=None):
+    # --- Gazeta comments ---
+    for chunk in read_chunks(conn, """
+        SELECT c.id, c.article_id, c.source, c.comment, date(f.fetched_at, 'unixepoch') AS scrape_date
+        FROM comments c
+        LEFT JOIN articles a ON a.id = c.article_id
+        LEFT JOIN fetch_state f ON f.url = a.url
+        WHERE c.source = 'gazeta' AND c.id > ? ORDER BY c.id LIMIT ?
+    """, chunk_size=chunk_size):
+        chunk['article_id'] = chunk['article_id'].astype(str) + 'gazeta'
+        yield chunk[COMMENT_COLUMNS]
 
-    counts = comments.groupby('article_id')['sentiment'].value_counts().unstack(fill_value=0)
-
-    def get_mood(row):
-        pos = row.get("positive", 0)
-        neu = row.get("neutral", 0)
-        neg = row.get("negative", 0)
-        if pos > max(neg, neu):
-            return "positive"
-        if neg > max(pos, neu):
-            return "negative"
-        return "neutral"
-
-    counts['mood'] = counts.apply(get_mood, axis=1)
-    articles = articles.merge(counts['mood'], left_on="article_id", right_index=True, how="left")
+    # --- Instagram ---
+    for chunk in read_chunks(conn, """
+        SELECT c.id, c.source, c.comment, date(f.fetched_at, 'unixepoch') AS scrape_date
+        FROM comments c LEFT JOIN fetch_state f ON f.url = c.post_url
+        WHERE c.source = 'instagram' AND c.relevant = 1 AND c.id > ? ORDER BY c.id LIMIT ?
+    """, chunk_size=chunk_size):
+        chunk['article_id'] = 'insta_' + chunk['id'].astype(str)
+        yield chunk[COMMENT_COLUMNS]  # Keep it uniform
+
+def clean_chunks(chunks):
+    for chunk in chunks:
+        with perf.timed("analyze.clean_text", items=len(chunk)):
+            chunk['clean_comment'] = chunk['comment'].apply(clean_text)
+        yield chunk
+
+# Column order doubles as the tie-break order for the dominant emoji reaction
+MOODS = ['positive', 'neutral', 'negative']
+EMOJI_SENTIMENT = {
+    'Нравится': 'positive', 'Восхищение': 'positive', 'Радость': 'positive',
+    'Удивление': 'neutral',
+    'Подавленность': 'negative', 'Грусть': 'negative',
+    'Разочарование': 'negative', 'Не нравится': 'negative'
+}
+
+# Per-key (positive, neutral, negative) counts as an (n_keys, 3) matrix.
+# Rows whose label is not one of MOODS are ignored, as value_counts would.
+def sentiment_counts(keys, labels):
+    codes = pd.Index(MOODS).get_indexer(np.asarray(labels, dtype=object))
+    known = codes >= 0
+    key_codes, uniques = pd.factorize(np.asarray(keys)[known])
+    flat = np.bincount(key_codes * len(MOODS) + codes[known], minlength=len(uniques) * len(MOODS))
+    return uniques, flat.reshape(len(uniques), len(MOODS))
+
+def comment_counts(comments):
+    article_ids, counts = sentiment_counts(comments['article_id'], comments['sentiment'])
+    return pd.DataFrame(counts, index=article_ids, columns=MOODS)
+
+# Majority mood per row of a count matrix: positive or negative only when
+# strictly ahead of both other labels, neutral otherwise (including ties)
+def majority_mood(counts):
+    pos, neu, neg = counts[:, 0], counts[:, 1], counts[:, 2]
+    return np.where(pos > np.maximum(neg, neu), 'positive',
+                    np.where(neg > np.maximum(pos, neu), 'negative', 'neutral'))
+
+# The same rule over average_sentiment's per-post counts, so posts and
+# articles break ties alike
+MAJORITY_SQL = """
+    CASE
+        WHEN n_positive > MAX(n_negative, n_neutral) THEN 'positive'
+        WHEN n_negative > MAX(n_positive, n_neutral) THEN 'negative'
+        ELSE 'neutral'
+    END
+"""
+
+# Mood per article: majority sentiment of its comments (counts from
+# comment_counts), overridden by the dominant emoji reaction where the site
+# has them (Podrobno)
+def article_moods(articles, counts, emotions):
+    started = time.perf_counter()
+    moods = pd.Series(majority_mood(counts.to_numpy()), index=counts.index)
 
     # --- Add emoji-based sentiment override (Podrobno only) ---
-    emoji_sentiment_map = {
-        'Нравится': 'positive', 'Восхищение': 'positive', 'Радость': 'positive',
-        'Удивление': 'neutral',
-        'Подавленность': 'negative', 'Грусть': 'negative',
-        'Разочарование': 'negative', 'Не нравится': 'negative'
-    }
-    emotions['sentiment'] = emotions['emotion'].map(emoji_sentiment_map)
-    emotions_summary = emotions.groupby(['article_id', 'sentiment'])['count'].sum().unstack(fill_value=0).reset_index()
-    emotions_summary['dominant_sentiment'] = emotions_summary[['positive', 'neutral', 'negative']].idxmax(axis=1)
-
-    for _, row in emotions_summary.iterrows():
-        articles.loc[articles['article_id'] == row['article_id'], 'mood'] = row['dominant_sentiment']
-
-    articles['mood'] = articles['mood'].fillna("no comment")
+    emotions['sentiment'] = emotions['emotion'].map(EMOJI_SENTIMENT)
+    emotions_summary = (
+        emotions.groupby(['article_id', 'sentiment'])['count'].sum().unstack(fill_value=0)
+        .reindex(columns=sorted(MOODS), fill_value=0).reset_index()
+    )
+    emotions_summary.columns.name = None
+    # argmax keeps the first maximum in MOODS order, as idxmax did
+    reactions = emotions_summary[MOODS].to_numpy()
+    emotions_summary['dominant_sentiment'] = np.array(MOODS, dtype=object)[reactions.argmax(axis=1)]
+    dominant = pd.Series(emotions_summary['dominant_sentiment'].to_numpy(), index=emotions_summary['article_id'])
+
+    mood = articles['article_id'].map(dominant).fillna(articles['article_id'].map(moods))
+    articles = articles.assign(mood=mood.fillna("no comment"))
+    perf.record("analyze.aggregate", time.perf_counter() - started, items=int(counts.to_numpy().sum()))
+    return articles, emotions_summary
+
+# `comments` is a DataFrame or, in streaming mode, an iterable of chunks.
+# Chunks are cleaned, classified and written to the snapshot one at a time;
+# only their per-article counts are kept.
+def analyze(articles, comments, emotions, workers=None, threads_per_worker=None, backend=None):
+    # Loading torch and pyarrow is left to the one step that needs them, so
+    # the loading and aggregation helpers above import with pandas alone
+    from analysis.sentiment_engine import classify_chunks
+    from utils.snapshots import SnapshotWriter, write_snapshot
+
+    chunks = [comments] if isinstance(comments, pd.DataFrame) else comments
+    labelled = classify_chunks(
+        clean_chunks(chunks), 'clean_comment', workers=workers, threads_per_worker=threads_per_worker, backend=backend
+    )
+    snapshot = SnapshotWriter("comments")
+    counts = pd.DataFrame(columns=MOODS, dtype=int)
+    for chunk in labelled:
+        snapshot.write(chunk)
+        # Only articles can carry a mood; Instagram rows would just pile up here
+        chunk_counts = comment_counts(chunk[chunk['article_id'].isin(articles['article_id'])])
+        counts = counts.add(chunk_counts, fill_value=0).astype(int)
+
+    articles, emotions_summary = article_moods(articles, counts, emotions)
+
+    conn = get_connection()
 
     # === Instagram Summaries Block ===
-    insta_summary_path = "data/instagram_summaries.db"
-    if os.path.exists(insta_summary_path):
-        insta_summary_conn = sqlite3.connect(insta_summary_path)
-        insta_summary_df = pd.read_sql("SELECT * FROM post_summaries", insta_summary_conn)
-        insta_summary_conn.close()
-
-        insta_summary_texts = insta_summary_df["summary"].dropna().tolist()
-        random.seed(42)
-        random.shuffle(insta_summary_texts)
-        insta_summaries = "\n\n".join(f"- {s.strip()}" for s in insta_summary_texts[:5]) if insta_summary_texts else "Нет Instagram-сводок."
-    else:
-        insta_summaries = "Instagram-данные отсутствуют."
+    insta_summary_df = pd.read_sql("SELECT * FROM post_summaries ORDER BY post_url", conn)
+    insta_summary_texts = insta_summary_df["summary"].dropna().tolist()
+    random.seed(42)
+    random.shuffle(insta_summary_texts)
+    insta_summaries = "\n\n".join(f"- {s.strip()}" for s in insta_summary_texts[:5]) if insta_summary_texts else "Нет Instagram-сводок."
 
     # === Article Summaries Block ===
-    article_summary_path = "data/article_summaries.db"
-    if os.path.exists(article_summary_path):
-        article_summary_conn = sqlite3.connect(article_summary_path)
-        article_summary_df = pd.read_sql("SELECT * FROM summaries", article_summary_conn)
-        article_summary_conn.close()
-
-        article_summary_texts = article_summary_df["summary"].dropna().tolist()
-        random.seed(42)
-        random.shuffle(article_summary_texts)
-        article_summaries = "\n\n".join(f"- {s.strip()}" for s in article_summary_texts[:5]) if article_summary_texts else "Нет сводок по статьям."
-    else:
-        article_summaries = "Сводки по статьям отсутствуют."
+    article_summary_df = pd.read_sql("SELECT * FROM article_summaries ORDER BY source, article_id", conn)
+    article_summary_texts = article_summary_df["summary"].dropna().tolist()
+    random.seed(42)
+    random.shuffle(article_summary_texts)
+    article_summaries = "\n\n".join(f"- {s.strip()}" for s in article_summary_texts[:5]) if article_summary_texts else "Нет сводок по статьям."
 
     # === Comment Sentiment Block ===
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    SENTIMENT_DB = os.path.join(BASE_DIR, "data", "instagram_avg_sentiment.db")
-
-    # Connect and load the average sentiment table
-    conn = sqlite3.connect(SENTIMENT_DB)
-    avg_df = pd.read_sql_query("SELECT * FROM average_sentiment", conn)
-    conn.close()
-
-    average_sentiment_text = "\n".join(f"Этот пост: {row['post_caption']}, вызвал такую реакцию: {row['average_sentiment']}"
-    for _, row in avg_df.iterrows())
-
-
-
+    avg_df = pd.read_sql_query("SELECT post_caption, average_sentiment FROM average_sentiment ORDER BY post_url", conn)
 
+    average_sentiment_text = "\n".join(
+        "Этот пост: " + avg_df['post_caption'].astype(str) + ", вызвал такую реакцию: " + avg_df['average_sentiment'].astype(str)
+    )
 
     # --- Save intermediate outputs ---
-    joblib.dump(articles, "articles_df.pkl")
-    joblib.dump(comments, "comments_df.pkl")
-    joblib.dump(emotions_summary, "sentiment_insta_summary_emotions.pkl")
+    write_snapshot(articles, "articles")
+    emotions_summary = emotions_summary.merge(
+        emotions.groupby('article_id')['scrape_date'].first(), left_on='article_id', right_index=True, how='left'
+    )
+    write_snapshot(emotions_summary.assign(source='podrobno'), "emotions_summary")
 
     # === Generate Prompt for LLM ===
     mood_counts = articles['mood'].value_counts().to_dict()
-    sampled_comments = comments['clean_comment'].dropna().tolist()
-    random.seed(42)
-    sampled_comments = random.sample(sampled_comments, min(10, len(sampled_comments)))
 
     if 'dominant_sentiment' in emotions_summary.columns:
         top_emotions = emotions_summary['dominant_sentiment'].value_counts().head(5).index.tolist()
@@ -0,0 +1,146 @@
+# relevance.py
+# Keyword relevance index for Instagram posts. Each caption is scored once
+# and the result is stored next to the comments, so analysis filters on a
+# column instead of deleting rows.
+
+import hashlib
+import os
+from collections import deque
+
+from utils.db_utils import get_connection
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# One keyword per line; lines starting with # are ignored. Falls back to
+# DEFAULT_KEYWORDS when the file does not exist.
+KEYWORDS_FILE = os.path.join(BASE_DIR, "relevance_keywords.txt")
+MIN_SCORE = 1
+
+DEFAULT_KEYWORDS = [
+    # English
+    "uzbekistan", "tashkent", "government", "mirziyoyev", "reform", "tax", "taxes",
+    "economy", "salary", "price", "healthcare", "education", "internet", "protest",
+    "explosion", "accident", "fire", "rights", "law", "election", "police", "corruption",
+    "job", "jobs", "employee", "employment", "tariffs", "tarif",
+
+    # Russian
+    "Узбекистан", "Ташкент", "правительство", "Мирзиёев", "реформа", "налог", "налоги",
+    "экономика", "зарплата", "цена", "здравоохранение", "образование", "интернет", "протест",
+    "взрыв", "авария", "пожар", "права", "закон", "выборы", "полиция", "коррупция",
+    "работа", "рабочие места", "работник", "занятость", "тарифы", "тариф",
+
+    # Uzbek (Latin script)
+    "o'zbekiston", "toshkent", "hukumat", "mirziyoyev", "islohot", "soliq", "soliqlar",
+    "iqtisod", "maosh", "narx", "sog'liqni saqlash", "ta'lim", "internet", "norozilik",
+    "portlash", "avariya", "yong'in", "huquqlar", "qonun", "saylov", "politsiya",
+    "korruptsiya", "ish", "xodim", "bandlik", "tariflar", "tarif",
+]
+
+# Uzbek Latin is written with several apostrophe look-alikes
+_APOSTROPHES = str.maketrans({"‘": "'", "’": "'", "ʻ": "'", "ʼ": "'", "`": "'"})
+
+
+def normalize(text):
+    return text.translate(_APOSTROPHES).casefold()
+
+
+def load_keywords(path=KEYWORDS_FILE):
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            keywords = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    else:
+        keywords = DEFAULT_KEYWORDS
+    return sorted({normalize(k) for k in keywords})
+
+
+class KeywordMatcher:
+    # Aho-Corasick automaton: one pass over the text finds every keyword,
+    # matching substrings the same way the old LIKE '%kw%' clauses did
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [set()]
+
+        for index, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(set())
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.out[state].add(index)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.out[child] |= self.out[self.fail[child]]
+
+    # Number of distinct keywords found in the text
+    def score(self, text):
+        if not isinstance(text, str) or not text:
+            return 0
+        found = set()
+        state = 0
+        for char in normalize(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            if self.out[state]:
+                found |= self.out[state]
+        return len(found)
+
+
+def keywords_fingerprint(keywords):
+    return hashlib.sha256("\n".join(keywords).encode("utf-8")).hexdigest()
+
+
+# Score every caption that has not been scored yet (or all of them when the
+# keyword list changed) and store relevance_score / relevant on the Instagram
+# comments. Returns the number of captions evaluated.
+def update_relevance(conn=None, keywords=None, min_score=MIN_SCORE):
+    keywords = load_keywords() if keywords is None else sorted({normalize(k) for k in keywords})
+    fingerprint = keywords_fingerprint(keywords)
+
+    conn = conn or get_connection()
+    cursor = conn.cursor()
+    row = cursor.execute("SELECT value FROM meta WHERE key = 'relevance_keywords'").fetchone()
+    if row is None or row[0] != fingerprint:
+        # Keyword list changed: every caption has to be re-evaluated
+        cursor.execute(
+            "UPDATE comments SET relevance_score = NULL, relevant = NULL WHERE source = 'instagram'"
+        )
+
+    captions = [r[0] for r in cursor.execute(
+        "SELECT DISTINCT post_caption FROM comments WHERE source = 'instagram' AND relevance_score IS NULL"
+    )]
+    matcher = KeywordMatcher(keywords)
+    updates = []
+    for caption in captions:
+        score = matcher.score(caption)
+        updates.append((score, int(score >= min_score), caption))
+    cursor.executemany(
+        "UPDATE comments SET relevance_score = ?, relevant = ? "
+        "WHERE source = 'instagram' AND post_caption IS ? AND relevance_score IS NULL",
+        updates,
+    )
+    cursor.execute(
+        "INSERT OR REPLACE INTO meta (key, value) VALUES ('relevance_keywords', ?)", (fingerprint,)
+    )
+    conn.commit()
+
+    relevant = cursor.execute(
+        "SELECT COUNT(*) FROM comments WHERE source = 'instagram' AND relevant = 1"
+    ).fetchone()[0]
+    total = cursor.execute("SELECT COUNT(*) FROM comments WHERE source = 'instagram'").fetchone()[0]
+
+    print(f'Relevance: {len(captions)} captions evaluated, {relevant}/{total} comments relevant.')
+    return len(captions)
@@ -0,0 +1,108 @@
+# sentiment_backends.py
+# Interchangeable CPU runtimes for the sentiment model. Every backend takes
+# tokenized (unpadded) features and returns an (n, 3) probability matrix.
+
+import os
+
+import numpy as np
+import torch
+from torch.nn.functional import softmax
+from transformers import AutoModelForSequenceClassification
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ONNX_DIR = os.path.join(BASE_DIR, "data", "onnx")
+ONNX_OPSET = 14
+
+
+class EagerBackend:
+    # Plain fp32 PyTorch, the reference every other backend is compared with
+    name = "eager"
+
+    def __init__(self, tokenizer, model_name, revision):
+        self.tokenizer = tokenizer
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_name, revision=revision)
+        self.model.eval()
+
+    def __call__(self, features):
+        batch = self.tokenizer.pad(features, return_tensors="pt")
+        with torch.inference_mode():
+            logits = self.model(**batch).logits
+        return softmax(logits, dim=1).numpy()
+
+
+class Int8Backend(EagerBackend):
+    # Linear layers quantized to int8 at load time; activations stay fp32
+    name = "int8"
+
+    def __init__(self, tokenizer, model_name, revision):
+        super().__init__(tokenizer, model_name, revision)
+        self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class _Logits(torch.nn.Module):
+    # Positional wrapper so the exported graph has plain tensor inputs
+    def __init__(self, model, input_names):
+        super().__init__()
+        self.model = model
+        self.input_names = input_names
+
+    def forward(self, *inputs):
+        return self.model(**dict(zip(self.input_names, inputs))).logits
+
+
+class OnnxBackend:
+    # The model is exported to ONNX once per revision and run with ONNX Runtime
+    name = "onnx"
+
+    def __init__(self, tokenizer, model_name, revision):
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError("The onnx backend needs onnxruntime: pip install onnxruntime") from e
+
+        self.tokenizer = tokenizer
+        self.input_names = list(tokenizer.model_input_names)
+        path = os.path.join(ONNX_DIR, f"{model_name.replace('/', '__')}-{revision}.onnx")
+        if not os.path.exists(path):
+            self.export(model_name, revision, path)
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = torch.get_num_threads()
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def export(self, model_name, revision, path):
+        print(f"📦 Exporting {model_name}@{revision} to {path}")
+        model = AutoModelForSequenceClassification.from_pretrained(model_name, revision=revision)
+        model.eval()
+        sample = self.tokenizer(["пример"], return_tensors="pt")
+        inputs = tuple(sample[name] for name in self.input_names)
+        axes = {name: {0: "batch", 1: "sequence"} for name in self.input_names}
+        axes["logits"] = {0: "batch"}
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        torch.onnx.export(
+            _Logits(model, self.input_names), inputs, tmp_path,
+            input_names=self.input_names, output_names=["logits"],
+            dynamic_axes=axes, opset_version=ONNX_OPSET,
+        )
+        os.replace(tmp_path, path)
+
+    def __call__(self, features):
+        batch = self.tokenizer.pad(features, return_tensors="np")
+        feed = {name: batch[name].astype(np.int64) for name in self.input_names}
+        logits = self.session.run(["logits"], feed)[0]
+        logits = logits - logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return (exp / exp.sum(axis=1, keepdims=True)).astype(np.float32)
+
+
+BACKENDS = {backend.name: backend for backend in (EagerBackend, Int8Backend, OnnxBackend)}
+
+
+def create_backend(name, tokenizer, model_name, revision):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown sentiment backend {name!r}; choose from {', '.join(BACKENDS)}")
+    return BACKENDS[name](tokenizer, model_name, revision)
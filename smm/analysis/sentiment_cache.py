@@ -0,0 +1,104 @@
+# sentiment_cache.py
+
+import hashlib
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+# === CONFIG ===
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DB = os.path.join(BASE_DIR, "data", "sentiment_cache.db")
+MAX_ENTRIES = 2_000_000        # LRU bound: least recently used rows go first
+MAX_AGE_DAYS = 180             # Age bound: rows not used for this long are dropped
+SQL_BATCH = 900                # Stay under SQLite's bound-parameter limit
+# Classes with a prob_* column. Rows are always stored by class name; callers
+# say which order their probability vectors use (the model's output order).
+CLASSES = ("negative", "neutral", "positive")
+
+
+def _prob_columns(labels):
+    unknown = [label for label in labels if label not in CLASSES]
+    if unknown or sorted(labels) != sorted(CLASSES):
+        raise ValueError(f"Cache stores {CLASSES}, got probabilities for {list(labels)}")
+    return [f"prob_{label}" for label in labels]
+
+
+def text_key(text, model_name, revision):
+    payload = f"{model_name}\x00{revision}\x00{text}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class SentimentCache:
+    def __init__(self, path=CACHE_DB, max_entries=MAX_ENTRIES, max_age_days=MAX_AGE_DAYS):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS sentiment_cache (
+            key TEXT PRIMARY KEY,
+            label TEXT,
+            prob_negative REAL,
+            prob_neutral REAL,
+            prob_positive REAL,
+            created_at REAL,
+            last_used REAL
+        )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_sentiment_cache_last_used ON sentiment_cache(last_used)")
+        self.conn.commit()
+
+    # Returns {key: (label, probs)} for every key already in the cache, with
+    # probs ordered like `labels`
+    def get_many(self, keys, labels):
+        columns = ", ".join(_prob_columns(labels))
+        found = {}
+        keys = list(dict.fromkeys(keys))
+        now = time.time()
+        for start in range(0, len(keys), SQL_BATCH):
+            chunk = keys[start:start + SQL_BATCH]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(f"""
+                SELECT key, label, {columns}
+                FROM sentiment_cache WHERE key IN ({placeholders})
+            """, chunk).fetchall()
+            for key, label, *probs in rows:
+                found[key] = (label, np.array(probs, dtype=np.float32))
+            self.conn.execute(f"UPDATE sentiment_cache SET last_used = ? WHERE key IN ({placeholders})", [now, *chunk])
+        self.conn.commit()
+        return found
+
+    # probs[i][j] is the probability of labels[j]; it lands in prob_<labels[j]>
+    def put_many(self, keys, predicted, probs, labels):
+        columns = ", ".join(_prob_columns(labels))
+        now = time.time()
+        rows = [
+            (key, label, *(float(x) for x in p), now, now)
+            for key, label, p in zip(keys, predicted, probs)
+        ]
+        self.conn.executemany(f"""
+            INSERT OR REPLACE INTO sentiment_cache
+            (key, label, {columns}, created_at, last_used)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        self.conn.commit()
+
+    def evict(self):
+        cutoff = time.time() - self.max_age_days * 86400
+        expired = self.conn.execute("DELETE FROM sentiment_cache WHERE last_used < ?", (cutoff,)).rowcount
+
+        overflow = self.conn.execute("SELECT COUNT(*) FROM sentiment_cache").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            self.conn.execute("""
+                DELETE FROM sentiment_cache WHERE key IN (
+                    SELECT key FROM sentiment_cache ORDER BY last_used LIMIT ?
+                )
+            """, (overflow,))
+        self.conn.commit()
+        return expired + max(overflow, 0)
+
+    def close(self):
+        self.conn.close()
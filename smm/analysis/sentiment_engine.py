@@ -0,0 +1,281 @@
+# sentiment_engine.py
+
+import atexit
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import torch
+from transformers import AutoConfig, AutoTokenizer
+from tqdm import tqdm
+from analysis.sentiment_backends import create_backend
+from analysis.sentiment_cache import SentimentCache, text_key
+from utils import perf
+from utils.db_utils import CHUNK_SIZE
+
+# === CONFIG ===
+MODEL_NAME = "blanchefort/rubert-base-cased-sentiment"
+# Hub revision to load: a commit sha, or a branch/tag that is resolved to
+# the sha it points at when the model is loaded (model_revision)
+MODEL_REVISION = os.environ.get("SENTIMENT_MODEL_REVISION", "main")
+# Classes the store keeps a p_* column for. Which model output is which
+# class comes from the model's config (model_labels), never from this order.
+SENTIMENTS = ["negative", "neutral", "positive"]
+PROB_COLUMNS = [f"p_{sentiment}" for sentiment in SENTIMENTS]
+BATCH_SIZE = 32
+MAX_LENGTH = 512
+# Worker processes for inference; 1 keeps everything in this process.
+# Threads per worker default to an even split of the machine's cores.
+WORKERS = int(os.environ.get("SENTIMENT_WORKERS", "1"))
+THREADS_PER_WORKER = int(os.environ.get("SENTIMENT_THREADS_PER_WORKER", "0")) or None
+# Below this many texts the pool start-up costs more than it saves
+MIN_PARALLEL_TEXTS = 256
+# Runtime for the model: eager (fp32 PyTorch), int8 (dynamic quantization)
+# or onnx (ONNX Runtime). Compare them with `python -m analysis.sentiment_eval`.
+BACKEND = os.environ.get("SENTIMENT_BACKEND", "eager")
+
+_tokenizer = None
+_labels = None
+_revision = None
+_models = {}
+_pools = {}
+
+
+def _load_config():
+    global _labels, _revision
+    config = AutoConfig.from_pretrained(MODEL_NAME, revision=MODEL_REVISION)
+    labels = [config.id2label[i].lower() for i in range(config.num_labels)]
+    if sorted(labels) != sorted(SENTIMENTS):
+        raise ValueError(f"{MODEL_NAME} predicts {labels}, but the store has columns for {SENTIMENTS}")
+    _labels = labels
+    # Everything else is loaded from this exact commit, so a branch that
+    # moves mid-run cannot mix files from two revisions
+    _revision = config._commit_hash or MODEL_REVISION
+
+
+# Class names in the order of the model's outputs, from config.id2label
+def model_labels():
+    if _labels is None:
+        _load_config()
+    return _labels
+
+
+# Commit sha of the loaded model; cache keys and exports are tied to it
+def model_revision():
+    if _revision is None:
+        _load_config()
+    return _revision
+
+
+def _prob_columns():
+    return [f"p_{label}" for label in model_labels()]
+
+
+def _neutral_probs():
+    return np.eye(len(SENTIMENTS), dtype=np.float32)[model_labels().index("neutral")]
+
+
+def load_model(backend=None):
+    # Tokenizer and model are loaded once per process and shared by every caller
+    global _tokenizer
+    backend = backend or BACKEND
+    revision = model_revision()
+    if _tokenizer is None:
+        _tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME, revision=revision)
+    if backend not in _models:
+        _models[backend] = create_backend(backend, _tokenizer, MODEL_NAME, revision)
+    return _tokenizer, _models[backend]
+
+
+def cache_revision(backend):
+    # Backends agree closely but not exactly, so each keeps its own cache rows
+    backend = backend or BACKEND
+    revision = model_revision()
+    return revision if backend == "eager" else f"{revision}+{backend}"
+
+
+# Run the model over non-empty texts, returning an (n, 3) probability matrix.
+# Inputs are tokenized once, sorted by token length and split into batches
+# so each batch is padded only to its own longest member.
+def _predict(texts, batch_size, desc, backend=None):
+    tokenizer, model = load_model(backend)
+    if not texts:
+        return np.empty((0, len(SENTIMENTS)), dtype=np.float32)
+    probs = np.empty((len(texts), len(SENTIMENTS)), dtype=np.float32)
+    encoded = tokenizer(texts, truncation=True, max_length=MAX_LENGTH)
+    order = sorted(range(len(texts)), key=lambda j: len(encoded["input_ids"][j]))
+
+    for start in tqdm(range(0, len(order), batch_size), desc=desc, disable=desc is None):
+        chunk = order[start:start + batch_size]
+        probs[chunk] = model({key: [encoded[key][j] for j in chunk] for key in encoded.keys()})
+    return probs
+
+
+# Run the block with `threads` torch threads, then give the process its own
+# setting back; None leaves it alone
+@contextmanager
+def torch_threads(threads):
+    if not threads:
+        yield
+        return
+    previous = torch.get_num_threads()
+    torch.set_num_threads(threads)
+    try:
+        yield
+    finally:
+        torch.set_num_threads(previous)
+
+
+def _init_worker(threads, backend):
+    # Each worker pins its own thread count and loads the model once
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    load_model(backend)
+
+
+def _predict_shard(args):
+    texts, batch_size, backend = args
+    return _predict(texts, batch_size, desc=None, backend=backend)
+
+
+def default_threads(workers):
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+# Same as _predict, but the texts are sharded across worker processes.
+# Shards are dealt round-robin from the length-sorted order so every worker
+# gets a similar mix of short and long comments, then merged back by index.
+def _predict_parallel(texts, batch_size, workers, threads_per_worker=None, desc=None, backend=None):
+    threads = threads_per_worker or default_threads(workers)
+    order = sorted(range(len(texts)), key=lambda j: len(texts[j]))
+    shards = [order[w::workers] for w in range(workers)]
+    shards = [shard for shard in shards if shard]
+
+    probs = np.empty((len(texts), len(SENTIMENTS)), dtype=np.float32)
+    pool = _pool(workers, threads, backend)
+    jobs = [([texts[j] for j in shard], batch_size, backend) for shard in shards]
+    for shard, shard_probs in tqdm(
+        zip(shards, pool.map(_predict_shard, jobs)), total=len(shards), desc=desc, disable=desc is None
+    ):
+        probs[shard] = shard_probs
+    return probs
+
+
+# Worker pools outlive a single call so streaming chunks do not reload the
+# model in every worker; they are shut down when the process exits
+def _pool(workers, threads, backend):
+    key = (workers, threads, backend)
+    if key not in _pools:
+        # spawn, not fork: forking a process that already holds torch threads can deadlock
+        context = multiprocessing.get_context("spawn")
+        _pools[key] = ProcessPoolExecutor(
+            max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(threads, backend)
+        )
+    return _pools[key]
+
+
+@atexit.register
+def shutdown_pools():
+    for pool in _pools.values():
+        pool.shutdown()
+    _pools.clear()
+
+
+# The on-disk cache for one classify run: opened once, evicted and closed
+# when the run ends, however many batches it classifies
+@contextmanager
+def cache_session(use_cache=True):
+    if not use_cache:
+        yield None
+        return
+    cache = SentimentCache()
+    try:
+        yield cache
+    finally:
+        with perf.timed("sentiment_cache.evict"):
+            cache.evict()
+        cache.close()
+
+
+# Classify a list of texts, returning (labels, probs) in input order.
+# Texts already scored by this model revision are served from the on-disk
+# cache; only the misses are sent through the model, sharded across
+# `workers` processes when there are enough of them. Pass `cache` from
+# cache_session to share it between calls; otherwise each call opens its own.
+def classify_batch(texts, batch_size=BATCH_SIZE, desc="🔍 Analyzing sentiment", use_cache=True,
+                   workers=None, threads_per_worker=None, backend=None, cache=None):
+    if cache is None and use_cache:
+        with cache_session() as cache:
+            return classify_batch(texts, batch_size, desc, True, workers, threads_per_worker, backend, cache)
+
+    workers = workers or WORKERS
+    backend = backend or BACKEND
+    revision = cache_revision(backend)
+    threads_per_worker = threads_per_worker or THREADS_PER_WORKER
+    started = time.perf_counter()
+    texts = list(texts)
+    probs = np.tile(_neutral_probs(), (len(texts), 1))
+
+    # Empty or non-string inputs are neutral without touching the model
+    todo = [i for i, t in enumerate(texts) if isinstance(t, str) and t.strip()]
+
+    if not use_cache:
+        cache = None
+    if cache is not None and todo:
+        keys = {i: text_key(texts[i], MODEL_NAME, revision) for i in todo}
+        hits = cache.get_many(keys.values(), model_labels())
+        for i in todo:
+            if keys[i] in hits:
+                probs[i] = hits[keys[i]][1]
+        todo = [i for i in todo if keys[i] not in hits]
+        perf.count("sentiment_cache.hit", len(hits))
+        print(f"♻️ Sentiment cache: {len(hits)} hits, {len(todo)} to classify")
+
+    if todo:
+        # Duplicate texts are classified once
+        unique = list(dict.fromkeys(texts[i] for i in todo))
+        with perf.timed(f"sentiment.predict.{backend}", items=len(unique)):
+            if workers > 1 and len(unique) >= MIN_PARALLEL_TEXTS:
+                unique_probs = _predict_parallel(unique, batch_size, workers, threads_per_worker, desc, backend)
+            else:
+                with torch_threads(threads_per_worker):
+                    unique_probs = _predict(unique, batch_size, desc, backend)
+        index = {text: k for k, text in enumerate(unique)}
+        probs[todo] = unique_probs[[index[texts[i]] for i in todo]]
+
+        if cache is not None:
+            cache.put_many(
+                [text_key(t, MODEL_NAME, revision) for t in unique],
+                [model_labels()[k] for k in unique_probs.argmax(axis=1)],
+                unique_probs,
+                model_labels(),
+            )
+
+    labels = [model_labels()[k] for k in probs.argmax(axis=1)]
+    perf.record("sentiment.classify", time.perf_counter() - started, items=len(texts))
+    return labels, probs
+
+
+# Streaming form of classify_batch: label each DataFrame chunk's `column`
+# and add `sentiment` plus one probability column per label. Only one chunk
+# (and its tokenizer output) is held at a time.
+def classify_chunks(chunks, column, use_cache=True, **kwargs):
+    # One cache connection and one eviction pass for the whole stream
+    with cache_session(use_cache) as cache:
+        for chunk in chunks:
+            chunk["sentiment"], probs = classify_batch(
+                chunk[column].tolist(), use_cache=use_cache, cache=cache, **kwargs
+            )
+            # Model output order -> named columns
+            chunk[_prob_columns()] = probs.reshape(-1, len(SENTIMENTS))
+            yield chunk
+
+
+def classify_parallel(texts, workers, threads_per_worker=None, batch_size=BATCH_SIZE, use_cache=True, backend=None):
+    return classify_batch(
+        texts, batch_size=batch_size, use_cache=use_cache, workers=workers, threads_per_worker=threads_per_worker,
+        backend=backend,
+    )
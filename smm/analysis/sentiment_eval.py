@@ -0,0 +1,128 @@
+# sentiment_eval.py
+# Compare sentiment backends on the hand-labelled Instagram comments.
+#
+#   python -m analysis.sentiment_eval --backends eager int8 onnx --tolerance 0.02
+#
+# Every backend runs in a fresh process so load time and peak RSS are its own.
+# Accuracy is measured against the hand labels in data/labels; agreement is
+# the share of all relevant Instagram comments in the store that get the same
+# label as the eager fp32 model.
+
+import argparse
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from analysis.sentiment_engine import BATCH_SIZE, SENTIMENTS
+from analysis.sentiment_backends import BACKENDS
+from analysis.mood_analyser import clean_text
+from utils.db_utils import get_connection
+from utils.perf import peak_rss_mb
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LABELS_PATH = os.path.join(BASE_DIR, "data", "labels", "insta_sentiment_labels.csv")
+TOLERANCE = 0.01
+
+
+def load_labelled(path=LABELS_PATH):
+    # The file is hand-edited; malformed rows are skipped rather than guessed at
+    labels = pd.read_csv(path, on_bad_lines="skip").drop_duplicates("comment")
+    store = pd.read_sql(
+        "SELECT comment FROM comments WHERE source = 'instagram' AND relevant = 1 ORDER BY id", get_connection()
+    )
+    df = pd.concat([labels, store[~store["comment"].isin(labels["comment"])]], ignore_index=True)
+    df["comment"] = df["comment"].apply(clean_text)
+    df = df[df["comment"].astype(bool)]
+    return df["comment"].tolist(), [t if t in SENTIMENTS else None for t in df["true_sentiment"]]
+
+
+def _run_backend(backend, texts, batch_size):
+    from analysis.sentiment_engine import _predict, load_model, model_labels
+
+    started = time.perf_counter()
+    load_model(backend)
+    loaded = time.perf_counter()
+    probs = _predict(texts, batch_size, desc=None, backend=backend)
+    finished = time.perf_counter()
+    return {
+        "labels": [model_labels()[k] for k in probs.argmax(axis=1)],
+        "load_s": loaded - started,
+        "infer_s": finished - loaded,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_isolated(backend, texts, batch_size):
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(_run_backend, (backend, texts, batch_size))
+
+
+def evaluate(backends, path=LABELS_PATH, batch_size=BATCH_SIZE, tolerance=TOLERANCE):
+    texts, truth = load_labelled(path)
+    labelled = [i for i, t in enumerate(truth) if t is not None]
+    print(f"Evaluating on {len(texts)} comments, {len(labelled)} hand-labelled")
+
+    backends = ["eager"] + [b for b in backends if b != "eager"]
+    results = {}
+    for backend in backends:
+        print(f"▶️ {backend}...")
+        try:
+            results[backend] = run_isolated(backend, texts, batch_size)
+        except Exception as e:
+            print(f"⚠️ {backend} failed: {e}")
+
+    if "eager" not in results:
+        raise RuntimeError("The eager reference backend failed; nothing to compare against")
+
+    reference = results["eager"]["labels"]
+
+    def accuracy(labels):
+        if not labelled:
+            return float("nan")
+        return float(np.mean([labels[i] == truth[i] for i in labelled]))
+
+    rows = []
+    base_accuracy = accuracy(reference)
+    for backend, r in results.items():
+        acc = accuracy(r["labels"])
+        agreement = float(np.mean([a == b for a, b in zip(r["labels"], reference)])) if texts else 1.0
+        delta = acc - base_accuracy
+        rows.append({
+            "backend": backend,
+            "accuracy": acc,
+            "accuracy_delta": delta,
+            "agreement": agreement,
+            "load_s": r["load_s"],
+            "infer_s": r["infer_s"],
+            "ms_per_text": 1000 * r["infer_s"] / max(1, len(texts)),
+            "peak_rss_mb": r["peak_rss_mb"],
+            # NaN deltas (no labels) fall back to the agreement check alone
+            "within_tolerance": not (delta < -tolerance) and 1 - agreement <= tolerance,
+        })
+
+    report = pd.DataFrame(rows).set_index("backend")
+    print(report.to_string(float_format=lambda v: f"{v:.3f}"))
+
+    eligible = report[report["within_tolerance"]]
+    best = eligible["infer_s"].idxmin()
+    print(f"✅ Fastest backend within tolerance {tolerance}: {best} (set SENTIMENT_BACKEND={best})")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--labels", default=LABELS_PATH, help="CSV with comment and true_sentiment columns")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="Largest allowed accuracy drop and label disagreement vs eager")
+    args = parser.parse_args()
+    evaluate(args.backends, args.labels, args.batch_size, args.tolerance)
+
+
+if __name__ == "__main__":
+    main()
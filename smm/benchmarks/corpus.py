@@ -0,0 +1,171 @@
+# corpus.py
+# Synthetic Russian/Uzbek news articles, reader comments and Instagram
+# comments in the store's schema, so benchmarks do not depend on whatever
+# the last scrape left in data/.
+#
+#   python -m benchmarks.corpus --rows 1000000 --out /tmp/smm_bench.db
+#
+# The same --rows and --seed always produce the same database.
+
+import argparse
+import os
+import random
+import sqlite3
+import time
+
+from utils.db_utils import init_db, content_hash
+
+SEED = 42
+COMMENTS_PER_ARTICLE = 20
+COMMENTS_PER_POST = 40
+INSTAGRAM_SHARE = 0.6          # Share of comment rows that are Instagram comments
+RELEVANT_SHARE = 0.7           # Share of Instagram posts whose caption has a topic keyword
+WRITE_BATCH = 50_000
+
+RU_WORDS = (
+    "сегодня вчера город власти люди цены работа зарплата школа больница дорога транспорт "
+    "решение вопрос проблема новость закон министерство хоким махалля жители рынок доллар "
+    "очень опять наконец почему зачем никто всегда лучше хуже правильно стыдно спасибо "
+    "молодцы ужасно отлично непонятно давно пора ждём надеюсь странно красиво грязно"
+).split()
+UZ_WORDS = (
+    "bugun kecha shahar odamlar narx ish maosh maktab shifoxona yo'l transport qaror "
+    "muammo yangilik qonun vazirlik mahalla aholi bozor dollar juda yana nihoyat nega "
+    "hech kim doim yaxshi yomon to'g'ri uyat rahmat barakalla zo'r tushunarsiz kutamiz"
+).split()
+TOPIC_WORDS = [
+    "Ташкент", "налоги", "тарифы", "зарплата", "интернет", "реформа", "Toshkent", "soliq", "narx", "maosh",
+]
+OFFTOPIC_WORDS = ["котик", "свадьба", "рецепт", "футбол", "мода", "sayohat", "to'y", "musiqa"]
+EMOJIS = ["😂", "👏", "🔥", "😡", "😢", "❤️", "🙏", "🤔"]
+# Podrobno reactions as they appear on the site
+EMOTIONS = ["Нравится", "Восхищение", "Радость", "Удивление", "Подавленность", "Грусть", "Разочарование", "Не нравится"]
+ACCOUNTS = ["kunuzofficial", "gazetauz", "daryo.uz", "podrobno.uz", "uzreport"]
+
+
+class Corpus:
+    def __init__(self, seed=SEED):
+        self.rng = random.Random(seed)
+
+    def sentence(self, low=4, high=14):
+        words = RU_WORDS if self.rng.random() < 0.6 else UZ_WORDS
+        text = " ".join(self.rng.choices(words, k=self.rng.randint(low, high)))
+        return text[0].upper() + text[1:] + self.rng.choice([".", "!", "?", "..."])
+
+    def comment(self):
+        text = " ".join(self.sentence() for _ in range(self.rng.choices([1, 2, 3, 6], [60, 25, 10, 5])[0]))
+        if self.rng.random() < 0.2:
+            text += " " + self.rng.choice(EMOJIS) * self.rng.randint(1, 3)
+        if self.rng.random() < 0.05:
+            text = f"@{self.rng.choice(ACCOUNTS)} " + text
+        return text
+
+    def article(self):
+        title = self.sentence(5, 10)
+        content = "\n".join(self.sentence(10, 30) for _ in range(self.rng.randint(3, 25)))
+        return title, content
+
+    def caption(self):
+        topic = TOPIC_WORDS if self.rng.random() < RELEVANT_SHARE else OFFTOPIC_WORDS
+        return f"{self.sentence(6, 16)} {self.rng.choice(topic)} {self.sentence(3, 8)}"
+
+
+def comment_texts(n, seed=SEED):
+    corpus = Corpus(seed)
+    return [corpus.comment() for _ in range(n)]
+
+
+def _flush(conn, sql, rows):
+    if rows:
+        conn.executemany(sql, rows)
+        rows.clear()
+
+
+# Build a store with `rows` comment rows in total, split between news
+# comments and Instagram comments. Returns the row counts written.
+def generate(path, rows, seed=SEED):
+    if os.path.exists(path):
+        os.remove(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path)
+    # Generation only: the file is thrown away if anything goes wrong
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    init_db(conn)
+
+    corpus = Corpus(seed)
+    insta_rows = int(rows * INSTAGRAM_SHARE)
+    news_rows = rows - insta_rows
+    n_articles = max(1, news_rows // COMMENTS_PER_ARTICLE)
+    n_posts = max(1, insta_rows // COMMENTS_PER_POST)
+
+    article_sql = "INSERT INTO articles (id, source, url, title, content, content_hash) VALUES (?, ?, ?, ?, ?, ?)"
+    comment_sql = """
+        INSERT OR IGNORE INTO comments
+            (source, article_id, post_url, post_caption, account_name, user, comment, upvotes, downvotes, content_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    emotion_sql = "INSERT OR IGNORE INTO emotions (source, article_id, emotion, count) VALUES (?, ?, ?, ?)"
+
+    articles, comments, emotions = [], [], []
+    for article_id in range(1, n_articles + 1):
+        source = "gazeta" if article_id % 2 else "podrobno"
+        title, content = corpus.article()
+        url = f"https://{source}.example/ru/2025/{article_id}/"
+        articles.append((article_id, source, url, title, content, content_hash(title, content)))
+        for _ in range(COMMENTS_PER_ARTICLE):
+            text = corpus.comment()
+            if source == "gazeta":
+                user = f"user{corpus.rng.randint(1, 50_000)}"
+                up, down = corpus.rng.randint(0, 200), corpus.rng.randint(0, 200)
+                comments.append((source, article_id, None, None, None, user, text, up, down, content_hash(user, text)))
+            else:
+                comments.append((source, article_id, None, None, None, None, text, None, None, content_hash(text)))
+        if source == "podrobno":
+            for emotion in EMOTIONS:
+                emotions.append((source, article_id, emotion, corpus.rng.randint(0, 300)))
+        if len(comments) >= WRITE_BATCH:
+            _flush(conn, article_sql, articles)
+            _flush(conn, comment_sql, comments)
+            _flush(conn, emotion_sql, emotions)
+
+    for post in range(n_posts):
+        account = ACCOUNTS[post % len(ACCOUNTS)]
+        post_url = f"https://www.instagram.com/p/bench{post:08d}/"
+        caption = corpus.caption()
+        for _ in range(COMMENTS_PER_POST):
+            user = f"insta{corpus.rng.randint(1, 200_000)}"
+            text = corpus.comment()
+            comments.append((
+                "instagram", None, post_url, caption, account, user, text, None, None, content_hash(user, text),
+            ))
+        if len(comments) >= WRITE_BATCH:
+            _flush(conn, comment_sql, comments)
+
+    _flush(conn, article_sql, articles)
+    _flush(conn, comment_sql, comments)
+    _flush(conn, emotion_sql, emotions)
+    conn.commit()
+
+    counts = {
+        table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in ("articles", "comments", "emotions")
+    }
+    conn.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000, help="Comment rows to generate (10k to 10M)")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--out", default=os.path.join("data", "bench", "smm_bench.db"))
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = generate(args.out, args.rows, args.seed)
+    print(f"Wrote {counts} to {args.out} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
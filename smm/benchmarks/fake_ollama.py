@@ -0,0 +1,148 @@
+# fake_ollama.py
+# A stand-in for the Ollama HTTP API (/api/chat, streaming and not) with a
+# fixed per-token latency, so LLM round trips can be measured without a GPU
+# or a model download. The tests also use it to inject failures and check
+# concurrency and ordering.
+#
+#   python -m benchmarks.fake_ollama --port 11435 --token-ms 5
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = "Краткий обзор: читатели обсуждают цены и тарифы, настроение в основном негативное."
+PROMPT_TOKENS_PER_CHAR = 1 / 3
+
+
+class FakeOllama:
+    # reply is a string or a function of the prompt; the first `fail_first`
+    # requests are answered with HTTP 500
+    def __init__(self, host="127.0.0.1", port=0, first_token_ms=50, token_ms=5, reply=REPLY, fail_first=0):
+        self.first_token_s = first_token_ms / 1000
+        self.token_s = token_ms / 1000
+        self.reply = reply
+        self.fail_first = fail_first
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path != "/api/chat":
+                    self.send_error(404)
+                    return
+                with fake._lock:
+                    fake.requests += 1
+                    failing = fake.requests <= fake.fail_first
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                try:
+                    if failing:
+                        self.send_error(500, "injected failure")
+                    else:
+                        self._reply(body)
+                finally:
+                    with fake._lock:
+                        fake.in_flight -= 1
+
+            def _reply(self, body):
+                prompt = "".join(m.get("content", "") for m in body.get("messages", []))
+                reply = fake.reply(prompt) if callable(fake.reply) else fake.reply
+                tokens = reply.split(" ") if reply else []
+                prompt_tokens = int(len(prompt) * PROMPT_TOKENS_PER_CHAR) + 1
+                started = time.perf_counter()
+                time.sleep(fake.first_token_s)
+
+                if body.get("stream", True):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.end_headers()
+                    for i, token in enumerate(tokens):
+                        time.sleep(fake.token_s)
+                        piece = token if i == 0 else " " + token
+                        self._write(fake.chunk(body, piece, done=False))
+                    self._write(fake.chunk(body, "", done=True, prompt_tokens=prompt_tokens,
+                                           eval_count=len(tokens), started=started))
+                else:
+                    time.sleep(fake.token_s * len(tokens))
+                    payload = fake.chunk(body, reply, done=True, prompt_tokens=prompt_tokens,
+                                         eval_count=len(tokens), started=started)
+                    data = json.dumps(payload).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+
+            def _write(self, payload):
+                self.wfile.write(json.dumps(payload).encode("utf-8") + b"\n")
+                self.wfile.flush()
+
+        return Handler
+
+    def chunk(self, body, content, done, prompt_tokens=None, eval_count=None, started=None):
+        payload = {
+            "model": body.get("model", "fake"),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "message": {"role": "assistant", "content": content},
+            "done": done,
+        }
+        if done:
+            elapsed_ns = int((time.perf_counter() - started) * 1e9)
+            payload.update({
+                "done_reason": "stop",
+                "total_duration": elapsed_ns,
+                "prompt_eval_count": prompt_tokens,
+                "eval_count": eval_count,
+                "eval_duration": max(1, int(self.token_s * eval_count * 1e9)),
+            })
+        return payload
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--first-token-ms", type=float, default=50)
+    parser.add_argument("--token-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    fake = FakeOllama(port=args.port, first_token_ms=args.first_token_ms, token_ms=args.token_ms)
+    print(f"Fake Ollama listening on {fake.url} (set OLLAMA_HOST={fake.url})")
+    fake.server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+# mock_instagram.py
+# A local stand-in for the Instagram pages the scraper visits: login form,
+# profile grid, post page with a "Load more comments" button. All comment pages,
+# the first included, load through the same JSON endpoint shape the real site
+# uses (/api/v1/media/<id>/comments/), with a configurable delay. Every
+# --block-every'th page is answered with a 429 "Please wait a few minutes" page.
+#
+#   python -m benchmarks.mock_instagram --port 8008 --block-every 25
+#   INSTAGRAM_URL=http://127.0.0.1:8008 python -m scrapers.instagram_scraper
+
+import argparse
+import html
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.corpus import Corpus
+
+BLOCK_TEXT = "Please wait a few minutes before you try again."
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title></head><body>{body}</body></html>"""
+
+POST_SCRIPT = """
+<script>
+const list = document.getElementById("comments");
+let cursor = "";
+async function loadMore() {{
+  const button = document.getElementById("load-more");
+  if (button) button.remove();
+  list.insertAdjacentHTML("afterend", '<svg id="loading" aria-label="Loading..."></svg>');
+  const response = await fetch("/api/v1/media/{media_id}/comments/?min_id=" + cursor);
+  const data = await response.json();
+  for (const c of data.comments) {{
+    const item = document.createElement("li");
+    item.innerHTML = '<ul><li><h3><a href="/' + c.user.username + '/">' + c.user.username +
+      '</a></h3><span class="_ap3a"></span></li></ul>';
+    item.querySelector("span").textContent = c.text;
+    list.appendChild(item);
+  }}
+  document.getElementById("loading").remove();
+  if (data.has_more_comments) {{
+    cursor = data.next_min_id;
+    list.insertAdjacentHTML("afterend", '<svg id="load-more" aria-label="Load more comments" onclick="loadMore()"></svg>');
+  }}
+}}
+loadMore();
+</script>"""
+
+
+class MockInstagram:
+    def __init__(self, host="127.0.0.1", port=0, posts=6, comments=60, page_size=15, load_ms=300,
+                 block_every=0, seed=42):
+        self.posts = posts
+        self.comments = comments
+        self.page_size = page_size
+        self.load_s = load_ms / 1000
+        self.block_every = block_every
+        self.seed = seed
+        self.pages = 0
+        self.api_calls = 0
+        self.blocks = 0
+        self._lock = threading.Lock()
+        self._media = {}
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    # Deterministic post content per media id
+    def media(self, media_id):
+        with self._lock:
+            if media_id not in self._media:
+                corpus = Corpus(self.seed * 1_000_003 + media_id)
+                self._media[media_id] = {
+                    "caption": corpus.caption(),
+                    "comments": [
+                        {
+                            "pk": str(media_id * 100_000 + i),
+                            "text": corpus.comment(),
+                            "created_at": 1_750_000_000 + i * 60,
+                            "user": {"pk": str(1000 + i), "username": f"user_{media_id}_{i}"},
+                        }
+                        for i in range(self.comments)
+                    ],
+                }
+            return self._media[media_id]
+
+    def comments_page(self, media_id, start):
+        media = self.media(media_id)
+        items = media["comments"]
+        page = items[start:start + self.page_size]
+        more = start + self.page_size < len(items)
+        caption = {"pk": str(media_id), "text": media["caption"], "user": {"pk": "1", "username": "mock"}}
+        return {
+            **({"caption": caption} if start == 0 else {}),
+            "comments": page,
+            "comment_count": len(items),
+            "has_more_comments": more,
+            "next_min_id": str(start + self.page_size) if more else None,
+            "status": "ok",
+        }
+
+    def profile_page(self, profile):
+        links = "".join(
+            f'<a href="/p/{profile}{i:03d}/"><img alt="post {i}"></a>' for i in range(self.posts)
+        )
+        return PAGE.format(title=f"@{profile}", body=f'<main><h2>{html.escape(profile)}</h2>{links}</main>')
+
+    def post_page(self, shortcode):
+        media_id = zlib.crc32(shortcode.encode()) % 1_000_000
+        media = self.media(media_id)
+        # Like the real page, the comment list starts empty and every page of
+        # it, the first included, arrives through the comments endpoint
+        body = (
+            f'<article data-media-id="{media_id}"><h1 class="_ap3a">{html.escape(media["caption"])}</h1>'
+            f'<ul id="comments"></ul></article>'
+            + POST_SCRIPT.format(media_id=media_id)
+        )
+        return PAGE.format(title="Instagram post", body=body)
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, content_type="text/html; charset=utf-8"):
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                parts = [p for p in url.path.split("/") if p]
+
+                if parts[:3] == ["api", "v1", "media"] and len(parts) >= 4:
+                    with mock._lock:
+                        mock.api_calls += 1
+                    time.sleep(mock.load_s)
+                    start = int(parse_qs(url.query).get("min_id", ["0"])[0] or 0)
+                    self._send(200, json.dumps(mock.comments_page(int(parts[3]), start)), "application/json")
+                    return
+
+                with mock._lock:
+                    mock.pages += 1
+                    blocked = mock.block_every and mock.pages % mock.block_every == 0
+                    mock.blocks += int(bool(blocked))
+                if blocked:
+                    self._send(429, PAGE.format(title="Error", body=f"<p>{BLOCK_TEXT}</p>"))
+                elif parts[:2] == ["accounts", "login"]:
+                    form = ('<form action="/" method="get"><input name="username"><input name="password" '
+                            'type="password"><button type="submit">Log in</button></form>')
+                    self._send(200, PAGE.format(title="Login", body=form))
+                elif not parts:
+                    self._send(200, PAGE.format(title="Instagram", body='<nav><svg aria-label="Home"></svg></nav>'))
+                elif parts[0] == "p" and len(parts) > 1:
+                    self._send(200, mock.post_page(parts[1]))
+                else:
+                    self._send(200, mock.profile_page(parts[0]))
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8008)
+    parser.add_argument("--posts", type=int, default=6, help="Posts per profile")
+    parser.add_argument("--comments", type=int, default=60, help="Comments per post")
+    parser.add_argument("--page-size", type=int, default=15, help="Comments per 'Load more' page")
+    parser.add_argument("--load-ms", type=float, default=300, help="Latency of each comments API call")
+    parser.add_argument("--block-every", type=int, default=0, help="Answer every Nth page with a 429 (0: never)")
+    args = parser.parse_args()
+
+    mock = MockInstagram(port=args.port, posts=args.posts, comments=args.comments, page_size=args.page_size,
+                         load_ms=args.load_ms, block_every=args.block_every)
+    print(f"Mock Instagram listening on {mock.url} (set INSTAGRAM_URL={mock.url})")
+    mock.server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+# run.py
+# Benchmark suite for the analysis and summarization hot paths, run over a
+# synthetic corpus (benchmarks/corpus.py) and a fake Ollama server.
+#
+#   python -m benchmarks.run --rows 100000 --repeat 5
+#   python -m benchmarks.run --only relevance,aggregate --rows 1000000
+#   python -m benchmarks.run --only aggregate_synthetic --aggregate-rows 1000000
+#   python -m benchmarks.run --compare benchmarks/results/a.json benchmarks/results/b.json
+#
+# The corpus is seeded and every benchmark reports the median of --repeat
+# runs, so results from different commits on the same machine line up.
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DATA_DIR = os.path.join(BASE_DIR, "data", "bench")
+RESULTS_DIR = os.path.join(BASE_DIR, "benchmarks", "results")
+
+BENCHMARKS = {}
+
+
+def benchmark(name, setup=None):
+    # run(ctx) does the measured work and returns the number of items it
+    # processed; setup(ctx), if given, runs untimed before every repeat
+    def register(run):
+        BENCHMARKS[name] = (setup, run)
+        return run
+    return register
+
+
+def _frames(ctx):
+    if "frames" not in ctx:
+        from analysis.mood_analyser import load_data
+        ctx["frames"] = load_data()
+    return ctx["frames"]
+
+
+@benchmark("load_data")
+def bench_load_data(ctx):
+    from analysis.mood_analyser import load_data
+    articles, comments, _ = load_data()
+    return len(articles) + len(comments)
+
+
+def _reset_relevance(ctx):
+    from utils.db_utils import get_connection
+    conn = get_connection()
+    conn.execute("UPDATE comments SET relevance_score = NULL, relevant = NULL WHERE source = 'instagram'")
+    conn.execute("DELETE FROM meta WHERE key = 'relevance_keywords'")
+    conn.commit()
+
+
+@benchmark("relevance", setup=_reset_relevance)
+def bench_relevance(ctx):
+    from analysis.relevance import update_relevance
+    from utils.db_utils import get_connection
+    update_relevance()
+    return get_connection().execute("SELECT COUNT(*) FROM comments WHERE source = 'instagram'").fetchone()[0]
+
+
+@benchmark("clean_text")
+def bench_clean_text(ctx):
+    from analysis.mood_analyser import clean_text
+    comments = _frames(ctx)[1]
+    comments["comment"].apply(clean_text)
+    return len(comments)
+
+
+@benchmark("sentiment")
+def bench_sentiment(ctx):
+    from analysis.sentiment_engine import classify_batch
+    from benchmarks.corpus import comment_texts
+    texts = comment_texts(ctx["sentiment_sample"], ctx["seed"])
+    classify_batch(texts, desc=None, use_cache=False)
+    return len(texts)
+
+
+def _label_comments(ctx):
+    from analysis.mood_analyser import MOODS
+    articles, comments, emotions = _frames(ctx)
+    rng = random.Random(ctx["seed"])
+    comments = comments.copy()
+    comments["sentiment"] = rng.choices(MOODS, k=len(comments))
+    ctx["aggregate_input"] = (articles.copy(), comments, emotions.copy())
+
+
+@benchmark("aggregate", setup=_label_comments)
+def bench_aggregate(ctx):
+    from analysis.mood_analyser import article_moods, comment_counts
+    articles, comments, emotions = ctx["aggregate_input"]
+    article_moods(articles, comment_counts(comments), emotions)
+    return len(comments)
+
+
+def _synthetic_aggregate_input(ctx):
+    # Labelled frames built in memory, so aggregation can be measured at
+    # sizes where generating and loading a corpus would dominate the run
+    if "synthetic_aggregate_input" not in ctx:
+        import numpy as np
+        import pandas as pd
+        from analysis.mood_analyser import EMOJI_SENTIMENT, MOODS
+        from benchmarks.corpus import COMMENTS_PER_ARTICLE
+
+        rng = np.random.default_rng(ctx["seed"])
+        rows = ctx["aggregate_rows"]
+        n_articles = max(1, rows // COMMENTS_PER_ARTICLE)
+        article_ids = np.array([f"{i}{'gazeta' if i % 2 else 'podrobno'}" for i in range(n_articles)], dtype=object)
+        comments = pd.DataFrame({
+            "article_id": article_ids[rng.integers(0, n_articles, rows)],
+            "sentiment": np.array(MOODS, dtype=object)[rng.integers(0, len(MOODS), rows)],
+        })
+        podrobno = article_ids[::2]
+        emotions = pd.DataFrame({
+            "article_id": np.repeat(podrobno, len(EMOJI_SENTIMENT)),
+            "emotion": np.tile(list(EMOJI_SENTIMENT), len(podrobno)),
+            "count": rng.integers(0, 300, len(podrobno) * len(EMOJI_SENTIMENT)),
+        })
+        ctx["synthetic_aggregate_input"] = (pd.DataFrame({"article_id": article_ids}), comments, emotions)
+    articles, comments, emotions = ctx["synthetic_aggregate_input"]
+    ctx["aggregate_input"] = (articles.copy(), comments, emotions.copy())
+
+
+@benchmark("aggregate_synthetic", setup=_synthetic_aggregate_input)
+def bench_aggregate_synthetic(ctx):
+    return bench_aggregate(ctx)
+
+
+@benchmark("prompts")
+def bench_prompts(ctx):
+    import pandas as pd
+    from analysis.article_summarizer import SUMMARY_TEMPLATE
+    from analysis.insta_post_summarizer import build_prompt
+    from analysis.map_reduce import chunk_comments, chunk_text, fits
+    from utils.db_utils import get_connection
+
+    conn = get_connection()
+    posts = pd.read_sql(
+        "SELECT post_url, post_caption, comment FROM comments WHERE source = 'instagram' ORDER BY id", conn
+    )
+    articles = pd.read_sql("SELECT id, content FROM articles ORDER BY id", conn)
+    news = pd.read_sql("SELECT article_id, comment FROM comments WHERE source != 'instagram' ORDER BY id", conn)
+
+    built = 0
+    for (_, caption), group in posts.groupby(["post_url", "post_caption"], sort=False):
+        comments = group["comment"].tolist()
+        block = "".join(f"{i}. {c.strip()}\n" for i, c in enumerate(comments, 1))
+        if not fits(block):
+            chunk_comments(comments)
+        build_prompt(caption, len(comments), block)
+        built += 1
+
+    by_article = news.groupby("article_id")["comment"].apply(list)
+    for article_id, content in zip(articles["id"], articles["content"]):
+        comments = by_article.get(article_id, [])
+        prompt = SUMMARY_TEMPLATE.format(article=content, comments="\n".join(comments))
+        if not fits(prompt):
+            chunk_text(content)
+            chunk_comments(comments)
+        built += 1
+    return built
+
+
+@benchmark("fake_ollama")
+def bench_fake_ollama(ctx):
+    from llm.ollama_pool import chat, run_parallel
+    prompts = [f"Кратко перескажи комментарий номер {i}." for i in range(ctx["llm_requests"])]
+    for _, _, result in run_parallel(
+        lambda p: chat("fake", [{"role": "user", "content": p}]), prompts, concurrency=ctx["llm_concurrency"],
+    ):
+        if isinstance(result, Exception):
+            raise result
+    return len(prompts)
+
+
+@benchmark("fake_ollama_stream")
+def bench_fake_ollama_stream(ctx):
+    from llm.ollama_pool import stream_chat
+    for i in range(max(1, ctx["llm_requests"] // 8)):
+        stream_chat("fake", [{"role": "user", "content": f"Отчёт {i}"}])
+    return max(1, ctx["llm_requests"] // 8)
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=BASE_DIR, capture_output=True, text=True,
+        ).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def run_benchmarks(names, ctx, repeat):
+    results = {}
+    for name in names:
+        setup, run = BENCHMARKS[name]
+        timings, items = [], 0
+        try:
+            for _ in range(repeat):
+                if setup is not None:
+                    setup(ctx)
+                started = time.perf_counter()
+                items = run(ctx)
+                timings.append(time.perf_counter() - started)
+        except ImportError as e:
+            print(f"{name:<20} skipped: {e}")
+            results[name] = {"status": "skipped", "reason": str(e)}
+            continue
+
+        median = statistics.median(timings)
+        results[name] = {
+            "status": "ok",
+            "items": items,
+            "runs_s": timings,
+            "min_s": min(timings),
+            "median_s": median,
+            "items_per_s": items / median if median > 0 else None,
+        }
+        print(f"{name:<20} {items:>10} items  median {median:9.4f}s  min {min(timings):9.4f}s  "
+              f"{items / median if median > 0 else float('inf'):12.1f} items/s")
+    return results
+
+
+def compare(base_path, new_path):
+    with open(base_path, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    if base["meta"]["rows"] != new["meta"]["rows"] or base["meta"]["seed"] != new["meta"]["seed"]:
+        print("⚠️ The two runs used different corpora; timings are not directly comparable")
+
+    print(f"{'benchmark':<20} {'base s':>10} {'new s':>10} {'speedup':>8}")
+    for name, result in new["results"].items():
+        before = base["results"].get(name, {})
+        if result.get("status") != "ok" or before.get("status") != "ok":
+            continue
+        speedup = before["median_s"] / result["median_s"] if result["median_s"] > 0 else float("inf")
+        print(f"{name:<20} {before['median_s']:>10.4f} {result['median_s']:>10.4f} {speedup:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000, help="Comment rows in the synthetic corpus")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", help=f"Comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--regenerate", action="store_true", help="Rebuild the corpus even if it exists")
+    parser.add_argument("--sentiment-sample", type=int, default=1000, help="Texts sent through the model")
+    parser.add_argument("--aggregate-rows", type=int, default=1_000_000,
+                        help="Comment rows for aggregate_synthetic (built in memory, not from the corpus)")
+    parser.add_argument("--llm-requests", type=int, default=64)
+    parser.add_argument("--llm-concurrency", type=int, default=4)
+    parser.add_argument("--token-ms", type=float, default=2, help="Fake Ollama per-token latency")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<commit>-<rows>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="Compare two results files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    # Point the store and the Ollama client at benchmark fixtures before the
+    # modules that read these settings are imported
+    db_path = os.path.join(BENCH_DATA_DIR, f"smm_bench-{args.rows}-{args.seed}.db")
+    os.environ["SMM_DB_PATH"] = db_path
+    from benchmarks.fake_ollama import FakeOllama
+    fake = FakeOllama(token_ms=args.token_ms, first_token_ms=10 * args.token_ms).start()
+    os.environ["OLLAMA_HOST"] = fake.url
+
+    from benchmarks.corpus import generate
+    if args.regenerate or not os.path.exists(db_path):
+        started = time.perf_counter()
+        counts = generate(db_path, args.rows, args.seed)
+        print(f"Generated {counts} in {time.perf_counter() - started:.1f}s -> {db_path}")
+
+    ctx = {
+        "seed": args.seed,
+        "sentiment_sample": args.sentiment_sample,
+        "aggregate_rows": args.aggregate_rows,
+        "llm_requests": args.llm_requests,
+        "llm_concurrency": args.llm_concurrency,
+    }
+    try:
+        results = run_benchmarks(names, ctx, args.repeat)
+    finally:
+        fake.stop()
+
+    commit, dirty = git_revision()
+    report = {
+        "meta": {
+            "commit": commit,
+            "dirty": dirty,
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "rows": args.rows,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "argv": sys.argv,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit or 'nogit'}{'-dirty' if dirty else ''}-{args.rows}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# sentiment_scaling.py
+# Throughput of sharded sentiment inference from 1 worker up to N.
+#
+#   python -m benchmarks.sentiment_scaling --texts 4000 --max-workers 32
+#
+# The cache is bypassed so every run does the same amount of model work.
+
+import argparse
+import os
+import time
+
+from analysis.sentiment_engine import classify_batch, default_threads, load_model, shutdown_pools
+from benchmarks.corpus import comment_texts
+
+
+def worker_counts(max_workers):
+    counts, w = [], 1
+    while w < max_workers:
+        counts.append(w)
+        w *= 2
+    counts.append(max_workers)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads-per-worker", type=int, help="Default: cores / workers")
+    args = parser.parse_args()
+
+    texts = comment_texts(args.texts)
+    load_model()  # Download/load once so the first row is not charged for it
+
+    print(f"{'workers':>7} {'threads':>7} {'seconds':>9} {'texts/s':>9} {'speedup':>8}")
+    baseline = None
+    for workers in worker_counts(args.max_workers):
+        threads = args.threads_per_worker or default_threads(workers)
+        started = time.perf_counter()
+        classify_batch(texts, desc=None, use_cache=False, workers=workers, threads_per_worker=threads)
+        elapsed = time.perf_counter() - started
+        # Each row pays for its own pool start-up, as a one-off run would
+        shutdown_pools()
+        baseline = baseline or elapsed
+        print(f"{workers:>7} {threads:>7} {elapsed:>9.2f} {len(texts) / elapsed:>9.1f} {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,16 @@
 import os
-import sqlite3
 import pandas as pd
 import re
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
-from torch.nn.functional import softmax
-from tqdm import tqdm
-import joblib
 import random
 import scipy as sp
 
-# Import delete_irrelevant function from your analysis module
-from analysis.mood_analyser import delete_irrelevant
+from analysis.relevance import update_relevance
 
-# Initialize tokenizer and model once
-tokenizer = AutoTokenizer.from_pretrained("blanchefort/rubert-base-cased-sentiment")
-model = AutoModelForSequenceClassification.from_pretrained("blanchefort/rubert-base-cased-sentiment")
-
-
-def classify(text):
-    if not isinstance(text, str) or not text.strip():
-        return "neutral"
-    encoded = tokenizer(text, return_tensors='pt', truncation=True, padding=True)
-    with torch.no_grad():
-        logits = model(**encoded).logits
-    pred_class = torch.argmax(softmax(logits, dim=1)).item()
-    # Map index to label:
-    labels = ["negative", "neutral", "positive"]
-    return labels[pred_class]
+from analysis.sentiment_engine import classify_batch
+from utils.db_utils import get_connection
+from utils.snapshots import write_snapshot
 
+LABELS_PATH = os.path.join('data', 'labels', 'insta_sentiment_labels.csv')
 
 
 def clean_text(text):
@@ -39,36 +21,32 @@ def clean_text(text):
     return re.sub(r'\s+', ' ', text).strip()
 
 
-# Enable tqdm progress_apply
-tqdm.pandas()
-
-# Path to Instagram comments DB
-insta_path = "data/instagram_comments.db"
-
-# Clean irrelevant comments from DB (your function)
-delete_irrelevant(insta_path)
+# Flag irrelevant posts and keep only the relevant ones
+conn = get_connection()
+update_relevance(conn)
+insta_comments = pd.read_sql("""
+    SELECT c.*, date(f.fetched_at, 'unixepoch') AS scrape_date
+    FROM comments c LEFT JOIN fetch_state f ON f.url = c.post_url
+    WHERE c.source = 'instagram' AND c.relevant = 1 ORDER BY c.id
+""", conn)
 
-if os.path.exists(insta_path):
-    conn = sqlite3.connect(insta_path)
-    insta_comments = pd.read_sql("SELECT * FROM comments", conn)
-    conn.close()
+# Add metadata columns
+insta_comments['article_id'] = 'insta_' + insta_comments['id'].astype(str)
 
-    # Add metadata columns
-    insta_comments['source'] = 'instagram'
-    insta_comments['article_id'] = 'insta_' + insta_comments['id'].astype(str)
+# Keep only relevant columns, rename if needed
+insta_comments = insta_comments[['article_id', 'source', 'scrape_date', 'comment']]
 
-    # Keep only relevant columns, rename if needed
-    insta_comments = insta_comments[['article_id', 'source', 'comment']]
+# Clean comments
+insta_comments['clean_comment'] = insta_comments['comment'].apply(clean_text)
 
-    # Clean comments
-    insta_comments['clean_comment'] = insta_comments['comment'].apply(clean_text)
+# Classify sentiment in batches
+insta_comments['sentiment'], _ = classify_batch(insta_comments['clean_comment'].tolist())
 
-    # Classify sentiment with progress bar
-    insta_comments['sentiment'] = insta_comments['clean_comment'].progress_apply(classify)
-else:
-    insta_comments = pd.DataFrame(columns=['article_id', 'source', 'comment', 'clean_comment', 'sentiment'])
+# Attach the hand labels (keyed by comment text) for the confusion matrix
+labels = pd.read_csv(LABELS_PATH).drop_duplicates('comment')
+insta_comments = insta_comments.merge(labels, on='comment', how='left')
 
-# Save to CSV
-insta_comments.to_csv('insta_comments.csv', index=False)
+# Save as a Parquet snapshot
+path = write_snapshot(insta_comments, 'insta_comments')
 
-print("Sentiment analysis completed. Results saved to insta_comments.csv")
+print(f"Sentiment analysis completed. Results saved to {path}")
@@ -0,0 +1,106 @@
+# llm_cache.py
+# Content-addressed store of LLM completions shared by every Ollama caller.
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from llm.ollama_pool import chat, TIMEOUT, RETRIES
+from utils import perf
+
+# === CONFIG ===
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DB = os.path.join(BASE_DIR, "data", "llm_cache.db")
+MAX_BYTES = 256 * 1024 * 1024   # Prompts + responses kept before LRU eviction
+
+_lock = threading.Lock()
+_conn = None
+
+
+def cache_key(model, system, prompt, options=None):
+    payload = json.dumps(
+        {"model": model, "system": system, "prompt": prompt, "options": options or {}},
+        ensure_ascii=False, sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _get_conn():
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(CACHE_DB), exist_ok=True)
+        _conn = sqlite3.connect(CACHE_DB, check_same_thread=False)
+        _conn.execute("""
+        CREATE TABLE IF NOT EXISTS completions (
+            key TEXT PRIMARY KEY,
+            model TEXT,
+            system TEXT,
+            prompt TEXT,
+            response TEXT,
+            size INTEGER,
+            created_at REAL,
+            last_used REAL
+        )
+        """)
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_completions_last_used ON completions(last_used)")
+        _conn.commit()
+    return _conn
+
+
+def lookup(key):
+    with _lock:
+        conn = _get_conn()
+        row = conn.execute("SELECT response FROM completions WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+    return row[0] if row else None
+
+
+def store(key, model, system, prompt, response):
+    size = len(system.encode("utf-8")) + len(prompt.encode("utf-8")) + len(response.encode("utf-8"))
+    now = time.time()
+    with _lock:
+        conn = _get_conn()
+        conn.execute("""
+            INSERT OR REPLACE INTO completions (key, model, system, prompt, response, size, created_at, last_used)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (key, model, system, prompt, response, size, now, now))
+        _evict(conn)
+        conn.commit()
+
+
+def _evict(conn, max_bytes=MAX_BYTES):
+    # Drop least recently used completions until the store fits its budget
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+    if total <= max_bytes:
+        return
+    freed = 0
+    victims = []
+    for key, size in conn.execute("SELECT key, size FROM completions ORDER BY last_used"):
+        victims.append((key,))
+        freed += size
+        if total - freed <= max_bytes:
+            break
+    conn.executemany("DELETE FROM completions WHERE key = ?", victims)
+
+
+# Chat completion served from the store when the same model, system prompt,
+# user prompt and options were seen before. Failed calls are not cached.
+def cached_chat(model, system, prompt, options=None, timeout=TIMEOUT, retries=RETRIES):
+    key = cache_key(model, system, prompt, options)
+    response = lookup(key)
+    if response is not None:
+        perf.count("llm_cache.hit")
+        return response
+    perf.count("llm_cache.miss")
+
+    messages = [{"role": "user", "content": prompt}]
+    if system:
+        messages.insert(0, {"role": "system", "content": system})
+    response = chat(model, messages, timeout=timeout, retries=retries, options=options)
+    store(key, model, system, prompt, response)
+    return response
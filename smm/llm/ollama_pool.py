@@ -0,0 +1,109 @@
+# ollama_pool.py
+# Bounded-parallel Ollama chat calls shared by the summarizers.
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import ollama
+from tqdm import tqdm
+
+from utils import perf
+
+# === CONFIG ===
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434")
+# Match the server's OLLAMA_NUM_PARALLEL; more in-flight requests only queue up
+CONCURRENCY = int(os.environ.get("OLLAMA_NUM_PARALLEL", "4"))
+TIMEOUT = 300
+RETRIES = 2
+# How long the server keeps the model loaded after a request, so the next
+# stage does not pay the load time again
+KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+
+_local = threading.local()
+# Caps in-flight requests across all threads, including nested fan-outs
+_slots = threading.BoundedSemaphore(CONCURRENCY)
+
+
+def get_client(timeout=TIMEOUT):
+    # One client per thread so each worker keeps its own HTTP connection
+    client = getattr(_local, "client", None)
+    if client is None or getattr(_local, "timeout", None) != timeout:
+        client = ollama.Client(host=OLLAMA_HOST, timeout=timeout)
+        _local.client, _local.timeout = client, timeout
+    return client
+
+
+def chat(model, messages, timeout=TIMEOUT, retries=RETRIES, keep_alive=KEEP_ALIVE, **kwargs):
+    for attempt in range(retries + 1):
+        try:
+            with _slots, perf.timed("ollama.chat", items=1) as timer:
+                response = get_client(timeout).chat(model=model, messages=messages, keep_alive=keep_alive, **kwargs)
+                timer.add(
+                    prompt_tokens=getattr(response, "prompt_eval_count", None),
+                    completion_tokens=getattr(response, "eval_count", None),
+                )
+            return response["message"]["content"]
+        except Exception as e:
+            if attempt == retries:
+                raise
+            print(f"⚠️ Ollama call failed ({e}), retry {attempt + 1}/{retries}")
+            time.sleep(2 ** attempt)
+
+
+# Stream a chat completion, calling on_token(text) for every chunk as it
+# arrives. Returns (full_text, stats) where stats holds time-to-first-token
+# and generation throughput.
+def stream_chat(model, messages, on_token=None, timeout=TIMEOUT, keep_alive=KEEP_ALIVE, **kwargs):
+    started = time.perf_counter()
+    first_token_at = None
+    parts = []
+    final = None
+
+    for chunk in get_client(timeout).chat(
+        model=model, messages=messages, stream=True, keep_alive=keep_alive, **kwargs
+    ):
+        token = chunk["message"]["content"]
+        if token:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            parts.append(token)
+            if on_token is not None:
+                on_token(token)
+        if chunk["done"]:
+            final = chunk
+
+    finished = time.perf_counter()
+    eval_count = getattr(final, "eval_count", None) or len(parts)
+    eval_duration = getattr(final, "eval_duration", None)
+    # Prefer the server's own generation timing; fall back to wall clock
+    gen_seconds = eval_duration / 1e9 if eval_duration else finished - (first_token_at or started)
+    stats = {
+        "ttft_s": (first_token_at - started) if first_token_at else None,
+        "total_s": finished - started,
+        "prompt_tokens": getattr(final, "prompt_eval_count", None),
+        "completion_tokens": eval_count,
+        "tokens_per_s": eval_count / gen_seconds if gen_seconds > 0 else None,
+    }
+    perf.record(
+        "ollama.stream_chat", stats["total_s"], items=1,
+        prompt_tokens=stats["prompt_tokens"], completion_tokens=eval_count,
+    )
+    return "".join(parts), stats
+
+
+# Apply fn to every item with at most `concurrency` calls in flight.
+# Yields (index, item, result) in completion order; a failed call yields its
+# exception as the result so one bad item does not abort the batch.
+def run_parallel(fn, items, concurrency=CONCURRENCY, desc=None):
+    items = list(items)
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(fn, item): i for i, item in enumerate(items)}
+        for future in tqdm(as_completed(futures), total=len(futures), desc=desc, disable=desc is None):
+            i = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = e
+            yield i, items[i], result
@@ -1,29 +1,52 @@
-import subprocess
+import os
+from llm.ollama_pool import stream_chat
+from llm.llm_cache import cache_key, lookup, store
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROMPT_PATH = os.path.join(BASE_DIR, "reports", "prompt.txt")
+REPORT_PATH = os.path.join(BASE_DIR, "reports", "mood_report.md")
+MODEL = "llama3.1:8b"
+
 
 def generate_report():
-    with open("reports/prompt.txt", "r", encoding="utf-8") as f:
+    with open(PROMPT_PATH, "r", encoding="utf-8") as f:
         prompt = f.read()
 
+    key = cache_key(MODEL, "", prompt)
+    cached = lookup(key)
+    if cached is not None:
+        print("\n=== Russian Mood Report (cached) ===\n")
+        print(cached)
+        tmp_path = REPORT_PATH + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(cached)
+        os.replace(tmp_path, REPORT_PATH)
+        return
+
+    print("\n=== Russian Mood Report ===\n")
+    # Tokens are written to a temp file as they arrive; it replaces the
+    # previous report only once the whole answer is in
+    tmp_path = REPORT_PATH + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            def on_token(token):
+                f.write(token)
+                f.flush()
+                print(token, end="", flush=True)
+
+            report, stats = stream_chat(MODEL, [{"role": "user", "content": prompt}], on_token=on_token)
+
+        if not report.strip():
+            raise RuntimeError(f"No output from Ollama ({MODEL})")
+        os.replace(tmp_path, REPORT_PATH)
+    except BaseException:
+        print("\n=== ️ Ollama error, previous report kept ===\n")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
-    result = subprocess.run(
-        'type prompt.txt | ollama run llama3.1:8b',
-        shell=True,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        encoding="utf-8"
-    )
-
-    stdout = result.stdout.strip()
-    stderr = result.stderr.strip()
-
-    if stdout:
-        print("\n=== Russian Mood Report ===\n")
-        print(stdout)
-        with open("reports/mood_report.md", "w", encoding="utf-8") as f:
-            f.write(stdout)
-    else:
-        print("\n No output from Ollama.")
-
-    if stderr:
-        print("\n=== ️ STDERR from Ollama ===\n")
-        print(stderr)
+    store(key, MODEL, "", prompt, report)
+    ttft = f"{stats['ttft_s']:.2f}s" if stats["ttft_s"] is not None else "n/a"
+    tps = f"{stats['tokens_per_s']:.1f}" if stats["tokens_per_s"] else "n/a"
+    print(f"\n\n⏱️ Time to first token: {ttft}, {stats['completion_tokens']} tokens at {tps} tokens/s")
+    return stats
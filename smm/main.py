@@ -1,38 +1,154 @@
 import argparse
-import subprocess
+import importlib
+import os
 from analysis.mood_analyser import load_data, analyze
+from llm import report_generator
 from llm.report_generator import generate_report
-from analysis.insta_comment_labeler import label
+from analysis import article_summarizer, insta_post_summarizer, mood_analyser, relevance, sentiment_engine
 from analysis.insta_post_summarizer import summarize_insta
 from analysis.article_summarizer import summarize_articles
 from analysis.insta_comment_labeler import insta_sentiment
-def run_pipeline(do_scraping=False, do_analysis=False):
-    if do_scraping:
-        print(" Scraping Instagram...")
-        subprocess.run(["python", "scrapers/instagram_scraper.py"], check=True)
+from analysis.relevance import update_relevance
+from utils import perf
+from utils.pipeline import Pipeline, Stage, query, file, value
 
-        print(" Scraping Podrobno...")
-        subprocess.run(["python", "scrapers/podrobno_scraper.py"], check=True)
+# Fingerprint inputs shared by several stages
+INSTA_COMMENTS = query("SELECT id, post_caption, content_hash FROM comments WHERE source = 'instagram' ORDER BY id")
+RELEVANT_INSTA = query(
+    "SELECT id, content_hash FROM comments WHERE source = 'instagram' AND relevant = 1 ORDER BY id"
+)
+ARTICLES = query("SELECT id, content_hash FROM articles ORDER BY id")
+NEWS_COMMENTS = query("SELECT id, content_hash FROM comments WHERE source != 'instagram' ORDER BY id")
 
-        print(" Scraping Gazeta...")
-        subprocess.run(["python", "scrapers/gazeta_scraper.py"], check=True)
 
-    if do_analysis:
-        print(" Analyzing data...")
-        articles, comments, emotions = load_data()
-        insta_sentiment()
-        analyze(articles, comments, emotions)
-        #summarize_insta()
-        #summarize_articles()
+INSTAGRAM_CREDENTIALS = ["INSTAGRAM_USERNAME", "INSTAGRAM_PASSWORD"]
 
-    print(" Generating report...")
-    generate_report()
+
+def scraper(module, full_rescrape, required_env=(), refresh=False):
+    # Scrapers run incrementally unless a full rebuild or a refresh of
+    # already-fetched pages is requested
+    argv = ["--full"] if full_rescrape else ["--refresh"] if refresh else []
+
+    def run():
+        # Scrapers run side by side in this process, so none of them can ask
+        # for input on the terminal: settings they would prompt for must be
+        # in the environment. Running in-process lets them share the browser
+        # pool, so a session one scraper returns is warm for the next.
+        missing = [name for name in required_env if not os.environ.get(name)]
+        if missing:
+            raise RuntimeError(f"{module} needs {', '.join(missing)} set when run from the pipeline")
+        importlib.import_module(module).run(argv)
+    return run
+
+
+def model_input(backend):
+    # The commit the configured revision resolves to, so a moved branch makes
+    # model-dependent stages stale
+    def feed(digest):
+        value((sentiment_engine.MODEL_NAME, sentiment_engine.cache_revision(backend)))(digest)
+    feed.label = f"{sentiment_engine.MODEL_NAME}@{sentiment_engine.MODEL_REVISION}+{backend}"
+    return feed
+
+
+def build_pipeline(full_rescrape=False, workers=None, threads_per_worker=None, backend=None, chunk_size=None,
+                   refresh=False):
+    backend = backend or sentiment_engine.BACKEND
+    chunk_size = chunk_size or sentiment_engine.CHUNK_SIZE
+    model = model_input(backend)
+
+    def aggregate():
+        articles, comments, emotions = load_data(chunk_size)
+        analyze(articles, comments, emotions, workers=workers, threads_per_worker=threads_per_worker, backend=backend)
+
+    scrapers = ["scrape_instagram", "scrape_podrobno", "scrape_gazeta"]
+    return Pipeline([
+        # Websites cannot be fingerprinted, so scrapers always run when selected
+        Stage(
+            "scrape_instagram", scraper("scrapers.instagram_scraper", full_rescrape, INSTAGRAM_CREDENTIALS, refresh),
+            groups=["scrape"],
+        ),
+        Stage("scrape_podrobno", scraper("scrapers.podrobno_scraper", full_rescrape, refresh=refresh), groups=["scrape"]),
+        Stage("scrape_gazeta", scraper("scrapers.gazeta_scraper", full_rescrape, refresh=refresh), groups=["scrape"]),
+        Stage(
+            "filter", update_relevance, after=scrapers, groups=["analyze"],
+            inputs=[INSTA_COMMENTS, file(relevance.KEYWORDS_FILE), value(relevance.MIN_SCORE)],
+        ),
+        Stage(
+            "classify", lambda: insta_sentiment(
+                workers=workers, threads_per_worker=threads_per_worker, backend=backend, chunk_size=chunk_size
+            ),
+            after=["filter"], groups=["analyze"], inputs=[RELEVANT_INSTA, model, value(mood_analyser.MAJORITY_SQL)],
+        ),
+        # Summaries need a running Ollama server, so they only run when asked for
+        Stage(
+            "summarize_articles", summarize_articles, after=scrapers, groups=["summarize"],
+            inputs=[ARTICLES, NEWS_COMMENTS, value(article_summarizer.MODEL)],
+        ),
+        Stage(
+            "summarize_posts", summarize_insta, after=["filter"], groups=["summarize"],
+            inputs=[RELEVANT_INSTA, value(insta_post_summarizer.OLLAMA_MODEL)],
+        ),
+        Stage(
+            "aggregate", aggregate, after=["classify", "summarize_articles", "summarize_posts"], groups=["analyze"],
+            inputs=[
+                ARTICLES, NEWS_COMMENTS, RELEVANT_INSTA, model,
+                query("SELECT article_id, emotion, count FROM emotions ORDER BY id"),
+                query("SELECT * FROM average_sentiment ORDER BY post_url"),
+                query("SELECT * FROM post_summaries ORDER BY post_url"),
+                query("SELECT * FROM article_summaries ORDER BY source, article_id"),
+            ],
+            outputs=[report_generator.PROMPT_PATH],
+        ),
+        Stage(
+            "report", generate_report, after=["aggregate"], groups=["report"],
+            inputs=[file(report_generator.PROMPT_PATH), value(report_generator.MODEL)],
+            outputs=[report_generator.REPORT_PATH],
+        ),
+    ])
+
+
+def run_pipeline(do_scraping=False, do_analysis=False, full_rescrape=False, workers=None, threads_per_worker=None,
+                 backend=None, stages=None, force=False, run_report=None, prometheus=None, chunk_size=None,
+                 refresh=False):
+    # Subprocesses (inference workers, scrapers started by hand with SMM_RUN_ID)
+    # inherit the run id and report their metrics under it
+    perf.run_id()
+    pipeline = build_pipeline(full_rescrape, workers, threads_per_worker, backend, chunk_size, refresh)
+
+    if stages is None:
+        stages = (["scrape"] if do_scraping else []) + (["analyze"] if do_analysis else []) + ["report"]
+    try:
+        pipeline.run(pipeline.resolve(stages), force=force)
+    finally:
+        # The report is written for failed runs too; those are the ones worth comparing
+        report = perf.build_report(pipeline.status)
+        print(f"📈 Run report: {perf.write_report(report, run_report)}")
+        if prometheus:
+            print(f"📈 Prometheus metrics: {perf.write_prometheus(report, prometheus)}")
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--scrape", action="store_true", help="Run scrapers before analysis")
     parser.add_argument("--analyze", action="store_true", help="Run analysis and report generation")
+    parser.add_argument("--full-rescrape", action="store_true", help="Drop scraper databases and crawl everything again")
+    parser.add_argument("--refresh", action="store_true", help="Re-read pages already fetched and replace their "
+                                                               "stored comments")
+    parser.add_argument("--workers", type=int, help="Sentiment inference processes (default: SENTIMENT_WORKERS or 1)")
+    parser.add_argument("--threads-per-worker", type=int, help="Torch threads per inference process (default: cores / workers)")
+    parser.add_argument("--backend", choices=["eager", "int8", "onnx"], help="Sentiment model runtime (default: SENTIMENT_BACKEND or eager)")
+    parser.add_argument("--chunk-size", type=int, help="Stream comments through classification in chunks of this many "
+                                                       "rows (default: SENTIMENT_CHUNK_SIZE, or whole tables)")
+    parser.add_argument("--stages", help="Comma-separated stages or groups to run instead of --scrape/--analyze "
+                                         "(scrape, filter, classify, summarize, aggregate, report, ...)")
+    parser.add_argument("--force", action="store_true", help="Run selected stages even if their inputs are unchanged")
+    parser.add_argument("--run-report", help="Where to write the JSON run report (default: reports/runs/<run id>.json)")
+    parser.add_argument("--prometheus", help="Also write metrics in Prometheus text format to this file")
     args = parser.parse_args()
 
-    run_pipeline(do_scraping=args.scrape, do_analysis=args.analyze)
+    run_pipeline(
+        do_scraping=args.scrape, do_analysis=args.analyze, full_rescrape=args.full_rescrape, refresh=args.refresh,
+        workers=args.workers, threads_per_worker=args.threads_per_worker, backend=args.backend,
+        stages=args.stages.split(",") if args.stages else None, force=args.force,
+        run_report=args.run_report, prometheus=args.prometheus, chunk_size=args.chunk_size,
+    )
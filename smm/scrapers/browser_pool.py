@@ -0,0 +1,256 @@
+# browser_pool.py
+# Chrome sessions shared by the scrapers. Sessions are started once per
+# source profile, lent to whoever needs a browser and kept warm for the next
+# borrower instead of being quit after every use. Heavy resources (images,
+# video, fonts, ad and tracker scripts) are blocked over CDP, so pages load
+# faster and use less bandwidth.
+#
+#   with POOL.session("gazeta") as driver:
+#       driver.get(url)
+#
+# The pipeline runs the scrapers in one process, so they share POOL. To share
+# one warm browser between runs, or with scrapers started on their own
+# (python -m scrapers.<name>), start it once and point them at it:
+#
+#   python -m scrapers.browser_pool --port 9222
+#   BROWSER_DEBUGGER_ADDRESS=127.0.0.1:9222 python main.py --scrape
+
+import argparse
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import WebDriverException
+
+from utils import perf
+
+# === CONFIG ===
+# Sessions lent out at once per process; borrowers beyond that wait
+POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", "2"))
+# "1"/"0" forces headless on or off for every profile; unset follows the profile
+HEADLESS = os.environ.get("BROWSER_HEADLESS")
+# Attach to an already running Chrome (see above) instead of starting one
+DEBUGGER_ADDRESS = os.environ.get("BROWSER_DEBUGGER_ADDRESS")
+PAGE_LOAD_TIMEOUT = 30
+
+# What each blocking category covers: file extensions (with or without a
+# query string) or URL fragments, turned into Network.setBlockedURLs patterns
+BLOCKED_EXTENSIONS = {
+    "images": ["png", "jpg", "jpeg", "gif", "webp", "avif", "ico", "bmp"],
+    "media": ["mp4", "webm", "m3u8", "mp3", "ogg"],
+    "fonts": ["woff", "woff2", "ttf", "otf", "eot"],
+    "stylesheets": ["css"],
+}
+BLOCKED_HOSTS = {
+    "ads": [
+        "doubleclick.net", "googlesyndication.com", "googletagmanager.com", "google-analytics.com",
+        "adfox.ru", "mc.yandex.ru", "an.yandex.ru", "yandex.ru/ads", "facebook.net", "top-fwz1.mail.ru",
+        "criteo", "adriver.ru",
+    ],
+}
+
+# Per-source session options; keys missing here come from "default".
+# Stylesheets stay on by default: element text and clicks depend on layout.
+PROFILES = {
+    "default": {
+        "headless": True,
+        "undetected": False,
+        "window_size": "1366,900",
+        "block": ["images", "media", "fonts", "ads"],
+        "arguments": [],
+        "capabilities": {},
+    },
+    "gazeta": {},
+    "podrobno": {},
+    # Instagram is driven with undetected_chromedriver in a visible window,
+    # which it is less inclined to challenge; images are left alone for the same reason
+    "instagram": {"headless": False, "undetected": True, "block": ["media", "fonts"]},
+}
+
+
+def profile(source, **overrides):
+    settings = {**PROFILES["default"], **PROFILES.get(source, {}), **overrides}
+    if HEADLESS is not None:
+        settings["headless"] = HEADLESS == "1"
+    # undetected_chromedriver always launches its own patched browser
+    settings["attach"] = bool(DEBUGGER_ADDRESS) and not settings["undetected"]
+    return settings
+
+
+def blocked_patterns(settings):
+    patterns = []
+    for category in settings["block"]:
+        for ext in BLOCKED_EXTENSIONS.get(category, []):
+            patterns += [f"*.{ext}", f"*.{ext}?*"]
+        patterns += [f"*{host}*" for host in BLOCKED_HOSTS.get(category, [])]
+    return patterns
+
+
+# Apply a profile's blocking to the current tab. CDP settings are per tab, so
+# call this again after opening a new one.
+def block_resources(driver, settings):
+    patterns = blocked_patterns(settings)
+    if patterns:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+
+
+def open_tab(driver, settings):
+    driver.switch_to.new_window("tab")
+    block_resources(driver, settings)
+
+
+def _options(settings, module):
+    options = module.ChromeOptions() if module else Options()
+    if settings["attach"]:
+        options.debugger_address = DEBUGGER_ADDRESS
+        return options
+    if settings["headless"] and not module:
+        options.add_argument("--headless=new")
+    options.add_argument(f"--window-size={settings['window_size']}")
+    if "images" in settings["block"]:
+        # Also skip decoding images the URL patterns miss (inline and extension-less)
+        options.add_argument("--blink-settings=imagesEnabled=false")
+    for argument in settings["arguments"]:
+        options.add_argument(argument)
+    for name, capability in settings["capabilities"].items():
+        options.set_capability(name, capability)
+    return options
+
+
+def start_session(settings):
+    with perf.timed("browser.start", items=1):
+        if settings["undetected"]:
+            # Optional dependency, only needed for profiles that ask for it
+            import undetected_chromedriver as uc
+            driver = uc.Chrome(options=_options(settings, uc), headless=settings["headless"])
+        else:
+            driver = webdriver.Chrome(options=_options(settings, None))
+        if settings["attach"]:
+            # A shared browser: work in a tab of our own
+            open_tab(driver, settings)
+        else:
+            block_resources(driver, settings)
+        driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+    return driver
+
+
+def end_session(driver, settings):
+    try:
+        if settings["attach"]:
+            # Close our tab only; the shared browser keeps running
+            driver.close()
+        driver.quit()
+    except Exception as e:
+        print(f"⚠️ Could not close browser session: {e}")
+
+
+class BrowserPool:
+    def __init__(self, size=POOL_SIZE):
+        self.size = size
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = {}         # profile key -> sessions ready to lend
+        self._sessions = {}     # id(driver) -> (driver, settings, profile key)
+
+    # Borrow a session for `source`, starting one if none is idle. Keyword
+    # arguments override the source's profile (sessions are only shared
+    # between borrowers asking for the same settings).
+    def acquire(self, source, **overrides):
+        settings = profile(source, **overrides)
+        key = repr(sorted(settings.items()))
+        self._slots.acquire()
+        with self._lock:
+            idle = self._idle.get(key)
+            driver = idle.pop() if idle else None
+        if driver is not None:
+            perf.count("browser.reuse")
+            return driver
+        try:
+            driver = start_session(settings)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._sessions[id(driver)] = (driver, settings, key)
+        return driver
+
+    def release(self, driver):
+        with self._lock:
+            _, _, key = self._sessions[id(driver)]
+            self._idle.setdefault(key, []).append(driver)
+        self._slots.release()
+
+    # Drop a session that is broken rather than lend it out again
+    def discard(self, driver):
+        with self._lock:
+            _, settings, _ = self._sessions.pop(id(driver))
+        end_session(driver, settings)
+        self._slots.release()
+
+    @contextmanager
+    def session(self, source, **overrides):
+        driver = self.acquire(source, **overrides)
+        try:
+            yield driver
+        except WebDriverException:
+            # The browser itself failed (crashed, hung, lost its tab)
+            self.discard(driver)
+            raise
+        except BaseException:
+            self.release(driver)
+            raise
+        else:
+            self.release(driver)
+
+    # Start `count` sessions ahead of time so the first pages do not pay for it
+    def warm(self, source, count=1, **overrides):
+        drivers = [self.acquire(source, **overrides) for _ in range(count)]
+        for driver in drivers:
+            self.release(driver)
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+            self._idle.clear()
+        for driver, settings, _ in sessions:
+            end_session(driver, settings)
+
+
+POOL = BrowserPool()
+
+
+@atexit.register
+def shutdown_pool():
+    POOL.close()
+
+
+# Keep one headless Chrome running with remote debugging, for scraper
+# processes and runs to attach to through BROWSER_DEBUGGER_ADDRESS
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=9222)
+    parser.add_argument("--profile", default="default", help="Profile whose headless and image settings to use")
+    args = parser.parse_args()
+
+    settings = profile(args.profile, undetected=False)
+    settings["attach"] = False
+    settings["arguments"] = settings["arguments"] + [f"--remote-debugging-port={args.port}"]
+    driver = start_session(settings)
+    print(f"Browser listening on 127.0.0.1:{args.port} (set BROWSER_DEBUGGER_ADDRESS=127.0.0.1:{args.port})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,160 +1,307 @@
 #GazetaUz Scraper
-import sqlite3
-from selenium import webdriver
+import os
+import sys
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
-from urllib.parse import urljoin
-import os
-import time
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from scrapers.browser_pool import POOL, open_tab, profile
+from scrapers.http_fetcher import fetch, fetch_all
+from scrapers.page_extract import GAZETA_SCRIPT, ITEMS_READY_SCRIPT, extract_page, page_links
+from scrapers.html_extract import (
+    GAZETA_LINKS_XPATH, extract_links, extract_next_page, parse_gazeta_article, needs_browser,
+)
+from utils import perf
+from utils.db_utils import (
+    get_connection, close_connections, reset_source, mark_fetch, upsert_article, upsert_gazeta_comments,
+    enqueue, claim, release_claims, frontier_counts, REFRESH_AFTER,
+)
 
-BASE_URL = "https://www.gazeta.uz"
+# Override the base URL to crawl a local fixture server instead of the live site
+BASE_URL = os.environ.get("GAZETA_BASE_URL", "https://www.gazeta.uz")
+LISTING_SELECTOR = "a[href^='/ru/'][href*='/2025/']"
+SOURCE = "gazeta"
+SEED_URL = f"{BASE_URL}/ru/list/news/"
 
-options = Options()
-# options.add_argument("--headless")  # Uncomment to run headless
-options.add_argument("--window-size=1920,1080")
+# Options for the current run, set from its flags by run(). Articles
+# fetched more than MAX_AGE seconds ago are read again.
+MAX_AGE = REFRESH_AFTER
+# Pages are fetched over plain HTTP and parsed with lxml; Chrome is only
+# started for pages that need JavaScript. --browser-only restores the old path.
+USE_HTTP = True
+# Listing pages read per run. --backfill lifts the cap and follows the
+# archive until it ends; an interrupted backfill resumes on the next run.
+MAX_PAGES = int(os.environ.get("GAZETA_MAX_PAGES", 5))
+BACKFILL = False
+# Articles claimed from the frontier at a time, and browser tabs loading
+# fallback pages side by side
+BATCH_SIZE = int(os.environ.get("GAZETA_BATCH_SIZE", 32))
+TABS = int(os.environ.get("GAZETA_TABS", 4))
 
-driver = webdriver.Chrome(options=options)
-wait = WebDriverWait(driver, 5)
+conn = None
+cursor = None
 
-DB_PATH = "data/gazeta_articles.db"
+# Borrowed from the shared pool the first time a page needs JavaScript
+driver = None
+wait = None
+tabs = []
 
 
+def get_driver():
+    global driver, wait
+    if driver is None:
+        driver = POOL.acquire(SOURCE)
+        wait = WebDriverWait(driver, 5)
+        tabs.append(driver.current_window_handle)
+    return driver
 
-if os.path.exists(DB_PATH):
-    print(f"🗑️ Deleting existing database: {DB_PATH}")
-    os.remove(DB_PATH)
 
-conn = sqlite3.connect(DB_PATH)
-conn.execute("PRAGMA encoding = 'UTF-8';")
-cursor = conn.cursor()
+# Close the extra tabs before the session goes back to the pool
+def return_driver():
+    global driver, wait
+    try:
+        for tab in tabs[1:]:
+            driver.switch_to.window(tab)
+            driver.close()
+        driver.switch_to.window(tabs[0])
+    except WebDriverException:
+        drop_driver()
+        return
+    POOL.release(driver)
+    driver = wait = None
+    tabs.clear()
 
-# Create tables if they don't exist
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS articles (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    url TEXT UNIQUE,
-    title TEXT,
-    content TEXT
-)
-""")
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS comments (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    article_id INTEGER,
-    user TEXT,
-    comment TEXT,
-    upvotes INTEGER,
-    downvotes INTEGER,
-    FOREIGN KEY(article_id) REFERENCES articles(id)
-)
-""")
-
-conn.commit()
-
-max_pages = 1  # Set max pages you want to scrape
-current_page = 1
-
-try:
-    driver.get(f"{BASE_URL}/ru/list/news/")
-    wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "a[href^='/ru/'][href*='/2025/']")))
-
-    while current_page <= max_pages:
-        print(f"\nScraping listing page {current_page}...")
-
-        # Find article links on listing page
-        article_elements = driver.find_elements(By.CSS_SELECTOR, "a[href^='/ru/'][href*='/2025/']")
-        article_urls = []
-        for elem in article_elements:
-            href = elem.get_attribute('href')
-            full_url = urljoin(BASE_URL, href)
-            if full_url not in article_urls:
-                article_urls.append(full_url)
-
-        print(f"Found {len(article_urls)} articles on page {current_page}")
-
-        for idx, url in enumerate(article_urls):
-            print(f"  [{idx+1}/{len(article_urls)}] Scraping article: {url}")
-            driver.get(url)
-
-            try:
-                wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "h1#article_title")))
-                title = driver.find_element(By.CSS_SELECTOR, "h1#article_title").text
-            except TimeoutException:
-                print("    ERROR: Article title not found.")
-                title = ""
-
-            try:
-                wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "p[dir='ltr']")))
-                paragraphs = driver.find_elements(By.CSS_SELECTOR, "p[dir='ltr']")
-                content = "\n".join(p.text for p in paragraphs if p.text.strip())
-            except TimeoutException:
-                content = ""
-
-            # Save article info (ignore duplicates)
-            cursor.execute("""
-                INSERT OR IGNORE INTO articles (url, title, content) VALUES (?, ?, ?)
-            """, (url, title, content))
-            conn.commit()
-
-            # Get article id to link comments
-            cursor.execute("SELECT id FROM articles WHERE url = ?", (url,))
-            article_id = cursor.fetchone()[0]
-
-            # Remove old comments before adding new ones
-            cursor.execute("DELETE FROM comments WHERE article_id = ?", (article_id,))
-            conn.commit()
-
-            # Extract comments
-            comments = driver.find_elements(By.CSS_SELECTOR, "div.comment-body")
-            print(f"    Found {len(comments)} comments")
-
-            for comment in comments:
+
+def driver_alive():
+    try:
+        driver.current_window_handle
+        return True
+    except WebDriverException:
+        return False
+
+
+# A session that stopped answering is thrown away rather than pooled; the
+# next page that needs a browser starts a fresh one
+def drop_driver():
+    global driver, wait
+    print("  Browser session died, starting a new one")
+    POOL.discard(driver)
+    driver = wait = None
+    tabs.clear()
+
+
+# === Browser path ===
+def scrape_listing_browser(page_url):
+    with perf.timed("browser.page_load", items=1):
+        get_driver().get(page_url)
+    wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, LISTING_SELECTOR)))
+    return page_links(driver, LISTING_SELECTOR)
+
+
+def browser_tabs():
+    get_driver()
+    # Only tabs opened here: an attached browser may hold other scrapers' tabs
+    while len(tabs) < TABS:
+        open_tab(driver, profile(SOURCE))
+        tabs.append(driver.current_window_handle)
+    return tabs
+
+
+def read_article_browser():
+    for selector in ("h1#article_title", "p[dir='ltr']"):
+        try:
+            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
+        except TimeoutException:
+            pass
+    # Comments rendered client-side arrive after the article itself
+    try:
+        wait.until(lambda d: d.execute_script(ITEMS_READY_SCRIPT, "div.comment-body", ".comments-count"))
+    except TimeoutException:
+        pass
+
+    # Title, body and every comment in one round trip
+    article = extract_page(driver, GAZETA_SCRIPT)
+    if not article["title"]:
+        print("    ERROR: Article title not found.")
+    return article
+
+
+# Load up to TABS articles at once, one per tab, then read each tab in turn.
+# Yields (url, article); a page that fails at any step (tab switch,
+# navigation or reading) yields its exception instead. When the browser
+# itself has died, the rest of the URLs go to a new session.
+def scrape_articles_browser(urls):
+    start = 0
+    while start < len(urls):
+        tabs = browser_tabs()
+        group = list(zip(tabs, urls[start:start + len(tabs)]))
+        start += len(group)
+        errors = {}
+        with perf.timed("browser.page_load", items=len(group)):
+            for tab, url in group:
                 try:
-                    user = comment.find_element(By.CSS_SELECTOR, "h4.comment-user").text
-                    comment_text = comment.find_element(By.CSS_SELECTOR, "p").text
-                    upvotes = comment.find_element(By.CSS_SELECTOR, "span.up-votes-count").text
-                    downvotes = comment.find_element(By.CSS_SELECTOR, "span.down-votes-count").text
-                except Exception as e:
-                    print(f"    Skipping a comment due to error: {e}")
+                    driver.switch_to.window(tab)
+                    # The flag marks the old document, so the wait below
+                    # cannot mistake it for the new one
+                    driver.execute_script("window.__stale = true; window.location.href = arguments[0];", url)
+                except WebDriverException as e:
+                    errors[url] = e
+            for tab, url in group:
+                if url in errors:
                     continue
+                try:
+                    driver.switch_to.window(tab)
+                    wait.until(lambda d: d.execute_script(
+                        "return !window.__stale && document.readyState !== 'loading'"
+                    ))
+                except TimeoutException:
+                    pass
+                except WebDriverException as e:
+                    errors[url] = e
+        for tab, url in group:
+            article = errors.get(url)
+            if article is None:
+                try:
+                    driver.switch_to.window(tab)
+                    article = read_article_browser()
+                except Exception as e:
+                    article = errors[url] = e
+            yield url, article
+        if errors and not driver_alive():
+            drop_driver()
+
+
+# === HTTP path with browser fallback ===
+def scrape_listing(page_url):
+    if USE_HTTP:
+        page = fetch(page_url)
+        if page:
+            article_urls = extract_links(page, BASE_URL, GAZETA_LINKS_XPATH)
+            if article_urls:
+                return article_urls, extract_next_page(page, BASE_URL)
+        print("  Listing not server-rendered, falling back to browser")
+    return scrape_listing_browser(page_url)
 
-                cursor.execute("""
-                    INSERT INTO comments (article_id, user, comment, upvotes, downvotes)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (article_id, user, comment_text, int(upvotes), int(downvotes)))
 
-            conn.commit()
+def scrape_articles(urls):
+    # Fetch the batch concurrently over one connection pool
+    pages = fetch_all(urls) if USE_HTTP else {}
+    fallback = []
+    for url in urls:
+        article = parse_gazeta_article(pages[url]) if pages.get(url) else None
+        if article is None or needs_browser(article):
+            fallback.append(url)
+        else:
+            yield url, article
+    if fallback:
+        if USE_HTTP:
+            print(f"  {len(fallback)} articles need the browser")
+        yield from scrape_articles_browser(fallback)
 
-            # Go back to listing page after each article
-            driver.back()
-            wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "a[href^='/ru/'][href*='/2025/']")))
 
-        # Try to click the Next button on listing page
+def save_article(url, article):
+    with perf.timed("sql.write", items=1 + len(article["comments"])):
+        # Upsert article; content hash tells us whether it changed
+        article_id, changed = upsert_article(cursor, SOURCE, url, article["title"], article["content"])
+        if changed:
+            print("    Article content new or changed")
+
+        print(f"    Found {len(article['comments'])} comments")
+        upsert_gazeta_comments(cursor, article_id, article["comments"])
+
+        conn.commit()
+    mark_fetch(conn, SOURCE, url, "done")
+
+
+# Read listing pages off the frontier, shallowest first, queueing their
+# articles and the next page. A page with new articles may be followed by
+# more, so its next page is read again even if an earlier run saw it.
+def discover():
+    pages = 0
+    while BACKFILL or pages < MAX_PAGES:
+        claimed = claim(conn, SOURCE, "listing")
+        if not claimed:
+            break
+        (page_url, priority), = claimed
+        pages += 1
+        print(f"\nScraping listing page {pages}: {page_url}")
         try:
-            next_button = driver.find_element(By.CSS_SELECTOR, "a.next")
-            print("Clicking Next page...")
-            next_button.click()
-            current_page += 1
-            wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "a[href^='/ru/'][href*='/2025/']")))
-        except NoSuchElementException:
-            print("No more pages. Stopping.")
+            article_urls, next_url = scrape_listing(page_url)
+        except Exception as e:
+            print(f"  Failed to read listing: {e}")
+            mark_fetch(conn, SOURCE, page_url, "failed", error=str(e))
+            if driver is not None and not driver_alive():
+                drop_driver()
+            continue
+
+        # Articles from newer pages are fetched first
+        new = enqueue(conn, SOURCE, article_urls, "article", priority=priority, max_age=MAX_AGE)
+        print(f"Found {len(new)} new articles ({len(article_urls) - len(new)} already known)")
+        if next_url:
+            enqueue(conn, SOURCE, [next_url], "listing", priority=priority - 1, refresh=bool(new))
+        mark_fetch(conn, SOURCE, page_url, "done")
+    perf.count("gazeta.listing_pages", pages)
+
+
+def fetch_articles():
+    fetched = 0
+    while True:
+        batch = [url for url, _ in claim(conn, SOURCE, "article", limit=BATCH_SIZE)]
+        if not batch:
             break
+        for url, article in scrape_articles(batch):
+            fetched += 1
+            print(f"  [{fetched}] {url}")
+            if isinstance(article, Exception):
+                print(f"    Failed to scrape article: {article}")
+                mark_fetch(conn, SOURCE, url, "failed", error=str(article))
+            else:
+                save_article(url, article)
+
+
+# Incremental by default: keep stored rows and skip URLs fetched within
+# SMM_REFRESH_DAYS. Pass --refresh to re-read every article the listing
+# pages show (replacing its stored comments) or --full to drop this
+# source's rows and rebuild.
+def run(argv=()):
+    global conn, cursor, MAX_AGE, USE_HTTP, BACKFILL
+    MAX_AGE = 0 if "--refresh" in argv else REFRESH_AFTER
+    USE_HTTP = "--browser-only" not in argv
+    BACKFILL = "--backfill" in argv
+    conn = get_connection()
+    if "--full" in argv:
+        print(f"🗑️ Dropping stored {SOURCE} data")
+        reset_source(conn, SOURCE)
+    cursor = conn.cursor()
+
+    try:
+        released = release_claims(conn, SOURCE)
+        if released:
+            print(f"Resuming {released} URLs left over from an interrupted run")
+        # The first listing page is re-read every run; it is where new articles appear
+        enqueue(conn, SOURCE, [SEED_URL], "listing", priority=0, refresh=True)
+
+        discover()
+        fetch_articles()
+
+        counts = frontier_counts(conn, SOURCE)
+        print(f"\nScraping finished. Frontier: {counts.get(('article', 'done'), 0)} articles done, "
+              f"{counts.get(('article', 'failed'), 0)} failed, "
+              f"{counts.get(('listing', 'pending'), 0)} listing pages left to backfill.")
+
+    finally:
+        if driver is not None:
+            return_driver()
+        close_connections()
+
 
-    print("\nScraping finished.")
+# Run on its own, metrics go to the run report through a partial file
+def main():
+    try:
+        run(sys.argv[1:])
+    finally:
+        perf.flush_partial(SOURCE)
 
-finally:
-    driver.quit()
-    conn.close()
-def run():
-    # Re-execute the same logic as if running the script directly
-    import __main__
-    if __main__.__file__.endswith("main.py"):
-        # Only run this if called from main pipeline
-        exec(open(__file__, encoding="utf-8").read())
 
 if __name__ == "__main__":
-    run()
+    main()
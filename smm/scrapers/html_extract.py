@@ -0,0 +1,138 @@
+# html_extract.py
+# Parsers for server-rendered Gazeta.uz and Podrobno.uz pages. They pull the
+# same fields the Selenium scrapers read, so both paths fill the same tables.
+
+import re
+from urllib.parse import urljoin
+
+from lxml import html as lxml_html
+
+
+def _text(node):
+    # Collapse whitespace the way a rendered element's .text would
+    return re.sub(r"[ \t\r\f\v]+", " ", node.text_content()).strip()
+
+
+def _first_text(tree, xpath):
+    nodes = tree.xpath(xpath)
+    return _text(nodes[0]) if nodes else ""
+
+
+def _to_int(value):
+    value = value.strip()
+    return int(value) if value.lstrip("-").isdigit() else 0
+
+
+def _class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# Number a counter on the page claims ("12", "12 комментариев"), 0 if absent
+def _advertised(tree, xpath):
+    nodes = tree.xpath(xpath)
+    match = re.search(r"\d+", _text(nodes[0])) if nodes else None
+    return int(match.group()) if match else 0
+
+
+# A mount point a script fills in after load: on the page, but still empty
+def _unfilled(tree, xpath):
+    return any(len(node) == 0 and not _text(node) for node in tree.xpath(xpath))
+
+
+def extract_links(page, base_url, xpath):
+    tree = lxml_html.fromstring(page)
+    links = []
+    seen = set()
+    for href in tree.xpath(xpath):
+        full_url = urljoin(base_url, href)
+        if full_url not in seen:
+            seen.add(full_url)
+            links.append(full_url)
+    return links
+
+
+def extract_next_page(page, base_url):
+    tree = lxml_html.fromstring(page)
+    hrefs = tree.xpath("//a[contains(concat(' ', normalize-space(@class), ' '), ' next ')]/@href")
+    return urljoin(base_url, hrefs[0]) if hrefs else None
+
+
+# === Gazeta.uz ===
+GAZETA_LINKS_XPATH = "//a[starts-with(@href, '/ru/') and contains(@href, '/2025/')]/@href"
+GAZETA_COMMENTS_XPATH = f"//*[@id='comments' or {_class('comments-list')}]"
+GAZETA_COMMENT_COUNT_XPATH = f"//*[{_class('comments-count')}]"
+
+
+def parse_gazeta_article(page):
+    tree = lxml_html.fromstring(page)
+    title = _first_text(tree, "//h1[@id='article_title']")
+    paragraphs = [_text(p) for p in tree.xpath("//p[@dir='ltr']")]
+    content = "\n".join(p for p in paragraphs if p)
+
+    comments = []
+    for body in tree.xpath("//div[contains(concat(' ', normalize-space(@class), ' '), ' comment-body ')]"):
+        user = body.xpath(".//h4[contains(@class, 'comment-user')]")
+        text = body.xpath(".//p")
+        up = body.xpath(".//span[contains(@class, 'up-votes-count')]")
+        down = body.xpath(".//span[contains(@class, 'down-votes-count')]")
+        if not (user and text and up and down):
+            continue
+        comments.append({
+            "user": _text(user[0]),
+            "comment": _text(text[0]),
+            "upvotes": _to_int(_text(up[0])),
+            "downvotes": _to_int(_text(down[0])),
+        })
+
+    deferred = []
+    if _comments_deferred(tree, comments, GAZETA_COMMENTS_XPATH, GAZETA_COMMENT_COUNT_XPATH):
+        deferred.append("comments")
+    return {"title": title, "content": content, "comments": comments, "emotions": [], "deferred": deferred}
+
+
+# === Podrobno.uz ===
+PODROBNO_LINKS_XPATH = "//h2[contains(@class, 'sh-title')]//a/@href | //a[starts-with(@href, '/cat/')]/@href"
+PODROBNO_COMMENTS_XPATH = f"//*[@id='comments' or {_class('comments-list')}]"
+PODROBNO_COMMENT_COUNT_XPATH = f"//*[{_class('comments-count')}]"
+PODROBNO_EMOTIONS_XPATH = f"//div[{_class('pc-emotions')}]"
+
+
+def parse_podrobno_article(page):
+    tree = lxml_html.fromstring(page)
+    title = _first_text(tree, "//h1[contains(@class, 'post-title')]")
+    content = _first_text(tree, "//div[contains(concat(' ', normalize-space(@class), ' '), ' detail-text ')]")
+
+    comments = []
+    for p in tree.xpath("//div[contains(concat(' ', normalize-space(@class), ' '), ' comment-content ')]//p"):
+        text = _text(p)
+        if text:
+            comments.append({"comment": text})
+
+    emotions = []
+    for item in tree.xpath("//div[contains(concat(' ', normalize-space(@class), ' '), ' pc-emotions-item ')]"):
+        name = (item.get("title") or "").strip()
+        counter = item.xpath(".//*[contains(@class, 'pc-emotions-item-counter')]")
+        if name:
+            emotions.append({"emotion": name, "count": _to_int(_text(counter[0])) if counter else 0})
+
+    deferred = []
+    if _comments_deferred(tree, comments, PODROBNO_COMMENTS_XPATH, PODROBNO_COMMENT_COUNT_XPATH):
+        deferred.append("comments")
+    # The reactions widget is on every article; without items it was not rendered yet
+    if not emotions and tree.xpath(PODROBNO_EMOTIONS_XPATH):
+        deferred.append("emotions")
+    return {"title": title, "content": content, "comments": comments, "emotions": emotions, "deferred": deferred}
+
+
+# Comments are rendered client-side when the page counts more than it
+# contains, or when the thread's container came empty
+def _comments_deferred(tree, comments, container_xpath, count_xpath):
+    if len(comments) < _advertised(tree, count_xpath):
+        return True
+    return not comments and _unfilled(tree, container_xpath)
+
+
+# A page whose title or body is missing was most likely rendered client-side,
+# and so were comments or emotions listed in "deferred": the browser reads them
+def needs_browser(article):
+    return not article["title"] or not article["content"] or bool(article.get("deferred"))
@@ -0,0 +1,59 @@
+# http_fetcher.py
+# Pooled asyncio HTTP client for server-rendered pages.
+
+import asyncio
+
+import aiohttp
+
+from utils import perf
+
+# === CONFIG ===
+CONCURRENCY = 8
+TIMEOUT = 20
+RETRIES = 2
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/126.0 Safari/537.36",
+    "Accept-Language": "ru-RU,ru;q=0.9,en;q=0.8",
+}
+
+
+async def _fetch(session, semaphore, url, retries):
+    for attempt in range(retries + 1):
+        async with semaphore:
+            try:
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        return await response.text()
+                    if response.status < 500 and response.status != 429:
+                        print(f"    HTTP {response.status}: {url}")
+                        return None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"    HTTP error on {url}: {e}")
+        await asyncio.sleep(2 ** attempt)
+    return None
+
+
+async def _fetch_all(urls, concurrency, timeout, retries):
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency, ttl_dns_cache=300)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout, headers=HEADERS) as session:
+        pages = await asyncio.gather(*(_fetch(session, semaphore, url, retries) for url in urls))
+    return dict(zip(urls, pages))
+
+
+# Fetch every URL with at most `concurrency` requests in flight over one
+# keep-alive connection pool. Returns {url: html or None}.
+def fetch_all(urls, concurrency=CONCURRENCY, timeout=TIMEOUT, retries=RETRIES):
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+    with perf.timed("http.fetch", items=len(urls)):
+        pages = asyncio.run(_fetch_all(urls, concurrency, timeout, retries))
+    perf.count("http.fetch_failed", sum(page is None for page in pages.values()))
+    return pages
+
+
+def fetch(url, timeout=TIMEOUT, retries=RETRIES):
+    return fetch_all([url], concurrency=1, timeout=timeout, retries=retries)[url]
@@ -0,0 +1,141 @@
+# instagram_payloads.py
+# Parse the JSON responses Instagram's web app fetches for a post's comments,
+# so the scraper can read usernames and texts from the network instead of
+# querying the DOM element by element. Pure functions over decoded JSON; check
+# them offline against the fixtures:
+#
+#   python -m scrapers.instagram_payloads scrapers/fixtures/instagram/*.json
+#
+# Handled shapes:
+#   REST     /api/v1/media/<id>/comments/ and .../child_comments/
+#   GraphQL  data.xdt_api__v1__media__media_id__comments__connection (and the
+#            child_comments variant), data.xdt_api__v1__media__shortcode__web_info
+#   Legacy   data.shortcode_media.edge_media_to_parent_comment
+
+import argparse
+import json
+import re
+
+COMMENT_URL = re.compile(r"/api/v1/media/\d+/comments/|/graphql/query|/api/graphql")
+# GraphQL responses are only read when one of their top-level fields is about
+# comments or the post itself; the page fetches plenty of unrelated queries
+GRAPHQL_FIELDS = re.compile(r"comment|shortcode_media|web_info")
+CAPTION_KEYS = {"caption", "edge_media_to_caption"}
+
+
+def _empty_post():
+    return {"comments": [], "caption": None, "media_id": None, "shortcode": None}
+
+
+def is_comment_response(url, mime_type="application/json"):
+    return bool(COMMENT_URL.search(url)) and (mime_type is None or "json" in mime_type or "javascript" in mime_type)
+
+
+def _as_comment(node, parent_pk=None):
+    user = node.get("user") or node.get("owner")
+    pk = node.get("pk") or node.get("id")
+    text = node.get("text")
+    if not isinstance(user, dict) or not user.get("username") or pk is None or not isinstance(text, str):
+        return None
+    return {
+        "pk": str(pk), "user": user["username"], "comment": text,
+        "created_at": node.get("created_at"), "parent_pk": parent_pk,
+    }
+
+
+def _caption(value):
+    if isinstance(value, dict):
+        if isinstance(value.get("text"), str):
+            return value["text"]
+        edges = value.get("edges") or []
+        if edges and isinstance(edges[0].get("node", {}).get("text"), str):
+            return edges[0]["node"]["text"]
+    return None
+
+
+# Walk a payload depth-first, collecting comment-like objects. Replies nested
+# under a comment keep its pk as parent_pk; captions are comment-shaped too,
+# so they are set aside instead of collected.
+def _walk(value, post, parent_pk=None):
+    if isinstance(value, list):
+        for item in value:
+            _walk(item, post, parent_pk)
+        return
+    if not isinstance(value, dict):
+        return
+
+    if post["media_id"] is None and value.get("media_id") is not None:
+        post["media_id"] = str(value["media_id"])
+    if post["shortcode"] is None and isinstance(value.get("shortcode") or value.get("code"), str):
+        post["shortcode"] = value.get("shortcode") or value.get("code")
+        if post["media_id"] is None and (value.get("pk") or value.get("id")) is not None:
+            post["media_id"] = str(value.get("pk") or value.get("id"))
+
+    comment = _as_comment(value, parent_pk)
+    if comment is not None:
+        post["comments"].append(comment)
+        parent_pk = comment["pk"]
+    # child_comments responses name their parent alongside the replies, in
+    # any key order, so it is resolved before the replies are walked
+    parent = value.get("parent_comment")
+    parent = _as_comment(parent) if isinstance(parent, dict) else None
+    if parent is not None:
+        parent_pk = parent["pk"]
+    for key, child in value.items():
+        if key in CAPTION_KEYS:
+            post["caption"] = post["caption"] or _caption(child)
+        elif key in ("user", "owner", "parent_comment"):
+            continue
+        else:
+            _walk(child, post, parent_pk)
+
+
+def parse_payload(payload, post=None):
+    post = post or _empty_post()
+    data = payload.get("data") if isinstance(payload, dict) else None
+    if isinstance(data, dict):
+        fields = [key for key in data if GRAPHQL_FIELDS.search(key)]
+        for key in fields:
+            _walk(data[key], post)
+    else:
+        _walk(payload, post)
+    return post
+
+
+# Merge every payload captured for one post, keeping the first copy of each comment
+def parse_payloads(payloads):
+    post = _empty_post()
+    for payload in payloads:
+        parse_payload(payload, post)
+    seen = set()
+    unique = []
+    for comment in post["comments"]:
+        if comment["pk"] not in seen:
+            seen.add(comment["pk"])
+            unique.append(comment)
+    post["comments"] = unique
+    return post
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="+", help="Captured JSON responses, one per file")
+    parser.add_argument("--merge", action="store_true", help="Treat the files as one post")
+    args = parser.parse_args()
+
+    groups = [args.paths] if args.merge else [[path] for path in args.paths]
+    for paths in groups:
+        payloads = []
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                payloads.append(json.load(f))
+        post = parse_payloads(payloads)
+        print(f"{', '.join(paths)}: {len(post['comments'])} comments, caption={post['caption']!r:.60}, "
+              f"media_id={post['media_id']}, shortcode={post['shortcode']}")
+        for c in post["comments"]:
+            reply = f" (reply to {c['parent_pk']})" if c["parent_pk"] else ""
+            print(f"  @{c['user']}{reply}: {c['comment'][:80]}")
+
+
+if __name__ == "__main__":
+    main()
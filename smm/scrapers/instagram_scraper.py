@@ -1,69 +1,108 @@
 # instagram_scraper.py
 
-import sqlite3
+import base64
+import json
 import os
+import sys
 import time
 import random
 import re
-from selenium import webdriver
-import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from selenium.common.exceptions import NoSuchElementException, ElementClickInterceptedException, TimeoutException
+from selenium.common.exceptions import (
+    ElementClickInterceptedException, StaleElementReferenceException, TimeoutException,
+)
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from scrapers.browser_pool import POOL
+from scrapers.instagram_payloads import is_comment_response, parse_payloads
+from scrapers.pacing import Pacer
+from utils import perf
+from utils.db_utils import (
+    get_connection, close_connections, reset_source, fetched_urls, mark_pending, mark_fetch,
+    upsert_instagram_comments, REFRESH_AFTER,
+)
 
-USERNAME = input('Instagram Username: ')
-PASSWORD = input('Instagram Password: ')
+# Point at benchmarks/mock_instagram.py to exercise the scraper offline
+INSTAGRAM_URL = os.environ.get('INSTAGRAM_URL', 'https://www.instagram.com').rstrip('/')
+# 'network' reads comments from the JSON responses the page fetches (falling
+# back to the DOM when none were captured); 'dom' reads the rendered list only
+CAPTURE = os.environ.get('INSTAGRAM_CAPTURE', 'network')
 
 TARGET_PROFILES = ['repost.uz', 'uznews', 'upl_uz', 'podrobno.uz']
 ##,
 
-DB_PATH = 'data/instagram_comments.db'
-if os.path.exists(DB_PATH):
-    print(f"🗑️ Deleting existing database: {DB_PATH}")
-    os.remove(DB_PATH)
-
-conn = sqlite3.connect(DB_PATH)
-conn.execute("PRAGMA encoding = 'UTF-8';")
-cursor = conn.cursor()
-
-# Create table
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS comments (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    account_name TEXT,
-    post_url TEXT,
-    post_caption TEXT,
-    username TEXT,
-    comment TEXT
+SOURCE = 'instagram'
+
+# Store, session and already-fetched posts for the current run (set by run())
+conn = None
+cursor = None
+done_urls = set()
+driver = None
+wait = None
+
+# Pages and clicks are paced separately; both speed up while Instagram
+# answers normally and back off when it starts refusing. INSTAGRAM_BACKOFF
+# sets the first pause after a page is refused (shorter against the mock).
+BACKOFF = float(os.environ.get('INSTAGRAM_BACKOFF', 30))
+PAGE_PACER = Pacer('instagram.page', rate=0.25, max_rate=1.0, backoff=BACKOFF)
+CLICK_PACER = Pacer('instagram.click', rate=1.0, max_rate=3.0, backoff=BACKOFF / 3)
+MAX_ATTEMPTS = 3
+# Upper bounds only: waits return as soon as their condition holds
+READY_TIMEOUT = 15
+LOGIN_TIMEOUT = 60
+
+LOAD_MORE = "svg[aria-label='Load more comments']"
+LOADING = "svg[aria-label='Loading...']"
+COMMENT = "ul ul span._ap3a"
+BLOCK_MARKERS = (
+    'Please wait a few minutes', 'Try again later',
+    'Подождите несколько минут', 'Повторите попытку позже',
 )
-""")
-conn.commit()
 
-# Set up browser
-options = uc.ChromeOptions()
-options.add_argument('--no-sandbox')
-options.add_argument('--disable-blink-features=AutomationControlled')
-options.add_argument('--disable-dev-shm-usage')
-options.add_argument('--disable-gpu')
-options.add_argument(f'--window-size={random.randint(1024, 1600)},{random.randint(768, 900)}')
+def block_signal(d):
+    # Why Instagram is refusing us, or None when the page looks normal
+    url = d.current_url
+    if '/challenge/' in url:
+        return 'challenge page'
+    if '/accounts/suspended/' in url:
+        return 'account suspended'
+    text = d.execute_script("return document.body ? document.body.innerText.slice(0, 2000) : ''") or ''
+    return next((f'"{marker}"' for marker in BLOCK_MARKERS if marker in text), None)
 
-driver = uc.Chrome(options=options)
-wait = WebDriverWait(driver, 8)
+# Load url once the pacer allows it and wait until `ready` holds. Block
+# pages trigger a backoff and a retry; returns False when every attempt
+# was refused.
+def open_page(url, ready):
+    for _ in range(MAX_ATTEMPTS):
+        PAGE_PACER.wait()
+        with PAGE_PACER.working(items=1), perf.timed("browser.page_load", items=1):
+            driver.get(url)
+            try:
+                wait.until(EC.any_of(ready, block_signal))
+            except TimeoutException:
+                pass
+        signal = block_signal(driver)
+        if signal is None:
+            PAGE_PACER.success()
+            return True
+        PAGE_PACER.blocked(signal)
+    print(f"    Giving up on {url} after {MAX_ATTEMPTS} refusals")
+    return False
 
 def human_typing(element, text):
     for char in text:
         element.send_keys(char)
         time.sleep(random.uniform(0.05, 0.2))
 
-def login():
-    driver.get("https://www.instagram.com/accounts/login/")
-    wait.until(EC.presence_of_element_located((By.NAME, "username")))
-    human_typing(driver.find_element(By.NAME, "username"), USERNAME)
-    human_typing(driver.find_element(By.NAME, "password"), PASSWORD)
+def login(username, password):
+    if not open_page(f"{INSTAGRAM_URL}/accounts/login/", EC.presence_of_element_located((By.NAME, "username"))):
+        raise RuntimeError("Instagram refused the login page")
+    human_typing(driver.find_element(By.NAME, "username"), username)
+    human_typing(driver.find_element(By.NAME, "password"), password)
     driver.find_element(By.NAME, "password").send_keys(Keys.RETURN)
-    time.sleep(random.uniform(10, 12))
+    # Logged in once the browser has left the login form (2FA may take a while)
+    WebDriverWait(driver, LOGIN_TIMEOUT).until(lambda d: '/accounts/login' not in d.current_url)
 
 def is_emojis(text):
     # Remove all emoji-like unicode symbols and whitespace
@@ -77,9 +116,78 @@ def less_than_twelve(text):
 def is_mention_only(text):
     return re.fullmatch(r"(?:@\w+\s*)+", text.strip()) is not None
 
+def keep_comment(text):
+    return not (is_emojis(text) or less_than_twelve(text) or is_mention_only(text))
+
+# Comment payloads the page received since the performance log was last
+# drained, decoded. Bodies are read over CDP while the tab still holds them.
+def capture_payloads():
+    payloads = []
+    for entry in driver.get_log('performance'):
+        message = json.loads(entry['message'])['message']
+        if message.get('method') != 'Network.responseReceived':
+            continue
+        response = message['params']['response']
+        if not is_comment_response(response.get('url', ''), response.get('mimeType')):
+            continue
+        try:
+            body = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': message['params']['requestId']})
+            text = base64.b64decode(body['body']).decode('utf-8') if body.get('base64Encoded') else body['body']
+            payloads.append(json.loads(text))
+        except Exception:
+            # Evicted from the buffer or not JSON after all (e.g. a "for (;;);" guard)
+            continue
+    perf.count("instagram.network_payloads", len(payloads))
+    return payloads
+
+# (username, comment) pairs from the rendered comment list
+def dom_comments():
+    pairs = []
+    for comment in driver.find_elements(By.CSS_SELECTOR, COMMENT):
+        try:
+            parent = comment.find_element(By.XPATH, "./ancestor::li[1]")
+            commenter = parent.find_element(By.XPATH, ".//h3//a[starts-with(@href, '/')]").text
+        except:
+            commenter = "(unknown)"
+        pairs.append((commenter, comment.text))
+    return pairs
+
+# Click "Load more comments" until it is gone. Each click waits for new
+# comments to render (or the button to disappear) instead of a fixed sleep.
+def load_all_comments():
+    clicks = 0
+    while True:
+        buttons = driver.find_elements(By.CSS_SELECTOR, LOAD_MORE)
+        if not buttons:
+            if not driver.find_elements(By.CSS_SELECTOR, LOADING):
+                return clicks
+            # A page of comments is still on its way (the first one loads by itself)
+            try:
+                wait.until(lambda d: not d.find_elements(By.CSS_SELECTOR, LOADING))
+            except TimeoutException:
+                return clicks
+            continue
+        before = len(driver.find_elements(By.CSS_SELECTOR, COMMENT))
+        CLICK_PACER.wait()
+        try:
+            with CLICK_PACER.working(items=1):
+                driver.execute_script("arguments[0].scrollIntoView(true);", buttons[0])
+                buttons[0].click()
+                wait.until(lambda d: len(d.find_elements(By.CSS_SELECTOR, COMMENT)) > before or (
+                    not d.find_elements(By.CSS_SELECTOR, LOAD_MORE) and not d.find_elements(By.CSS_SELECTOR, LOADING)
+                ))
+        except (ElementClickInterceptedException, StaleElementReferenceException):
+            # Re-rendered or covered mid-click; look for the button again
+            continue
+        except TimeoutException:
+            CLICK_PACER.blocked(block_signal(driver) or "comments stopped loading")
+            return clicks
+        CLICK_PACER.success()
+        clicks += 1
+
 def scrape_posts(username):
-    driver.get(f"https://www.instagram.com/{username}/")
-    time.sleep(random.uniform(3, 6))
+    if not open_page(f"{INSTAGRAM_URL}/{username}/", EC.presence_of_element_located((By.CSS_SELECTOR, "a[href*='/p/']"))):
+        return
 
     #for y in range(1000, 6000, 1000):
      #   driver.execute_script(f"window.scrollTo(0, {y});")
@@ -87,11 +195,21 @@ def scrape_posts(username):
 
     posts = driver.find_elements(By.CSS_SELECTOR, "a[href*='/p/']")
     post_links = [post.get_attribute('href') for post in posts]
-    print(f"Found {len(post_links)} posts for @{username}")
+    skipped = [link for link in post_links if link in done_urls]
+    post_links = [link for link in post_links if link not in done_urls]
+    print(f"Found {len(post_links)} new posts for @{username} ({len(skipped)} already fetched)")
+    mark_pending(conn, SOURCE, post_links)
 
     for link in post_links:
-        driver.get(link)
-        time.sleep(random.uniform(2, 6))
+        if CAPTURE == 'network':
+            driver.get_log('performance')  # drop events from earlier pages
+        post_ready = EC.any_of(
+            EC.presence_of_element_located((By.CSS_SELECTOR, 'h1._ap3a')),
+            EC.presence_of_element_located((By.CSS_SELECTOR, COMMENT)),
+        )
+        if not open_page(link, post_ready):
+            mark_fetch(conn, SOURCE, link, "failed", error="blocked")
+            continue
 
         try:
             caption = driver.find_element(By.CSS_SELECTOR, 'h1._ap3a').text
@@ -99,49 +217,77 @@ def scrape_posts(username):
             caption = ""
 
         # Load more comments
-        while True:
-            try:
-                load_more = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "svg[aria-label='Load more comments']")))
-                driver.execute_script("arguments[0].scrollIntoView(true);", load_more)
-                time.sleep(random.uniform(3, 6))
-                load_more.click()
-            except (TimeoutException, ElementClickInterceptedException):
-                break
+        load_all_comments()
 
         try:
-            comment_elements = driver.find_elements(By.CSS_SELECTOR, "ul ul span._ap3a")
-            print(f"    Found {len(comment_elements)} comments on post")
-
-            for comment in comment_elements:
-                try:
-                    parent = comment.find_element(By.XPATH, "./ancestor::li[1]")
-                    username_elem = parent.find_element(By.XPATH, ".//h3//a[starts-with(@href, '/')]")
-                    commenter = username_elem.text
-                except:
-                    commenter = "(unknown)"
-                if is_emojis(comment.text) or less_than_twelve(comment.text) or is_mention_only(comment.text):
-                    continue
-
-                comment_text = comment.text.strip()
-
-                # Insert comment into DB (sentiment is filled in later by mood_analyser)
-                cursor.execute("""
-                    INSERT INTO comments (account_name, post_url, post_caption, username, comment)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (username, link, caption, commenter, comment_text))
+            started = time.perf_counter()
+            post = parse_payloads(capture_payloads()) if CAPTURE == 'network' else None
+            if post and post['comments']:
+                caption = post['caption'] or caption
+                pairs = [(c['user'], c['comment']) for c in post['comments']]
+                print(f"    Captured {len(pairs)} comments from the network")
+            else:
+                pairs = dom_comments()
+                print(f"    Found {len(pairs)} comments on post")
 
+            # One transaction per post (sentiment is filled in later by mood_analyser)
+            rows = [(commenter, text.strip()) for commenter, text in pairs if keep_comment(text)]
+            upsert_instagram_comments(cursor, username, link, caption, rows)
+            saved = len(rows)
             conn.commit()
+            perf.record("instagram.extract_and_write", time.perf_counter() - started, items=saved)
+            mark_fetch(conn, SOURCE, link, "done")
+            done_urls.add(link)
 
         except Exception as e:
             print(f"    Failed to extract comments: {e}")
+            mark_fetch(conn, SOURCE, link, "failed", error=str(e))
+
+# Incremental by default: keep stored rows and skip posts fetched within
+# SMM_REFRESH_DAYS. Pass --refresh to re-read every post (replacing its
+# stored comments) or --full to drop this source's rows and rebuild.
+# Credentials missing from the environment are asked for on the terminal.
+def run(argv=()):
+    global conn, cursor, done_urls, driver, wait
+    username = os.environ.get('INSTAGRAM_USERNAME') or input('Instagram Username: ')
+    password = os.environ.get('INSTAGRAM_PASSWORD') or input('Instagram Password: ')
+
+    conn = get_connection()
+    if "--full" in argv:
+        print(f"🗑️ Dropping stored {SOURCE} data")
+        reset_source(conn, SOURCE)
+    cursor = conn.cursor()
+    done_urls = fetched_urls(conn, SOURCE, 0 if "--refresh" in argv else REFRESH_AFTER)
+
+    # Set up browser: the pool's instagram profile (undetected_chromedriver,
+    # visible window) plus this scraper's own flags
+    driver = POOL.acquire(
+        SOURCE,
+        window_size=f'{random.randint(1024, 1600)},{random.randint(768, 900)}',
+        arguments=['--no-sandbox', '--disable-blink-features=AutomationControlled', '--disable-dev-shm-usage',
+                   '--disable-gpu'],
+        # Network events go to the performance log, where capture_payloads finds them
+        capabilities={'goog:loggingPrefs': {'performance': 'ALL'}},
+    )
+    wait = WebDriverWait(driver, READY_TIMEOUT)
+    try:
+        login(username, password)
+        for account in TARGET_PROFILES:
+            scrape_posts(account)
+    finally:
+        # Also after a failed login or a crashed page, so the session goes
+        # back to the pool
+        POOL.release(driver)
+        print(f"⏱️ {PAGE_PACER.summary()}")
+        print(f"⏱️ {CLICK_PACER.summary()}")
+        close_connections()
 
-def run():
-    login()
-    for account in TARGET_PROFILES:
-        scrape_posts(account)
-        time.sleep(random.randint(2, 6))
-    driver.quit()
-    conn.close()
+# Run on its own, metrics go to the run report through a partial file
+def main():
+    try:
+        run(sys.argv[1:])
+    finally:
+        perf.flush_partial(SOURCE)
 
 if __name__ == "__main__":
-    run()
+    main()
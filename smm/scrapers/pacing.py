@@ -0,0 +1,95 @@
+# pacing.py
+# Request pacing for scrapers: a token bucket that speeds up while the site
+# answers normally and backs off exponentially when it pushes back.
+#
+#   pacer = Pacer("instagram.page", rate=0.3)
+#   pacer.wait()                 # blocks until the next request may go out
+#   with pacer.working():
+#       driver.get(url)
+#   pacer.blocked("rate limited") if blocked else pacer.success()
+#
+# Time spent in wait() and working() is recorded as <name>.wait and
+# <name>.work in the run report, so a run shows how much of it was sleeping.
+
+import random
+import time
+from contextlib import contextmanager
+
+from utils import perf
+
+
+class Pacer:
+    def __init__(self, name, rate=0.5, burst=1, min_rate=0.02, max_rate=2.0, increase=0.05, decrease=0.5,
+                 backoff=30.0, max_backoff=900.0, jitter=0.25, clock=time.monotonic, sleep=time.sleep):
+        self.name = name
+        self.rate = rate                # requests per second
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase        # added to the rate after each success
+        self.decrease = decrease        # rate multiplier after a block
+        self.backoff = backoff          # first pause after a block, doubled per consecutive block
+        self.max_backoff = max_backoff
+        self.jitter = jitter            # up to this fraction is added to every delay
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = burst
+        self.failures = 0
+        self.blocked_until = 0.0
+        self.waited = 0.0
+        self.worked = 0.0
+        self._last = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+        return now
+
+    def delay(self):
+        # Seconds until a request may go out: the rest of a backoff, or until
+        # the bucket holds a token again (plus jitter)
+        now = self._refill()
+        if self.blocked_until > now:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate * (1 + random.uniform(0, self.jitter))
+
+    def wait(self):
+        delay = self.delay()
+        if delay > 0:
+            self.sleep(delay)
+            self.waited += delay
+            perf.record(f"{self.name}.wait", delay)
+            self._refill()
+        self.tokens = max(0.0, self.tokens - 1)
+        return delay
+
+    @contextmanager
+    def working(self, items=0):
+        started = self.clock()
+        try:
+            with perf.timed(f"{self.name}.work", items=items) as timer:
+                yield timer
+        finally:
+            self.worked += self.clock() - started
+
+    def success(self):
+        self.failures = 0
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def blocked(self, reason=""):
+        self.failures += 1
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        pause = min(self.max_backoff, self.backoff * 2 ** (self.failures - 1)) * (1 + random.uniform(0, self.jitter))
+        self.blocked_until = self.clock() + pause
+        self.tokens = 0.0
+        perf.count(f"{self.name}.blocked")
+        print(f"⏳ {self.name}: {reason or 'blocked'}, backing off {pause:.0f}s (rate now {self.rate:.2f}/s)")
+        return pause
+
+    def summary(self):
+        total = self.waited + self.worked
+        share = self.waited / total if total else 0.0
+        return f"{self.name}: waited {self.waited:.1f}s, worked {self.worked:.1f}s ({share:.0%} waiting)"
@@ -0,0 +1,82 @@
+# page_extract.py
+# In-page extraction for the Selenium fallback. Each script runs once per page
+# with execute_script and returns every field as one JSON string, instead of a
+# chromedriver round trip per element and attribute. Results have the same
+# shape as the html_extract parsers, so both paths fill the same tables.
+
+import json
+
+from utils import perf
+
+# Shared helpers: rendered text like WebElement.text, integers like html_extract._to_int
+HELPERS = """
+const text = (root, selector) => {
+  const node = selector ? root.querySelector(selector) : root;
+  return node ? (node.innerText || node.textContent || "").trim() : null;
+};
+const toInt = value => /^-?\\d+$/.test((value || "").trim()) ? parseInt(value, 10) : 0;
+"""
+
+# Links matching arguments[0] (absolute, first occurrence kept) and the a.next link
+LINKS_SCRIPT = HELPERS + """
+const seen = new Set();
+const links = [];
+for (const a of document.querySelectorAll(arguments[0])) {
+  if (a.href && !seen.has(a.href)) {
+    seen.add(a.href);
+    links.push(a.href);
+  }
+}
+const next = document.querySelector("a.next");
+return JSON.stringify({links: links, next: next && next.href ? next.href : null});
+"""
+
+# True once the page holds as many arguments[0] items as the arguments[1]
+# counter claims, for comments a script renders after the page loads
+ITEMS_READY_SCRIPT = HELPERS + """
+const match = (text(document, arguments[1]) || "").match(/\\d+/);
+return document.querySelectorAll(arguments[0]).length >= (match ? parseInt(match[0], 10) : 0);
+"""
+
+GAZETA_SCRIPT = HELPERS + """
+const comments = [];
+for (const body of document.querySelectorAll("div.comment-body")) {
+  const user = text(body, "h4.comment-user"), comment = text(body, "p");
+  const up = text(body, "span.up-votes-count"), down = text(body, "span.down-votes-count");
+  if (user === null || comment === null || up === null || down === null) continue;
+  comments.push({user: user, comment: comment, upvotes: toInt(up), downvotes: toInt(down)});
+}
+const paragraphs = Array.from(document.querySelectorAll("p[dir='ltr']"), p => text(p)).filter(p => p);
+return JSON.stringify({
+  title: text(document, "h1#article_title") || "",
+  content: paragraphs.join("\\n"),
+  comments: comments,
+  emotions: [],
+});
+"""
+
+PODROBNO_SCRIPT = HELPERS + """
+const comments = Array.from(document.querySelectorAll("div.comment-content p"), p => text(p))
+  .filter(c => c).map(c => ({comment: c}));
+const emotions = [];
+for (const item of document.querySelectorAll("div.pc-emotions-item")) {
+  const name = (item.getAttribute("title") || "").trim();
+  if (name) emotions.push({emotion: name, count: toInt(text(item, ".pc-emotions-item-counter"))});
+}
+return JSON.stringify({
+  title: text(document, "h1.post-title") || "",
+  content: text(document, "div.detail-text") || "",
+  comments: comments,
+  emotions: emotions,
+});
+"""
+
+
+def extract_page(driver, script, *args):
+    with perf.timed("browser.extract", items=1):
+        return json.loads(driver.execute_script(script, *args))
+
+
+def page_links(driver, selector):
+    page = extract_page(driver, LINKS_SCRIPT, selector)
+    return page["links"], page["next"]
@@ -1,130 +1,168 @@
-import sqlite3
-import time
-from urllib.parse import urljoin
-from selenium import webdriver
+import os
+import sys
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-import os
-
-BASE_URL = "https://podrobno.uz"
-
-# --- Setup Selenium ---
-options = Options()
-# options.add_argument("--headless")  # Uncomment to run headless
-options.add_argument("--window-size=1920,1080")
-driver = webdriver.Chrome(options=options)
-wait = WebDriverWait(driver, 7)
-
-# --- Setup SQLite ---
-DB_PATH = "data/podrobno_articles.db"
-if os.path.exists(DB_PATH):
-    print(f"🗑️ Deleting existing database: {DB_PATH}")
-    os.remove(DB_PATH)
-conn = sqlite3.connect(DB_PATH)
-conn.execute("PRAGMA encoding = 'UTF-8';")
-cursor = conn.cursor()
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS articles (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    url TEXT UNIQUE,
-    title TEXT,
-    content TEXT
+from selenium.common.exceptions import TimeoutException
+from scrapers.browser_pool import POOL
+from scrapers.http_fetcher import fetch, fetch_all
+from scrapers.page_extract import ITEMS_READY_SCRIPT, PODROBNO_SCRIPT, extract_page, page_links
+from scrapers.html_extract import (
+    PODROBNO_LINKS_XPATH, extract_links, parse_podrobno_article, needs_browser,
 )
-""")
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS comments (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    article_id INTEGER,
-    comment TEXT,
-    FOREIGN KEY(article_id) REFERENCES articles(id)
+from utils import perf
+from utils.db_utils import (
+    get_connection, close_connections, reset_source, fetched_urls, mark_pending, mark_fetch,
+    upsert_article, upsert_podrobno_comments, upsert_emotions, REFRESH_AFTER,
 )
-""")
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS emotions (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    article_id INTEGER,
-    emotion TEXT,
-    count INTEGER,
-    FOREIGN KEY(article_id) REFERENCES articles(id)
-)
-""")
-conn.commit()
-
-try:
-    driver.get(BASE_URL)
-    wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "h2.sh-title a, a[href^='/cat/']")))
-
-    article_links = driver.find_elements(By.CSS_SELECTOR, "h2.sh-title a, a[href^='/cat/']")
-    article_urls = list({urljoin(BASE_URL, a.get_attribute("href")) for a in article_links if a.get_attribute("href")})
-
-    print(f"Found {len(article_urls)} articles")
-
-    for idx, url in enumerate(article_urls):
-        print(f"\n[{idx+1}/{len(article_urls)}] Scraping: {url}")
-        driver.get(url)
-        time.sleep(1)
 
+# Override the base URL to crawl a local fixture server instead of the live site
+BASE_URL = os.environ.get("PODROBNO_BASE_URL", "https://podrobno.uz")
+SOURCE = "podrobno"
+LISTING_SELECTOR = "h2.sh-title a, a[href^='/cat/']"
+
+# Pages are fetched over plain HTTP and parsed with lxml; Chrome is only
+# started for pages that need JavaScript. --browser-only restores the old path.
+USE_HTTP = True
+
+# Store and already-fetched articles for the current run (set by run())
+conn = None
+cursor = None
+done_urls = set()
+
+# --- Setup Selenium (lazily, only if a page needs it) ---
+# Sessions come from the shared pool: headless, images and fonts blocked
+driver = None
+wait = None
+
+
+def get_driver():
+    global driver, wait
+    if driver is None:
+        driver = POOL.acquire(SOURCE)
+        wait = WebDriverWait(driver, 7)
+    return driver
+
+
+def scrape_listing_browser():
+    with perf.timed("browser.page_load", items=1):
+        get_driver().get(BASE_URL)
+    wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, LISTING_SELECTOR)))
+    article_urls, _ = page_links(driver, LISTING_SELECTOR)
+    return article_urls
+
+
+def scrape_article_browser(url):
+    with perf.timed("browser.page_load", items=1):
+        get_driver().get(url)
+
+    # The article first, then the comments and reactions its scripts render
+    # after load; each wait returns as soon as its condition holds
+    for ready in (
+        EC.presence_of_element_located((By.CSS_SELECTOR, "h1.post-title")),
+        lambda d: d.execute_script(ITEMS_READY_SCRIPT, "div.comment-content p", ".comments-count"),
+        lambda d: d.execute_script(
+            "return !document.querySelector('div.pc-emotions') || !!document.querySelector('div.pc-emotions-item')"
+        ),
+    ):
         try:
-            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "h1.post-title")))
-            title = driver.find_element(By.CSS_SELECTOR, "h1.post-title").text.strip()
+            wait.until(ready)
         except TimeoutException:
-            print("   Title not found.")
-            title = ""
+            pass
+
+    # Title, body, comments and emotion counters in one round trip
+    article = extract_page(driver, PODROBNO_SCRIPT)
+    if not article["title"]:
+        print("   Title not found.")
+    if not article["content"]:
+        print("   Content not found.")
+    return article
+
+
+def scrape_listing():
+    if USE_HTTP:
+        page = fetch(BASE_URL)
+        if page:
+            article_urls = extract_links(page, BASE_URL, PODROBNO_LINKS_XPATH)
+            if article_urls:
+                return article_urls
+        print("Listing not server-rendered, falling back to browser")
+    return scrape_listing_browser()
+
+
+def save_article(url, article):
+    with perf.timed("sql.write", items=1 + len(article["comments"]) + len(article["emotions"])):
+        article_id, changed = upsert_article(cursor, SOURCE, url, article["title"], article["content"])
+        if changed:
+            print("   Article content new or changed")
 
-        try:
-            content_div = driver.find_element(By.CSS_SELECTOR, "div.detail-text")
-            content = content_div.text.strip()
-        except NoSuchElementException:
-            print("   Content not found.")
-            content = ""
+        # --- Comments ---
+        print(f"   Found {len(article['comments'])} comments")
+        upsert_podrobno_comments(cursor, article_id, article["comments"])
+
+        # --- Emotions ---
+        print(f"   Found {len(article['emotions'])} emotional reactions")
+        upsert_emotions(cursor, SOURCE, article_id, article["emotions"])
 
-        cursor.execute("INSERT OR IGNORE INTO articles (url, title, content) VALUES (?, ?, ?)", (url, title, content))
         conn.commit()
 
-        cursor.execute("SELECT id FROM articles WHERE url = ?", (url,))
-        article_id = cursor.fetchone()[0]
+    mark_fetch(conn, SOURCE, url, "done")
+    done_urls.add(url)
 
-        # --- Comments ---
-        cursor.execute("DELETE FROM comments WHERE article_id = ?", (article_id,))
-        comment_blocks = driver.find_elements(By.CSS_SELECTOR, "div.comment-content p")
-        print(f"   Found {len(comment_blocks)} comments")
 
-        for comment_block in comment_blocks:
-            comment = comment_block.text.strip()
-            if comment:
-                cursor.execute("INSERT INTO comments (article_id, comment) VALUES (?, ?)", (article_id, comment))
+# Incremental by default: keep stored rows and skip URLs fetched within
+# SMM_REFRESH_DAYS. Pass --refresh to re-read every article (replacing its
+# stored comments) or --full to drop this source's rows and rebuild.
+def run(argv=()):
+    global conn, cursor, done_urls, driver, USE_HTTP
+    USE_HTTP = "--browser-only" not in argv
+    conn = get_connection()
+    if "--full" in argv:
+        print(f"🗑️ Dropping stored {SOURCE} data")
+        reset_source(conn, SOURCE)
+    cursor = conn.cursor()
+    done_urls = fetched_urls(conn, SOURCE, 0 if "--refresh" in argv else REFRESH_AFTER)
 
-        # --- Emotions ---
-        cursor.execute("DELETE FROM emotions WHERE article_id = ?", (article_id,))
-        emotion_blocks = driver.find_elements(By.CSS_SELECTOR, "div.pc-emotions-item")
-        print(f"   Found {len(emotion_blocks)} emotional reactions")
+    try:
+        article_urls = scrape_listing()
+
+        skipped = [url for url in article_urls if url in done_urls]
+        article_urls = [url for url in article_urls if url not in done_urls]
+        print(f"Found {len(article_urls)} new articles ({len(skipped)} already fetched)")
+        mark_pending(conn, SOURCE, article_urls)
 
-        for emotion_block in emotion_blocks:
+        # Fetch all articles concurrently over one connection pool
+        pages = fetch_all(article_urls) if USE_HTTP else {}
+
+        for idx, url in enumerate(article_urls):
+            print(f"\n[{idx+1}/{len(article_urls)}] Scraping: {url}")
             try:
-                emotion_name = emotion_block.get_attribute("title").strip()
-                emotion_count = emotion_block.find_element(By.CSS_SELECTOR, ".pc-emotions-item-counter").text.strip()
-                count = int(emotion_count) if emotion_count.isdigit() else 0
-                cursor.execute("INSERT INTO emotions (article_id, emotion, count) VALUES (?, ?, ?)", (article_id, emotion_name, count))
+                article = parse_podrobno_article(pages[url]) if pages.get(url) else None
+                if article is None or needs_browser(article):
+                    if USE_HTTP:
+                        print("   Falling back to browser")
+                    article = scrape_article_browser(url)
+                save_article(url, article)
             except Exception as e:
-                print(f"   Emotion error: {e}")
+                # One bad page must not end the run; it is retried next time
+                print(f"   Failed to scrape article: {e}")
+                conn.rollback()
+                mark_fetch(conn, SOURCE, url, "failed", error=str(e))
 
-        conn.commit()
+    finally:
+        if driver is not None:
+            POOL.release(driver)
+            driver = None
+        close_connections()
+
+
+# Run on its own, metrics go to the run report through a partial file
+def main():
+    try:
+        run(sys.argv[1:])
+    finally:
+        perf.flush_partial(SOURCE)
 
-finally:
-    driver.quit()
-    conn.close()
-def run():
-    # Re-execute the same logic as if running the script directly
-    import __main__
-    if __main__.__file__.endswith("main.py"):
-        # Only run this if called from main pipeline
-        exec(open(__file__, encoding="utf-8").read())
 
 if __name__ == "__main__":
-    run()
+    main()
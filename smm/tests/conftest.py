@@ -0,0 +1,30 @@
+import threading
+
+import pytest
+
+from benchmarks.fake_ollama import FakeOllama
+from llm import ollama_pool
+
+
+# Start a fake Ollama server and point the client at it. Tests pass their
+# own server options with @pytest.mark.parametrize("fake_ollama", [{...}], indirect=True).
+@pytest.fixture
+def fake_ollama(request, monkeypatch):
+    options = {"first_token_ms": 0, "token_ms": 1, **getattr(request, "param", {})}
+    with FakeOllama(**options) as fake:
+        monkeypatch.setattr(ollama_pool, "OLLAMA_HOST", fake.url)
+        # Clients are cached per thread; drop the one bound to the real host
+        monkeypatch.setattr(ollama_pool, "_local", threading.local())
+        yield fake
+
+
+# A fresh store per test. get_connection binds its default path at import,
+# so the default itself is swapped.
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    from utils import db_utils
+    path = str(tmp_path / "smm.db")
+    monkeypatch.setattr(db_utils, "DB_PATH", path)
+    monkeypatch.setattr(db_utils.get_connection, "__defaults__", (path,))
+    yield db_utils.get_connection()
+    db_utils.close_connections()
@@ -0,0 +1,95 @@
+import sqlite3
+import time
+
+from utils import db_utils
+from utils.db_utils import (
+    enqueue, fetched_urls, mark_fetch, upsert_article, upsert_gazeta_comments, upsert_instagram_comments,
+    upsert_podrobno_comments,
+)
+
+
+def gazeta(user, comment, upvotes=0):
+    return {"user": user, "comment": comment, "upvotes": upvotes, "downvotes": 0}
+
+
+def stored(store, column, item):
+    return store.execute(
+        f"SELECT user, comment, upvotes FROM comments WHERE {column} = ? ORDER BY id", (item,)
+    ).fetchall()
+
+
+def test_identical_comments_from_different_people_are_kept(store):
+    cursor = store.cursor()
+    article_id, _ = upsert_article(cursor, "gazeta", "https://a", "t", "c")
+    upsert_gazeta_comments(cursor, article_id, [gazeta("ann", "Спасибо"), gazeta("bob", "Спасибо")])
+    # Anonymous repeats are told apart by position only
+    upsert_podrobno_comments(cursor, article_id + 1, [{"comment": "Спасибо"}, {"comment": "Спасибо"}])
+
+    assert stored(store, "article_id", article_id) == [("ann", "Спасибо", 0), ("bob", "Спасибо", 0)]
+    assert len(stored(store, "article_id", article_id + 1)) == 2
+
+
+def test_rescrape_replaces_the_comment_set(store):
+    cursor = store.cursor()
+    upsert_instagram_comments(cursor, "acc", "https://p", "cap", [("ann", "first comment"), ("bob", "second one")])
+    first_id = store.execute("SELECT id FROM comments WHERE user = 'ann'").fetchone()[0]
+
+    # bob's comment was removed, carol's is new and ann's is unchanged
+    upsert_instagram_comments(cursor, "acc", "https://p", "cap", [("carol", "a new one"), ("ann", "first comment")])
+
+    assert [(u, c) for u, c, _ in stored(store, "post_url", "https://p")] == [
+        ("ann", "first comment"), ("carol", "a new one"),
+    ]
+    # Unchanged comments keep their id, and with it their sentiment label
+    assert store.execute("SELECT id FROM comments WHERE user = 'ann'").fetchone()[0] == first_id
+
+
+def test_rescrape_updates_votes_in_place(store):
+    cursor = store.cursor()
+    article_id, _ = upsert_article(cursor, "gazeta", "https://a", "t", "c")
+    upsert_gazeta_comments(cursor, article_id, [gazeta("ann", "Спасибо", 1)])
+    upsert_gazeta_comments(cursor, article_id, [gazeta("ann", "Спасибо", 5)])
+
+    assert stored(store, "article_id", article_id) == [("ann", "Спасибо", 5)]
+
+
+def test_stale_pages_are_fetched_again(store):
+    mark_fetch(store, "podrobno", "https://old", "done")
+    mark_fetch(store, "podrobno", "https://new", "done")
+    store.execute("UPDATE fetch_state SET fetched_at = ? WHERE url = 'https://old'", (time.time() - 3600,))
+
+    assert fetched_urls(store, "podrobno", max_age=60) == {"https://new"}
+    assert fetched_urls(store, "podrobno", max_age=None) == {"https://old", "https://new"}
+    # --refresh
+    assert fetched_urls(store, "podrobno", max_age=0) == set()
+
+    enqueue(store, "podrobno", ["https://old", "https://new"], "article", max_age=60)
+    assert dict(store.execute("SELECT url, status FROM fetch_state")) == {
+        "https://old": "pending", "https://new": "done",
+    }
+
+
+def test_old_store_loses_the_hash_only_key(tmp_path):
+    path = str(tmp_path / "old.db")
+    old = sqlite3.connect(path)
+    old.execute("""
+        CREATE TABLE comments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT NOT NULL, article_id INTEGER, post_url TEXT,
+            post_caption TEXT, account_name TEXT, user TEXT, comment TEXT, upvotes INTEGER, downvotes INTEGER,
+            content_hash TEXT, relevance_score INTEGER, relevant INTEGER
+        )
+    """)
+    old.execute("CREATE UNIQUE INDEX idx_comments_article_hash ON comments(article_id, content_hash)")
+    old.execute("INSERT INTO comments (source, article_id, comment, content_hash) VALUES ('podrobno', 1, 'Спасибо', ?)",
+                (db_utils.content_hash("Спасибо"),))
+    old.commit()
+    old.close()
+
+    conn = db_utils.get_connection(path)
+    try:
+        upsert_podrobno_comments(conn.cursor(), 1, [{"comment": "Спасибо"}, {"comment": "Спасибо"}])
+        # The existing row is the first repeat; only the second is new
+        assert conn.execute("SELECT id, occurrence FROM comments ORDER BY id").fetchall()[0] == (1, 0)
+        assert [n for n, in conn.execute("SELECT occurrence FROM comments ORDER BY id")] == [0, 1]
+    finally:
+        db_utils.close_connections()
@@ -0,0 +1,147 @@
+# Fetch the saved Gazeta and Podrobno pages from a local server and parse
+# them the way the scrapers do.
+
+import os
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from scrapers.http_fetcher import fetch, fetch_all
+from scrapers.html_extract import (
+    GAZETA_LINKS_XPATH, PODROBNO_LINKS_XPATH, extract_links, extract_next_page, needs_browser,
+    parse_gazeta_article, parse_podrobno_article,
+)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(__file__)), "scrapers", "fixtures")
+
+
+class Handler(SimpleHTTPRequestHandler):
+    # Fails the first request for /flaky/... and stalls /slow/..., for the retry and timeout tests
+    flaky = set()
+
+    def do_GET(self):
+        if self.path.startswith("/flaky/") and self.path not in self.flaky:
+            self.flaky.add(self.path)
+            self.send_error(503)
+            return
+        if self.path.startswith("/slow/"):
+            time.sleep(2)
+            self.path = self.path[len("/slow"):]
+        if self.path.startswith("/flaky/"):
+            self.path = self.path[len("/flaky"):]
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(Handler, directory=FIXTURES))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_all_returns_every_page_by_url(base_url):
+    urls = [f"{base_url}/gazeta/article.html", f"{base_url}/podrobno/article.html", f"{base_url}/missing.html"]
+    pages = fetch_all(urls + urls[:1], concurrency=2, retries=0)
+
+    assert list(pages) == urls
+    assert "article_title" in pages[urls[0]]
+    assert "post-title" in pages[urls[1]]
+    assert pages[urls[2]] is None
+
+
+def test_fetch_retries_server_errors(base_url):
+    assert fetch(f"{base_url}/flaky/gazeta/article.html", retries=1) is not None
+
+
+def test_fetch_gives_up_after_timeout(base_url):
+    assert fetch(f"{base_url}/slow/gazeta/article.html", timeout=0.5, retries=0) is None
+
+
+def test_gazeta_listing(base_url):
+    page = fetch(f"{base_url}/gazeta/listing.html")
+
+    assert extract_links(page, base_url, GAZETA_LINKS_XPATH) == [
+        f"{base_url}/ru/2025/06/30/electricity-tariffs/",
+        f"{base_url}/ru/2025/06/30/metro-line/",
+        f"{base_url}/ru/2025/06/29/js-comments/",
+    ]
+    assert extract_next_page(page, base_url) == f"{base_url}/ru/list/news/?page=2"
+
+
+def test_gazeta_article(base_url):
+    article = parse_gazeta_article(fetch(f"{base_url}/gazeta/article.html"))
+
+    assert article["title"] == "Тарифы на электроэнергию вырастут с 1 июля"
+    assert article["content"].split("\n") == [
+        "С 1 июля тарифы на электроэнергию для населения вырастут на 15 процентов.",
+        "В министерстве энергетики объяснили рост тарифов износом сетей.",
+    ]
+    # The moderated comment has no vote counters and is skipped
+    assert article["comments"] == [
+        {"user": "tashkent_mom", "comment": "Опять платить больше, а свет отключают каждый день",
+         "upvotes": 12, "downvotes": 1},
+        {"user": "aziz_dev", "comment": "Сети действительно старые, их давно пора менять",
+         "upvotes": 4, "downvotes": 7},
+        {"user": "dilnoza.uz", "comment": "Хорошо бы сначала навести порядок со счётчиками",
+         "upvotes": 0, "downvotes": 0},
+    ]
+    assert article["emotions"] == []
+    assert not needs_browser(article)
+
+
+def test_podrobno_listing(base_url):
+    page = fetch(f"{base_url}/podrobno/listing.html")
+
+    assert extract_links(page, base_url, PODROBNO_LINKS_XPATH) == [
+        f"{base_url}/cat/economy/zarplaty-byudzhetnikov-povysyat/",
+        f"{base_url}/cat/obchestvo/js-reactions/",
+    ]
+
+
+def test_podrobno_article(base_url):
+    article = parse_podrobno_article(fetch(f"{base_url}/podrobno/article.html"))
+
+    assert article["title"] == "Зарплаты бюджетников повысят на 10 процентов"
+    assert article["content"] == "С 1 сентября зарплаты работников бюджетной сферы повысят на 10 процентов."
+    assert article["comments"] == [
+        {"comment": "Наконец-то, учителя давно этого ждали"},
+        {"comment": "А цены вырастут на 20 процентов"},
+    ]
+    # Reactions without a name are skipped, an empty counter reads as 0
+    assert article["emotions"] == [
+        {"emotion": "Нравится", "count": 41},
+        {"emotion": "Смешно", "count": 3},
+        {"emotion": "Злит", "count": 0},
+    ]
+    assert not needs_browser(article)
+
+
+@pytest.mark.parametrize("path, parse, deferred", [
+    # Title and body are only in the rendered DOM
+    ("gazeta/article_client_rendered.html", parse_gazeta_article, []),
+    # The counter says 5 comments, the thread arrives empty
+    ("gazeta/article_js_comments.html", parse_gazeta_article, ["comments"]),
+    # Reactions and comments widgets are mounted but not filled in
+    ("podrobno/article_js_reactions.html", parse_podrobno_article, ["comments", "emotions"]),
+])
+def test_client_rendered_pages_need_browser(base_url, path, parse, deferred):
+    article = parse(fetch(f"{base_url}/{path}"))
+
+    assert article["deferred"] == deferred
+    assert needs_browser(article)
+
+
+def test_article_without_comments_stays_on_http(base_url):
+    article = parse_gazeta_article(fetch(f"{base_url}/gazeta/article_no_comments.html"))
+
+    assert article["comments"] == []
+    assert article["deferred"] == []
+    assert not needs_browser(article)
@@ -0,0 +1,80 @@
+# The Instagram scraper against benchmarks/mock_instagram.py with block
+# pages mixed in. The scraper drives a real browser, so the end-to-end test
+# only runs where Chrome and undetected_chromedriver are installed.
+
+import importlib.util
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import urllib.error
+import urllib.request
+
+import pytest
+
+from benchmarks.mock_instagram import BLOCK_TEXT, MockInstagram
+
+SMM_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILES = 4        # TARGET_PROFILES in the scraper
+POSTS = 2
+
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status, response.read().decode("utf-8")
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode("utf-8")
+
+
+def test_mock_blocks_every_nth_page():
+    with MockInstagram(posts=POSTS, load_ms=0, block_every=3) as mock:
+        pages = [get(f"{mock.url}/repost.uz/") for _ in range(5)] + [get(f"{mock.url}/p/abc/")]
+
+    assert [status for status, _ in pages] == [200, 200, 429, 200, 200, 429]
+    assert mock.blocks == 2
+    # The text the scraper's block_signal looks for
+    assert BLOCK_TEXT in pages[-1][1]
+
+
+def browser_available():
+    chrome = any(shutil.which(name) for name in ("google-chrome", "chromium", "chromium-browser", "chrome"))
+    return chrome and importlib.util.find_spec("undetected_chromedriver") is not None
+
+
+@pytest.mark.skipif(not browser_available(), reason="needs Chrome and undetected_chromedriver")
+def test_scraper_backs_off_and_finishes(tmp_path):
+    db_path = tmp_path / "smm.db"
+    with MockInstagram(posts=POSTS, comments=40, page_size=15, load_ms=50, block_every=4) as mock:
+        env = {
+            **os.environ,
+            "INSTAGRAM_URL": mock.url,
+            "INSTAGRAM_USERNAME": "mock",
+            "INSTAGRAM_PASSWORD": "mock",
+            "INSTAGRAM_BACKOFF": "1",
+            "BROWSER_HEADLESS": "1",
+            "SMM_DB_PATH": str(db_path),
+        }
+        result = subprocess.run(
+            [sys.executable, "-m", "scrapers.instagram_scraper"], cwd=SMM_DIR, env=env,
+            stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=900,
+        )
+        blocks = mock.blocks
+
+    assert result.returncode == 0, result.stdout + result.stderr
+    # Blocked pages were backed off from and retried; none was given up on
+    assert blocks > 0
+    assert "backing off" in result.stdout
+    assert "Giving up" not in result.stdout
+
+    conn = sqlite3.connect(db_path)
+    states = conn.execute(
+        "SELECT status, COUNT(*) FROM fetch_state WHERE source = 'instagram' GROUP BY status"
+    ).fetchall()
+    posts = conn.execute(
+        "SELECT COUNT(DISTINCT post_url) FROM comments WHERE source = 'instagram'"
+    ).fetchone()[0]
+    conn.close()
+    assert states == [("done", PROFILES * POSTS)]
+    assert posts == PROFILES * POSTS
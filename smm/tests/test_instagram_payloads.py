@@ -0,0 +1,99 @@
+import json
+import os
+
+import pytest
+
+from scrapers.instagram_payloads import is_comment_response, parse_payload, parse_payloads
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(__file__)), "scrapers", "fixtures", "instagram")
+
+
+def load(name):
+    with open(os.path.join(FIXTURES, f"{name}.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def summary(post):
+    return [(c["user"], c["comment"], c["parent_pk"]) for c in post["comments"]]
+
+
+def test_rest_comments():
+    post = parse_payloads([load("comments_v1")])
+
+    assert post["caption"] == "Тарифы на электроэнергию вырастут с 1 июля. Что думаете?"
+    assert post["media_id"] is None
+    assert summary(post) == [
+        ("tashkent_mom", "Опять повышение, а зарплаты стоят на месте", None),
+        ("aziz_dev", "Согласен, каждый год одно и то же", "17850000000000011"),
+        ("dilnoza.uz", "Narxlar yana oshdi, bu qachon tugaydi?", None),
+        ("anon_123", "😂😂😂", None),
+    ]
+    assert [c["pk"] for c in post["comments"]][:2] == ["17850000000000011", "17850000000000012"]
+
+
+def test_child_comments_keep_their_parent():
+    post = parse_payloads([load("child_comments_v1")])
+
+    assert summary(post) == [
+        ("aziz_dev", "Согласен, каждый год одно и то же", "17850000000000011"),
+        ("bekzod_88", "Хорошо хоть предупредили заранее", "17850000000000011"),
+    ]
+    # The parent itself is not a reply and is not collected from this response
+    assert "17850000000000011" not in [c["pk"] for c in post["comments"]]
+
+
+@pytest.mark.parametrize("parent_first", [True, False])
+def test_parent_comment_in_any_key_order(parent_first):
+    payload = load("child_comments_v1")
+    parent = payload.pop("parent_comment")
+    payload = {"parent_comment": parent, **payload} if parent_first else {**payload, "parent_comment": parent}
+
+    assert {c["parent_pk"] for c in parse_payload(payload)["comments"]} == {"17850000000000011"}
+
+
+def test_graphql_comments_and_web_info():
+    post = parse_payloads([load("comments_graphql"), load("web_info_graphql")])
+
+    assert summary(post) == [
+        ("samarkand_news_fan", "Интернет в регионах до сих пор ужасный", None),
+        ("nodir.b", "Reforma yaxshi, lekin amalda ko'ramiz", None),
+    ]
+    assert post["caption"].startswith("В Ташкенте запускают новую реформу общественного транспорта")
+    assert (post["media_id"], post["shortcode"]) == ("3400000000000000001", "DAbCdEfGhIj")
+
+
+def test_legacy_shortcode_media():
+    post = parse_payloads([load("shortcode_media_legacy")])
+
+    assert post["caption"] == "Зарплаты бюджетников повысят на 10 процентов"
+    assert (post["media_id"], post["shortcode"]) == ("3300000000000000009", "C9xYzAbCdEf")
+    assert summary(post) == [
+        ("teacher_gulnora", "Наконец-то, давно пора было", None),
+        ("economist_uz", "10 процентов это очень мало при такой инфляции", "17870000000000031"),
+        ("jamshid_t", "Maoshlar oshsa yaxshi, narxlar ham oshmasin", None),
+    ]
+
+
+def test_unrelated_graphql_is_ignored():
+    assert parse_payloads([load("unrelated_graphql")]) == {
+        "comments": [], "caption": None, "media_id": None, "shortcode": None,
+    }
+
+
+def test_merged_payloads_keep_one_copy_per_comment():
+    post = parse_payloads([load("comments_v1"), load("child_comments_v1"), load("unrelated_graphql")])
+
+    assert [c["user"] for c in post["comments"]] == ["tashkent_mom", "aziz_dev", "dilnoza.uz", "anon_123", "bekzod_88"]
+    assert post["comments"][-1]["parent_pk"] == "17850000000000011"
+
+
+@pytest.mark.parametrize("url, mime_type, expected", [
+    ("https://www.instagram.com/api/v1/media/123/comments/?can_support_threading=true", "application/json", True),
+    ("https://www.instagram.com/api/v1/media/123/comments/456/child_comments/", "application/json", True),
+    ("https://www.instagram.com/graphql/query", "text/javascript", True),
+    ("https://www.instagram.com/api/graphql", None, True),
+    ("https://www.instagram.com/api/v1/media/123/comments/", "text/html", False),
+    ("https://www.instagram.com/api/v1/feed/user/42/", "application/json", False),
+])
+def test_is_comment_response(url, mime_type, expected):
+    assert is_comment_response(url, mime_type) is expected
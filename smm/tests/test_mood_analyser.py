@@ -0,0 +1,64 @@
+import itertools
+import os
+import sqlite3
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+
+from analysis.mood_analyser import MAJORITY_SQL, MOODS, article_moods, comment_counts, majority_mood, sentiment_counts
+
+SMM_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# In a fresh interpreter, since other tests may have loaded the engine already
+def test_aggregation_imports_without_the_model():
+    loaded = subprocess.run(
+        [sys.executable, "-c", "import sys, analysis.mood_analyser; "
+                               "print(sorted({'torch', 'pyarrow', 'analysis.sentiment_engine'} & set(sys.modules)))"],
+        cwd=SMM_DIR, capture_output=True, text=True, check=True,
+    ).stdout.strip()
+    assert loaded == "[]"
+
+
+def test_sentiment_counts_ignore_unknown_labels():
+    keys, counts = sentiment_counts(["a", "a", "b", "a"], ["positive", "negative", "neutral", "unsure"])
+
+    assert list(keys) == ["a", "b"]
+    assert counts.tolist() == [[1, 0, 1], [0, 1, 0]]
+
+
+def test_majority_mood_needs_a_strict_lead():
+    counts = np.array([[3, 1, 1], [1, 1, 3], [2, 0, 2], [0, 0, 0]])
+
+    assert majority_mood(counts).tolist() == ["positive", "negative", "neutral", "neutral"]
+
+
+# Articles (majority_mood) and Instagram posts (MAJORITY_SQL) break ties alike
+def test_post_and_article_majorities_agree():
+    counts = np.array(list(itertools.product(range(3), repeat=3)))
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE t (n_positive INTEGER, n_neutral INTEGER, n_negative INTEGER)")
+    db.executemany("INSERT INTO t VALUES (?, ?, ?)", counts.tolist())
+
+    in_sql = [label for label, in db.execute(f"SELECT {MAJORITY_SQL} FROM t ORDER BY rowid")]
+
+    assert in_sql == majority_mood(counts).tolist()
+    # A two-way tie for first place is neutral in both
+    assert majority_mood(np.array([[2, 0, 2]])).tolist() == ["neutral"]
+    assert in_sql[counts.tolist().index([2, 0, 2])] == "neutral"
+
+
+def test_reactions_override_comment_mood():
+    articles = pd.DataFrame({"article_id": ["1gazeta", "2podrobno", "3podrobno"]})
+    comments = pd.DataFrame({
+        "article_id": ["1gazeta", "1gazeta", "2podrobno"],
+        "sentiment": ["negative", "negative", "negative"],
+    })
+    emotions = pd.DataFrame({"article_id": ["2podrobno"], "emotion": ["Радость"], "count": [4]})
+
+    moods, summary = article_moods(articles, comment_counts(comments), emotions)
+
+    assert moods["mood"].tolist() == ["negative", "positive", "no comment"]
+    assert summary[MOODS].to_numpy().tolist() == [[4, 0, 0]]
@@ -0,0 +1,57 @@
+import pytest
+
+from benchmarks.fake_ollama import REPLY
+from llm.ollama_pool import chat, run_parallel
+
+MODEL = "fake"
+
+
+def ask(prompt, **kwargs):
+    return chat(MODEL, [{"role": "user", "content": prompt}], **kwargs)
+
+
+def test_chat_returns_reply(fake_ollama):
+    assert ask("Привет") == REPLY
+    assert fake_ollama.requests == 1
+
+
+@pytest.mark.parametrize("fake_ollama", [{"fail_first": 1}], indirect=True)
+def test_chat_retries_failed_calls(fake_ollama):
+    assert ask("Привет", retries=1) == REPLY
+    assert fake_ollama.requests == 2
+
+
+@pytest.mark.parametrize("fake_ollama", [{"fail_first": 2}], indirect=True)
+def test_chat_raises_when_retries_run_out(fake_ollama):
+    with pytest.raises(Exception):
+        ask("Привет", retries=1)
+    assert fake_ollama.requests == 2
+
+
+@pytest.mark.parametrize("fake_ollama", [{"first_token_ms": 2000}], indirect=True)
+def test_chat_times_out(fake_ollama):
+    with pytest.raises(Exception):
+        ask("Привет", timeout=0.2, retries=0)
+
+
+@pytest.mark.parametrize("fake_ollama", [{"first_token_ms": 30, "reply": lambda prompt: f"ответ {prompt}"}],
+                         indirect=True)
+def test_run_parallel_pairs_results_with_items(fake_ollama):
+    items = [f"пост-{i}" for i in range(12)]
+
+    def summarize(item):
+        if item == "пост-5":
+            raise ValueError("broken post")
+        return ask(item, retries=0)
+
+    results = {i: (item, result) for i, item, result in run_parallel(summarize, items, concurrency=3)}
+
+    assert sorted(results) == list(range(12))
+    for i, (item, result) in results.items():
+        assert item == items[i]
+        if i == 5:
+            # A failed call comes back as its exception, the rest still run
+            assert isinstance(result, ValueError)
+        else:
+            assert result == f"ответ {item}"
+    assert fake_ollama.max_in_flight <= 3
@@ -0,0 +1,79 @@
+import pytest
+
+from scrapers.pacing import Pacer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def pacer(clock, **kwargs):
+    return Pacer("test", clock=clock, sleep=clock.sleep, jitter=0, **kwargs)
+
+
+def test_bucket_refills_at_rate(clock):
+    p = pacer(clock, rate=0.5, burst=2)
+
+    # A full bucket lets a burst through, then requests go out every 1 / rate
+    assert [p.wait() for _ in range(4)] == [0.0, 0.0, 2.0, 2.0]
+    assert clock.sleeps == [2.0, 2.0]
+
+    # Idle time refills the bucket, but never beyond the burst
+    clock.now += 60
+    assert [p.wait() for _ in range(3)] == [0.0, 0.0, 2.0]
+    assert p.waited == 6.0
+
+
+def test_backoff_doubles_per_consecutive_block(clock):
+    p = pacer(clock, rate=1.0, backoff=30, max_backoff=900, decrease=0.5, min_rate=0.1)
+
+    assert [p.blocked() for _ in range(4)] == [30, 60, 120, 240]
+    assert p.rate == pytest.approx(0.1)
+    # The next request waits out the whole pause
+    assert p.delay() == 240
+    assert p.wait() == 240
+    assert clock.sleeps == [240]
+
+    # A success resets the doubling and speeds back up
+    p.success()
+    assert p.blocked() == 30
+    assert p.failures == 1
+
+
+def test_backoff_is_capped(clock):
+    p = pacer(clock, backoff=30, max_backoff=100)
+
+    assert [p.blocked() for _ in range(5)] == [30, 60, 100, 100, 100]
+
+
+def test_rate_grows_with_success_up_to_max(clock):
+    p = pacer(clock, rate=0.5, increase=0.25, max_rate=1.0)
+
+    for _ in range(5):
+        p.success()
+    assert p.rate == 1.0
+
+
+def test_work_and_wait_are_accounted(clock):
+    p = pacer(clock, rate=1.0)
+    p.wait()
+    p.wait()
+    with p.working():
+        clock.now += 3
+
+    assert (p.waited, p.worked) == (1.0, 3.0)
+    assert "25% waiting" in p.summary()
@@ -0,0 +1,25 @@
+import sys
+
+from utils import perf
+
+
+def test_peak_rss_is_reported(monkeypatch):
+    monkeypatch.setattr(perf, "_metrics", {})
+    perf.count("op")
+
+    assert perf.peak_rss_mb() > 0
+    assert perf.snapshot()["op"]["peak_rss_mb"] > 0
+
+
+# Windows has no resource module; without psutil peak RSS is unknown
+def test_peak_rss_without_resource(monkeypatch):
+    monkeypatch.setattr(perf, "resource", None)
+    monkeypatch.setitem(sys.modules, "psutil", None)
+    monkeypatch.setattr(perf, "_metrics", {})
+
+    assert perf.peak_rss_mb() is None
+    perf.count("op")
+    report = perf.build_report(directory="/nonexistent")
+    assert report["peak_rss_mb"] == {"self": None, "children": None}
+    assert report["metrics"]["op"]["peak_rss_mb"] == 0.0
+    assert "run_peak_rss_megabytes{" not in perf.to_prometheus(report)
@@ -0,0 +1,36 @@
+import pytest
+
+from utils.pipeline import Pipeline, Stage, value
+
+
+def stage(name, calls, fail=False, **kwargs):
+    def run():
+        calls.append(name)
+        if fail:
+            raise RuntimeError(f"{name} broke")
+    return Stage(name, run, inputs=[value(name)], **kwargs)
+
+
+def test_fresh_stage_is_skipped(store):
+    calls = []
+    pipeline = Pipeline([stage("a", calls)])
+
+    assert pipeline.run(["a"]) == {"a": "done"}
+    assert pipeline.run(["a"]) == {"a": "skipped"}
+    assert pipeline.run(["a"], force=True) == {"a": "done"}
+    assert calls == ["a", "a"]
+
+
+def test_failed_stage_is_not_recorded(store):
+    calls = []
+    pipeline = Pipeline([stage("a", calls, fail=True), stage("b", calls, after=["a"])])
+
+    with pytest.raises(RuntimeError):
+        pipeline.run(["a", "b"])
+    assert pipeline.status == {"a": "failed", "b": "blocked"}
+    assert store.execute("SELECT COUNT(*) FROM stage_state").fetchone()[0] == 0
+
+    # Same inputs, but the last attempt failed: it runs again
+    with pytest.raises(RuntimeError):
+        pipeline.run(["a"])
+    assert calls == ["a", "a"]
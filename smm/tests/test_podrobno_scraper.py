@@ -0,0 +1,103 @@
+# The Podrobno scraper against the saved pages on a local server. The
+# browser is pointed at an address where nothing listens, so every page that
+# needs it fails the same way whether or not Chrome is installed.
+
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+SMM_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(SMM_DIR, "scrapers", "fixtures", "podrobno")
+ROUTES = {
+    "/": "listing.html",
+    "/cat/economy/zarplaty-byudzhetnikov-povysyat/": "article.html",
+    # Reactions rendered by a script: needs the browser
+    "/cat/obchestvo/js-reactions/": "article_js_reactions.html",
+}
+
+
+class Handler(SimpleHTTPRequestHandler):
+    def do_GET(self):
+        self.path = "/" + ROUTES.get(self.path, "missing.html")
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(Handler, directory=FIXTURES))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def scrape(site, db_path):
+    env = {
+        **os.environ,
+        "PODROBNO_BASE_URL": site,
+        "SMM_DB_PATH": str(db_path),
+        "BROWSER_DEBUGGER_ADDRESS": "127.0.0.1:1",
+    }
+    result = subprocess.run(
+        [sys.executable, "-m", "scrapers.podrobno_scraper"], cwd=SMM_DIR, env=env,
+        stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=300,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    return result.stdout
+
+
+def test_failed_article_does_not_stop_the_run(site, tmp_path):
+    db_path = tmp_path / "smm.db"
+    output = scrape(site, db_path)
+
+    assert "Failed to scrape article" in output
+    conn = sqlite3.connect(db_path)
+    states = dict(conn.execute("SELECT url, status FROM fetch_state WHERE source = 'podrobno'"))
+    assert states == {
+        f"{site}/cat/economy/zarplaty-byudzhetnikov-povysyat/": "done",
+        f"{site}/cat/obchestvo/js-reactions/": "failed",
+    }
+    error = conn.execute("SELECT error FROM fetch_state WHERE status = 'failed'").fetchone()[0]
+    assert error
+    assert conn.execute("SELECT COUNT(*) FROM comments WHERE source = 'podrobno'").fetchone()[0] == 2
+    assert conn.execute("SELECT COUNT(*) FROM emotions WHERE source = 'podrobno'").fetchone()[0] == 3
+    conn.close()
+
+    # The next run skips the saved article and tries the failed one again
+    assert "Found 1 new articles (1 already fetched)" in scrape(site, db_path)
+
+
+# The way the pipeline runs it: in this process, on the shared pool
+def test_runs_in_process(site, store, monkeypatch, capsys):
+    from scrapers import browser_pool, podrobno_scraper
+    monkeypatch.setattr(podrobno_scraper, "BASE_URL", site)
+    monkeypatch.setattr(browser_pool, "DEBUGGER_ADDRESS", "127.0.0.1:1")
+
+    podrobno_scraper.run()
+    podrobno_scraper.run()
+
+    assert "Found 1 new articles (1 already fetched)" in capsys.readouterr().out
+    # Every session slot went back to the pool
+    assert all(browser_pool.POOL._slots.acquire(blocking=False) for _ in range(browser_pool.POOL.size))
+    for _ in range(browser_pool.POOL.size):
+        browser_pool.POOL._slots.release()
+
+
+def test_importing_a_scraper_starts_nothing():
+    result = subprocess.run(
+        [sys.executable, "-c", "import scrapers.instagram_scraper, scrapers.gazeta_scraper, scrapers.podrobno_scraper"],
+        cwd=SMM_DIR, env={k: v for k, v in os.environ.items() if not k.startswith("INSTAGRAM_")},
+        stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=60,
+    )
+    # Used to ask for Instagram credentials (EOF here) and launch a browser
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == ""
@@ -0,0 +1,71 @@
+import pytest
+
+from benchmarks.fake_ollama import REPLY
+from llm import llm_cache, report_generator
+from llm.ollama_pool import stream_chat
+
+OLD_REPORT = "Отчёт прошлого запуска"
+
+
+@pytest.fixture
+def paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "CACHE_DB", str(tmp_path / "llm_cache.db"))
+    monkeypatch.setattr(llm_cache, "_conn", None)
+    prompt_path, report_path = tmp_path / "prompt.txt", tmp_path / "mood_report.md"
+    prompt_path.write_text("Опиши настроение читателей", encoding="utf-8")
+    report_path.write_text(OLD_REPORT, encoding="utf-8")
+    monkeypatch.setattr(report_generator, "PROMPT_PATH", str(prompt_path))
+    monkeypatch.setattr(report_generator, "REPORT_PATH", str(report_path))
+    yield report_path
+    if llm_cache._conn is not None:
+        llm_cache._conn.close()
+
+
+@pytest.mark.parametrize("fake_ollama", [{"first_token_ms": 20}], indirect=True)
+def test_stream_chat_streams_tokens_in_order(fake_ollama):
+    tokens = []
+    text, stats = stream_chat("fake", [{"role": "user", "content": "Привет"}], on_token=tokens.append)
+
+    assert text == REPLY
+    assert len(tokens) == len(REPLY.split(" "))
+    assert "".join(tokens) == REPLY
+    assert stats["ttft_s"] >= 0.02
+    assert stats["completion_tokens"] == len(tokens)
+    assert stats["prompt_tokens"] > 0
+    assert stats["tokens_per_s"] > 0
+
+
+def test_report_replaces_previous_one(fake_ollama, paths):
+    stats = report_generator.generate_report()
+
+    assert paths.read_text(encoding="utf-8") == REPLY
+    assert stats["completion_tokens"] == len(REPLY.split(" "))
+    assert not (paths.parent / "mood_report.md.tmp").exists()
+
+
+def test_report_is_served_from_cache(fake_ollama, paths):
+    report_generator.generate_report()
+    paths.write_text(OLD_REPORT, encoding="utf-8")
+    report_generator.generate_report()
+
+    assert paths.read_text(encoding="utf-8") == REPLY
+    assert fake_ollama.requests == 1
+
+
+@pytest.mark.parametrize("fake_ollama", [{"fail_first": 1}], indirect=True)
+def test_failed_report_keeps_previous_one(fake_ollama, paths):
+    with pytest.raises(Exception):
+        report_generator.generate_report()
+
+    assert paths.read_text(encoding="utf-8") == OLD_REPORT
+    assert not (paths.parent / "mood_report.md.tmp").exists()
+
+
+@pytest.mark.parametrize("fake_ollama", [{"reply": ""}], indirect=True)
+def test_empty_report_is_an_error(fake_ollama, paths):
+    with pytest.raises(RuntimeError):
+        report_generator.generate_report()
+
+    assert paths.read_text(encoding="utf-8") == OLD_REPORT
+    # Nothing is cached, so the next run asks the model again
+    assert llm_cache.lookup(llm_cache.cache_key(report_generator.MODEL, "", "Опиши настроение читателей")) is None
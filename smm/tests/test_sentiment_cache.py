@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from analysis.sentiment_cache import SentimentCache
+
+# The order blanchefort/rubert-base-cased-sentiment emits its classes in
+MODEL_ORDER = ["neutral", "positive", "negative"]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SentimentCache(path=str(tmp_path / "sentiment_cache.db"))
+    yield cache
+    cache.close()
+
+
+def test_rows_are_stored_by_class_name(cache):
+    cache.put_many(["k"], ["negative"], np.array([[0.1, 0.2, 0.7]], dtype=np.float32), MODEL_ORDER)
+
+    row = cache.conn.execute(
+        "SELECT label, prob_negative, prob_neutral, prob_positive FROM sentiment_cache WHERE key = 'k'"
+    ).fetchone()
+    assert row == ("negative", pytest.approx(0.7), pytest.approx(0.1), pytest.approx(0.2))
+
+
+def test_rows_read_back_in_the_callers_order(cache):
+    cache.put_many(["k"], ["negative"], np.array([[0.1, 0.2, 0.7]], dtype=np.float32), MODEL_ORDER)
+
+    label, probs = cache.get_many(["k", "missing"], MODEL_ORDER)["k"]
+    assert label == "negative"
+    np.testing.assert_allclose(probs, [0.1, 0.2, 0.7], rtol=1e-6)
+    _, probs = cache.get_many(["k"], ["negative", "neutral", "positive"])["k"]
+    np.testing.assert_allclose(probs, [0.7, 0.1, 0.2], rtol=1e-6)
+
+
+def test_unknown_classes_are_rejected(cache):
+    with pytest.raises(ValueError):
+        cache.get_many(["k"], ["neutral", "positive", "angry"])
@@ -0,0 +1,54 @@
+# A summary the model could not produce must fail the stage, not be stored
+# as text in its place.
+
+import pytest
+
+from analysis import article_summarizer, insta_post_summarizer
+from utils.db_utils import upsert_article
+
+
+def flaky_chat(model, system, prompt, *args, **kwargs):
+    if "сломано" in prompt:
+        raise ConnectionError("Ollama is down")
+    return "Обзор"
+
+
+@pytest.fixture
+def articles(store, monkeypatch):
+    monkeypatch.setattr(article_summarizer, "cached_chat", flaky_chat)
+    cursor = store.cursor()
+    for url, text in [("https://gazeta.test/1", "Тарифы растут"), ("https://gazeta.test/2", "Всё сломано")]:
+        article_id, _ = upsert_article(cursor, "gazeta", url, text, text)
+        cursor.execute(
+            "INSERT INTO comments (source, article_id, comment) VALUES ('gazeta', ?, 'Дорого')", (article_id,)
+        )
+    store.commit()
+    return store
+
+
+@pytest.fixture
+def posts(store, monkeypatch):
+    monkeypatch.setattr(insta_post_summarizer, "cached_chat", flaky_chat)
+    monkeypatch.setattr(insta_post_summarizer, "update_relevance", lambda conn: None)
+    store.executemany(
+        "INSERT INTO comments (source, post_url, post_caption, comment, relevant) VALUES ('instagram', ?, ?, ?, 1)",
+        [("https://ig.test/p/1", "Тарифы растут", "Дорого"), ("https://ig.test/p/2", "Всё сломано", "Ужас")],
+    )
+    store.commit()
+    return store
+
+
+def test_article_failures_fail_the_stage(articles):
+    with pytest.raises(RuntimeError, match="1 of 2 articles"):
+        article_summarizer.summarize_articles(concurrency=2)
+
+    rows = articles.execute("SELECT title, summary FROM article_summaries").fetchall()
+    assert rows == [("Тарифы растут", "Обзор")]
+
+
+def test_post_failures_fail_the_stage(posts):
+    with pytest.raises(RuntimeError, match="1 of 2 posts"):
+        insta_post_summarizer.summarize_insta(concurrency=2)
+
+    rows = posts.execute("SELECT caption, summary FROM post_summaries").fetchall()
+    assert rows == [("Тарифы растут", "Обзор")]
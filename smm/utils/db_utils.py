@@ -1,71 +1,579 @@
+import hashlib
+import os
 import sqlite3
+import threading
+import time
 
-def init_gazeta_db(path):
-    conn = sqlite3.connect(path)
-    cursor = conn.cursor()
+import pandas as pd
+
+from utils import perf
 
-    cursor.execute("DROP TABLE IF EXISTS articles")
-    cursor.execute("DROP TABLE IF EXISTS comments")
+# === Unified store ===
+# Every scraper and analysis stage reads and writes one SQLite file. Rows
+# from different sites share tables and are told apart by `source`.
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+DEFAULT_DB_PATH = os.path.join(DATA_DIR, "smm.db")
+# Benchmarks and experiments point the whole pipeline at another file
+DB_PATH = os.environ.get("SMM_DB_PATH", DEFAULT_DB_PATH)
 
-    cursor.execute("""
-    CREATE TABLE articles (
+# WAL lets readers run while a writer commits; busy_timeout makes writers
+# wait for each other instead of failing with "database is locked"
+PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 30000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA mmap_size = 268435456",
+]
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS articles (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
+        source TEXT NOT NULL,
         url TEXT UNIQUE,
         title TEXT,
-        content TEXT
+        content TEXT,
+        content_hash TEXT
     )
-    """)
-    cursor.execute("""
-    CREATE TABLE comments (
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_articles_source ON articles(source)",
+    """
+    CREATE TABLE IF NOT EXISTS comments (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
+        source TEXT NOT NULL,
         article_id INTEGER,
+        post_url TEXT,
+        post_caption TEXT,
+        account_name TEXT,
         user TEXT,
         comment TEXT,
         upvotes INTEGER,
         downvotes INTEGER,
+        content_hash TEXT,
+        occurrence INTEGER DEFAULT 0,
+        relevance_score INTEGER,
+        relevant INTEGER,
+        FOREIGN KEY(article_id) REFERENCES articles(id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_comments_article ON comments(source, article_id)",
+    "CREATE INDEX IF NOT EXISTS idx_comments_post ON comments(post_url)",
+    "CREATE INDEX IF NOT EXISTS idx_comments_caption ON comments(post_caption)",
+    "CREATE INDEX IF NOT EXISTS idx_comments_relevant ON comments(source, relevant)",
+    # A comment is its author and text plus which repeat of that pair it is
+    # on the page, so two people (or one person twice) saying "Спасибо" stay
+    # separate rows. The old (item, content_hash) keys merged them.
+    "DROP INDEX IF EXISTS idx_comments_article_hash",
+    "DROP INDEX IF EXISTS idx_comments_post_hash",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_comments_article_key ON comments(article_id, content_hash, occurrence)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_comments_post_key ON comments(post_url, content_hash, occurrence)",
+    """
+    CREATE TABLE IF NOT EXISTS emotions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        source TEXT NOT NULL,
+        article_id INTEGER,
+        emotion TEXT,
+        count INTEGER,
         FOREIGN KEY(article_id) REFERENCES articles(id)
     )
-    """)
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_emotions_article ON emotions(article_id, emotion)",
+    """
+    CREATE TABLE IF NOT EXISTS fetch_state (
+        url TEXT PRIMARY KEY,
+        source TEXT,
+        status TEXT,
+        content_hash TEXT,
+        fetched_at REAL,
+        error TEXT,
+        kind TEXT,
+        priority INTEGER DEFAULT 0,
+        last_seen REAL,
+        attempts INTEGER DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_fetch_state_status ON fetch_state(source, status)",
+    "CREATE INDEX IF NOT EXISTS idx_fetch_state_frontier ON fetch_state(source, kind, status, priority)",
+    """
+    CREATE TABLE IF NOT EXISTS comment_sentiment (
+        comment_id INTEGER PRIMARY KEY,
+        source TEXT,
+        sentiment TEXT,
+        p_negative REAL,
+        p_neutral REAL,
+        p_positive REAL,
+        FOREIGN KEY(comment_id) REFERENCES comments(id)
+    )
+    """,
+    # Running per-post totals, updated by deltas as comments are classified;
+    # mean probabilities are sum_* / comments
+    """
+    CREATE TABLE IF NOT EXISTS average_sentiment (
+        post_url TEXT PRIMARY KEY,
+        post_caption TEXT,
+        comments INTEGER,
+        n_negative INTEGER,
+        n_neutral INTEGER,
+        n_positive INTEGER,
+        sum_negative REAL,
+        sum_neutral REAL,
+        sum_positive REAL,
+        average_sentiment TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS article_summaries (
+        source TEXT,
+        article_id INTEGER,
+        title TEXT,
+        summary TEXT,
+        PRIMARY KEY (source, article_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS post_summaries (
+        post_url TEXT PRIMARY KEY,
+        caption TEXT,
+        comment_count INTEGER,
+        summary TEXT
+    )
+    """,
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+    """
+    CREATE TABLE IF NOT EXISTS stage_state (
+        stage TEXT PRIMARY KEY,
+        fingerprint TEXT,
+        finished_at REAL,
+        duration REAL
+    )
+    """,
+]
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = set()
+
+
+# Connection manager: one connection per thread per database file, opened
+# with the tuned pragmas and reused for the life of the thread.
+def get_connection(path=DB_PATH):
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        with _init_lock:
+            if path not in _initialized:
+                init_db(conn)
+                if path == DEFAULT_DB_PATH:
+                    migrate_legacy(conn)
+                _initialized.add(path)
+        connections[path] = conn
+    return conn
+
+
+def close_connections():
+    for conn in getattr(_local, "connections", {}).values():
+        conn.close()
+    _local.connections = {}
+
+
+# Columns added to tables that hold scraped state, so older files are
+# upgraded in place instead of rebuilt
+ADDED_COLUMNS = [
+    ("fetch_state", "kind", "TEXT"),
+    ("fetch_state", "priority", "INTEGER DEFAULT 0"),
+    ("fetch_state", "last_seen", "REAL"),
+    ("fetch_state", "attempts", "INTEGER DEFAULT 0"),
+    ("comments", "occurrence", "INTEGER DEFAULT 0"),
+]
+
+
+def init_db(conn):
+    _drop_outdated(conn)
+    _add_columns(conn)
+    for statement in SCHEMA:
+        conn.execute(statement)
     conn.commit()
-    conn.close()
 
 
-def init_upl_db(path):
-    init_gazeta_db(path)  # same structure
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
 
 
-def init_podrobno_db(path):
-    conn = sqlite3.connect(path)
-    cursor = conn.cursor()
+# Sentiment tables are derived data: when their layout changes they are
+# dropped and the classify stage rebuilds them (mostly from the cache)
+def _drop_outdated(conn):
+    outdated = [
+        table for table, column in (("comment_sentiment", "p_negative"), ("average_sentiment", "post_url"))
+        if _columns(conn, table) and column not in _columns(conn, table)
+    ]
+    for table in outdated:
+        conn.execute(f"DROP TABLE {table}")
+    if outdated and _columns(conn, "stage_state"):
+        conn.execute("DELETE FROM stage_state WHERE stage = 'classify'")
 
-    cursor.execute("DROP TABLE IF EXISTS articles")
-    cursor.execute("DROP TABLE IF EXISTS comments")
-    cursor.execute("DROP TABLE IF EXISTS emotions")
 
-    cursor.execute("""
-    CREATE TABLE articles (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        url TEXT UNIQUE,
-        title TEXT,
-        content TEXT
+def _add_columns(conn):
+    for table, column, declaration in ADDED_COLUMNS:
+        existing = _columns(conn, table)
+        if existing and column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+
+def content_hash(*parts):
+    payload = "\x00".join("" if p is None else str(p) for p in parts)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Drop everything scraped from one source, for a full rebuild
+def reset_source(conn, source):
+    conn.execute("DELETE FROM emotions WHERE source = ?", (source,))
+    conn.execute("DELETE FROM comments WHERE source = ?", (source,))
+    conn.execute("DELETE FROM articles WHERE source = ?", (source,))
+    conn.execute("DELETE FROM fetch_state WHERE source = ?", (source,))
+    conn.commit()
+
+
+# === Fetch state ===
+# Fetched pages are read again once they are this old, so comments posted
+# (or removed) after the first visit reach the store. Scrapers' --refresh
+# re-reads everything they come across.
+REFRESH_AFTER = float(os.environ.get("SMM_REFRESH_DAYS", 7)) * 86400
+
+
+# URLs fetched within max_age seconds; with max_age=None, every fetched URL
+def fetched_urls(conn, source, max_age=REFRESH_AFTER):
+    cutoff = -1 if max_age is None else time.time() - max_age
+    return {row[0] for row in conn.execute(
+        "SELECT url FROM fetch_state WHERE source = ? AND status = 'done' AND fetched_at > ?", (source, cutoff)
+    )}
+
+
+def mark_pending(conn, source, urls):
+    conn.executemany(
+        "INSERT OR IGNORE INTO fetch_state (url, source, status, fetched_at) VALUES (?, ?, 'pending', NULL)",
+        [(url, source) for url in urls],
     )
-    """)
-    cursor.execute("""
-    CREATE TABLE comments (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        article_id INTEGER,
-        comment TEXT,
-        FOREIGN KEY(article_id) REFERENCES articles(id)
+    conn.commit()
+
+
+def mark_fetch(conn, source, url, status, content_hash=None, error=None):
+    conn.execute("""
+        INSERT INTO fetch_state (url, source, status, content_hash, fetched_at, error)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(url) DO UPDATE SET
+            status = excluded.status,
+            content_hash = COALESCE(excluded.content_hash, fetch_state.content_hash),
+            fetched_at = excluded.fetched_at,
+            error = excluded.error
+    """, (url, source, status, content_hash, time.time(), error))
+    conn.commit()
+
+
+# === Crawl frontier ===
+# fetch_state doubles as a persistent URL queue. A crawler enqueues the
+# listing pages and articles it discovers, claims the highest-priority pending
+# URLs and marks each one done or failed with mark_fetch. Whatever is still
+# pending when a run stops is where the next run carries on.
+MAX_ATTEMPTS = 3
+# SQLite caps the number of ? parameters in one statement
+_IN_BATCH = 500
+
+
+# Add urls to the frontier and return the ones it did not know yet. Known
+# URLs keep their status unless `refresh` sends them back to pending, or
+# they were fetched more than max_age seconds ago; their priority only goes up.
+def enqueue(conn, source, urls, kind, priority=0, refresh=False, max_age=None):
+    urls = list(dict.fromkeys(urls))
+    known = set()
+    for start in range(0, len(urls), _IN_BATCH):
+        batch = urls[start:start + _IN_BATCH]
+        known.update(row[0] for row in conn.execute(
+            f"SELECT url FROM fetch_state WHERE url IN ({', '.join('?' for _ in batch)})", batch
+        ))
+    conn.executemany("""
+        INSERT INTO fetch_state (url, source, status, kind, priority, last_seen, attempts)
+        VALUES (?, ?, 'pending', ?, ?, ?, 0)
+        ON CONFLICT(url) DO UPDATE SET
+            kind = excluded.kind,
+            priority = MAX(COALESCE(fetch_state.priority, 0), excluded.priority),
+            last_seen = excluded.last_seen,
+            status = CASE WHEN ? AND fetch_state.status != 'fetching' THEN 'pending' ELSE fetch_state.status END,
+            attempts = CASE WHEN ? THEN 0 ELSE fetch_state.attempts END
+    """, [(url, source, kind, priority, time.time(), refresh, refresh) for url in urls])
+    if max_age is not None:
+        for start in range(0, len(urls), _IN_BATCH):
+            batch = urls[start:start + _IN_BATCH]
+            conn.execute(f"""
+                UPDATE fetch_state SET status = 'pending', attempts = 0
+                WHERE status = 'done' AND fetched_at <= ? AND url IN ({', '.join('?' for _ in batch)})
+            """, (time.time() - max_age, *batch))
+    conn.commit()
+    return [url for url in urls if url not in known]
+
+
+# Take up to `limit` URLs of one kind off the frontier, highest priority
+# first, and mark them as being fetched. Failed URLs are retried after the
+# pending ones until they have used MAX_ATTEMPTS.
+def claim(conn, source, kind, limit=1):
+    rows = conn.execute("""
+        SELECT url, COALESCE(priority, 0) FROM fetch_state
+        WHERE source = ? AND kind = ?
+          AND (status = 'pending' OR (status = 'failed' AND COALESCE(attempts, 0) < ?))
+        ORDER BY status = 'failed', priority DESC, last_seen DESC
+        LIMIT ?
+    """, (source, kind, MAX_ATTEMPTS, limit)).fetchall()
+    conn.executemany(
+        "UPDATE fetch_state SET status = 'fetching', attempts = COALESCE(attempts, 0) + 1 WHERE url = ?",
+        [(url,) for url, _ in rows],
     )
-    """)
-    cursor.execute("""
-    CREATE TABLE emotions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        article_id INTEGER,
-        emotion TEXT,
-        count INTEGER,
-        FOREIGN KEY(article_id) REFERENCES articles(id)
+    conn.commit()
+    return rows
+
+
+# Claims left behind by a run that was interrupted go back on the queue
+def release_claims(conn, source):
+    released = conn.execute(
+        "UPDATE fetch_state SET status = 'pending' WHERE source = ? AND status = 'fetching'", (source,)
+    ).rowcount
+    conn.commit()
+    return released
+
+
+def frontier_counts(conn, source):
+    return {(kind, status): n for kind, status, n in conn.execute(
+        "SELECT kind, status, COUNT(*) FROM fetch_state WHERE source = ? GROUP BY kind, status", (source,)
+    )}
+
+
+# === Chunked reads ===
+# Comments per chunk in streaming mode; unset reads whole tables at once
+CHUNK_SIZE = int(os.environ.get("SENTIMENT_CHUNK_SIZE", "0")) or None
+
+
+# Page through a query by its key instead of loading the whole result. `sql`
+# must end with "<key> > ? ORDER BY <key> LIMIT ?"; those two parameters are
+# filled in here. With no chunk_size the result comes back as one chunk.
+def read_chunks(conn, sql, params=(), chunk_size=None, key="id"):
+    after = -1
+    while True:
+        chunk = pd.read_sql_query(sql, conn, params=(*params, after, chunk_size or -1))
+        if chunk.empty:
+            return
+        yield chunk
+        if not chunk_size or len(chunk) < chunk_size:
+            return
+        after = int(chunk[key].iloc[-1])
+
+
+# Run write(cursor, chunk) for each chunk in its own transaction and pass the
+# chunk on, so a failure loses at most one chunk of work
+def write_chunks(conn, chunks, write, metric="sql.write"):
+    cursor = conn.cursor()
+    for chunk in chunks:
+        with perf.timed(metric, items=len(chunk)):
+            write(cursor, chunk)
+            conn.commit()
+        yield chunk
+
+
+# === Upserts ===
+# Inserts or refreshes an article, returning its id and whether the content changed
+def upsert_article(cursor, source, url, title, content):
+    digest = content_hash(title, content)
+    row = cursor.execute("SELECT id, content_hash FROM articles WHERE url = ?", (url,)).fetchone()
+    if row is None:
+        cursor.execute(
+            "INSERT INTO articles (source, url, title, content, content_hash) VALUES (?, ?, ?, ?, ?)",
+            (source, url, title, content, digest),
+        )
+        return cursor.lastrowid, True
+    if row[1] != digest:
+        cursor.execute(
+            "UPDATE articles SET title = ?, content = ?, content_hash = ? WHERE id = ?",
+            (title, content, digest, row[0]),
+        )
+        return row[0], True
+    return row[0], False
+
+
+# (content_hash, occurrence) for each comment on one page, in page order:
+# the nth comment with the same author and text gets occurrence n
+def comment_keys(*comments):
+    seen = {}
+    keys = []
+    for parts in comments:
+        digest = content_hash(*parts)
+        keys.append((digest, seen.get(digest, 0)))
+        seen[digest] = keys[-1][1] + 1
+    return keys
+
+
+# A page's comments replace what was stored for it: rows whose key is on the
+# page are kept (ids, and the labels hung on them, survive a re-scrape) and
+# rows missing from it are deleted
+def _drop_missing(cursor, column, item, keys):
+    stored = cursor.execute(
+        f"SELECT id, content_hash, occurrence FROM comments WHERE {column} = ?", (item,)
+    ).fetchall()
+    keys = set(keys)
+    cursor.executemany(
+        "DELETE FROM comments WHERE id = ?", [(i,) for i, digest, n in stored if (digest, n) not in keys]
     )
-    """)
+
+
+# Bulk versions take all of an item's comment and emotion dicts, as the
+# page parsers return them
+def upsert_gazeta_comments(cursor, article_id, comments):
+    keys = comment_keys(*((c["user"], c["comment"]) for c in comments))
+    _drop_missing(cursor, "article_id", article_id, keys)
+    cursor.executemany("""
+        INSERT INTO comments (source, article_id, user, comment, upvotes, downvotes, content_hash, occurrence)
+        VALUES ('gazeta', ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(article_id, content_hash, occurrence) DO UPDATE SET
+            upvotes = excluded.upvotes,
+            downvotes = excluded.downvotes
+    """, [
+        (article_id, c["user"], c["comment"], c["upvotes"], c["downvotes"], *key)
+        for c, key in zip(comments, keys)
+    ])
+
+
+# Podrobno does not show who wrote a comment; only the repeat count tells
+# identical ones apart
+def upsert_podrobno_comments(cursor, article_id, comments):
+    keys = comment_keys(*((c["comment"],) for c in comments))
+    _drop_missing(cursor, "article_id", article_id, keys)
+    cursor.executemany("""
+        INSERT OR IGNORE INTO comments (source, article_id, comment, content_hash, occurrence)
+        VALUES ('podrobno', ?, ?, ?, ?)
+    """, [(article_id, c["comment"], *key) for c, key in zip(comments, keys)])
+
+
+def upsert_emotion(cursor, source, article_id, emotion, count):
+    upsert_emotions(cursor, source, article_id, [{"emotion": emotion, "count": count}])
+
+
+def upsert_emotions(cursor, source, article_id, emotions):
+    cursor.executemany("""
+        INSERT INTO emotions (source, article_id, emotion, count)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(article_id, emotion) DO UPDATE SET count = excluded.count
+    """, [(source, article_id, e["emotion"], e["count"]) for e in emotions])
+
+
+# Same for all of a post's (username, comment) pairs in one executemany
+def upsert_instagram_comments(cursor, account_name, post_url, post_caption, comments):
+    keys = comment_keys(*comments)
+    _drop_missing(cursor, "post_url", post_url, keys)
+    cursor.executemany("""
+        INSERT OR IGNORE INTO comments
+            (source, account_name, post_url, post_caption, user, comment, content_hash, occurrence)
+        VALUES ('instagram', ?, ?, ?, ?, ?, ?, ?)
+    """, [
+        (account_name, post_url, post_caption, username, comment, *key)
+        for (username, comment), key in zip(comments, keys)
+    ])
+
+
+# === Legacy import ===
+# Before the unified store each scraper wrote its own file. Their rows are
+# copied into smm.db once, the first time the store is opened.
+LEGACY_FILES = {
+    "gazeta": os.path.join(DATA_DIR, "gazeta_articles.db"),
+    "podrobno": os.path.join(DATA_DIR, "podrobno_articles.db"),
+    "instagram": os.path.join(DATA_DIR, "instagram_comments.db"),
+    "post_summaries": os.path.join(DATA_DIR, "instagram_summaries.db"),
+    "article_summaries": os.path.join(DATA_DIR, "article_summaries.db"),
+}
+
+
+def _legacy_rows(path, query):
+    legacy = sqlite3.connect(path)
+    try:
+        return legacy.execute(query).fetchall()
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        legacy.close()
+
+
+def migrate_legacy(conn):
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_migrated'").fetchone():
+        return
+    cursor = conn.cursor()
+    id_maps = {}
+
+    for source in ("gazeta", "podrobno"):
+        path = LEGACY_FILES[source]
+        if not os.path.exists(path):
+            continue
+        id_map = id_maps[source] = {}
+        for old_id, url, title, content in _legacy_rows(path, "SELECT id, url, title, content FROM articles"):
+            id_map[old_id], _ = upsert_article(cursor, source, url, title, content)
+
+        # Each article's comments go in together, like a scrape of its page
+        comments = {}
+        if source == "gazeta":
+            for old_id, user, comment, up, down in _legacy_rows(
+                path, "SELECT article_id, user, comment, upvotes, downvotes FROM comments ORDER BY id"
+            ):
+                comments.setdefault(old_id, []).append(
+                    {"user": user, "comment": comment, "upvotes": up, "downvotes": down}
+                )
+            for old_id, rows in comments.items():
+                if old_id in id_map:
+                    upsert_gazeta_comments(cursor, id_map[old_id], rows)
+        else:
+            for old_id, comment in _legacy_rows(path, "SELECT article_id, comment FROM comments ORDER BY id"):
+                comments.setdefault(old_id, []).append({"comment": comment})
+            for old_id, rows in comments.items():
+                if old_id in id_map:
+                    upsert_podrobno_comments(cursor, id_map[old_id], rows)
+            for old_id, emotion, count in _legacy_rows(path, "SELECT article_id, emotion, count FROM emotions"):
+                if old_id in id_map:
+                    upsert_emotion(cursor, source, id_map[old_id], emotion, count)
+
+    if os.path.exists(LEGACY_FILES["instagram"]):
+        posts = {}
+        for account_name, post_url, post_caption, username, comment in _legacy_rows(
+            LEGACY_FILES["instagram"],
+            "SELECT account_name, post_url, post_caption, username, comment FROM comments ORDER BY rowid",
+        ):
+            posts.setdefault((account_name, post_url, post_caption), []).append((username, comment))
+        for (account_name, post_url, post_caption), pairs in posts.items():
+            upsert_instagram_comments(cursor, account_name, post_url, post_caption, pairs)
+
+    if os.path.exists(LEGACY_FILES["post_summaries"]):
+        cursor.executemany(
+            "INSERT OR IGNORE INTO post_summaries (post_url, caption, comment_count, summary) VALUES (?, ?, ?, ?)",
+            _legacy_rows(LEGACY_FILES["post_summaries"],
+                         "SELECT post_url, caption, comment_count, summary FROM post_summaries"),
+        )
+
+    if os.path.exists(LEGACY_FILES["article_summaries"]):
+        for source, old_id, title, summary in _legacy_rows(
+            LEGACY_FILES["article_summaries"], "SELECT source, article_id, title, summary FROM summaries"
+        ):
+            new_id = id_maps.get(source, {}).get(old_id)
+            if new_id is not None:
+                cursor.execute(
+                    "INSERT OR IGNORE INTO article_summaries (source, article_id, title, summary) VALUES (?, ?, ?, ?)",
+                    (source, new_id, title, summary),
+                )
+
+    cursor.execute("INSERT INTO meta (key, value) VALUES ('legacy_migrated', ?)", (str(time.time()),))
     conn.commit()
-    conn.close()
+    print(f"📦 Imported legacy databases into {DB_PATH}")
+
+
+if __name__ == "__main__":
+    get_connection()
@@ -0,0 +1,263 @@
+# perf.py
+# Lightweight timing and counters for pipeline stages and hot functions.
+#
+#   with perf.timed("sentiment.classify", items=len(texts)):
+#       ...
+#
+# Metrics live in this process. A scraper started on its own under a run id
+# dumps its metrics next to the run report (flush_partial) and the run that
+# builds the report merges them.
+
+import json
+import os
+import platform
+import socket
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; psutil (optional) stands in, else peak RSS is None
+    resource = None
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS_DIR = os.path.join(BASE_DIR, "reports", "runs")
+# Set by main.py so subprocesses know which run their metrics belong to
+RUN_ID_ENV = "SMM_RUN_ID"
+PROM_PREFIX = "smm"
+
+_lock = threading.Lock()
+_metrics = {}
+_started_at = time.time()
+
+
+# Peak resident memory of this process, or with children=True of its largest
+# finished child process. None where the platform cannot tell.
+def peak_rss_mb(children=False):
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    if children:
+        return None
+    try:
+        import psutil
+    except ImportError:
+        return None
+    # peak_wset is Windows' peak working set; elsewhere only the current RSS is known
+    memory = psutil.Process().memory_info()
+    return getattr(memory, "peak_wset", memory.rss) / (1024 * 1024)
+
+
+def run_id():
+    # One id per top-level run, inherited by every subprocess it starts
+    if RUN_ID_ENV not in os.environ:
+        os.environ[RUN_ID_ENV] = time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:6]
+    return os.environ[RUN_ID_ENV]
+
+
+def _empty():
+    return {
+        "calls": 0, "errors": 0, "wall_s": 0.0, "max_s": 0.0, "items": 0,
+        "prompt_tokens": 0, "completion_tokens": 0, "peak_rss_mb": 0.0,
+    }
+
+
+def record(name, seconds=0.0, items=0, prompt_tokens=0, completion_tokens=0, error=False, calls=1):
+    with _lock:
+        m = _metrics.setdefault(name, _empty())
+        m["calls"] += calls
+        m["errors"] += int(error)
+        m["wall_s"] += seconds
+        m["max_s"] = max(m["max_s"], seconds)
+        m["items"] += items or 0
+        m["prompt_tokens"] += prompt_tokens or 0
+        m["completion_tokens"] += completion_tokens or 0
+        peak = peak_rss_mb()
+        if peak is not None:
+            m["peak_rss_mb"] = max(m["peak_rss_mb"], peak)
+
+
+def count(name, items=1):
+    # A counter with no timing (cache hits, skipped pages)
+    record(name, items=items)
+
+
+class _Timer:
+    def __init__(self, items):
+        self.items = items or 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def add(self, items=0, prompt_tokens=0, completion_tokens=0):
+        self.items += items or 0
+        self.prompt_tokens += prompt_tokens or 0
+        self.completion_tokens += completion_tokens or 0
+
+
+@contextmanager
+def timed(name, items=0):
+    timer = _Timer(items)
+    started = time.perf_counter()
+    error = False
+    try:
+        yield timer
+    except BaseException:
+        error = True
+        raise
+    finally:
+        record(
+            name, time.perf_counter() - started, timer.items,
+            timer.prompt_tokens, timer.completion_tokens, error=error,
+        )
+
+
+def snapshot():
+    with _lock:
+        metrics = {name: dict(m) for name, m in sorted(_metrics.items())}
+    for m in metrics.values():
+        m["items_per_s"] = m["items"] / m["wall_s"] if m["wall_s"] > 0 and m["items"] else None
+    return metrics
+
+
+def reset():
+    with _lock:
+        _metrics.clear()
+
+
+def _merge(target, source):
+    for name, m in source.items():
+        t = target.setdefault(name, _empty())
+        for key in ("calls", "errors", "wall_s", "items", "prompt_tokens", "completion_tokens"):
+            t[key] += m.get(key, 0)
+        t["max_s"] = max(t["max_s"], m.get("max_s", 0.0))
+        t["peak_rss_mb"] = max(t["peak_rss_mb"], m.get("peak_rss_mb", 0.0))
+
+
+def _partial_path(label, directory=RUNS_DIR):
+    return os.path.join(directory, f"{run_id()}.{label}.partial.json")
+
+
+# Called by a separate process before it exits so its metrics reach the run report
+def flush_partial(label, directory=RUNS_DIR):
+    if RUN_ID_ENV not in os.environ:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    path = _partial_path(label, directory)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot(), f)
+    return path
+
+
+def _collect_partials(directory):
+    merged = {}
+    prefix = f"{run_id()}."
+    if not os.path.isdir(directory):
+        return merged
+    for name in sorted(os.listdir(directory)):
+        if name.startswith(prefix) and name.endswith(".partial.json"):
+            path = os.path.join(directory, name)
+            with open(path, encoding="utf-8") as f:
+                _merge(merged, json.load(f))
+            os.remove(path)
+    return merged
+
+
+def build_report(stages=None, directory=RUNS_DIR):
+    metrics = snapshot()
+    children = _collect_partials(directory)
+    if children:
+        _merge(metrics, children)
+        for m in metrics.values():
+            m["items_per_s"] = m["items"] / m["wall_s"] if m["wall_s"] > 0 and m["items"] else None
+
+    finished_at = time.time()
+    return {
+        "run_id": run_id(),
+        "started_at": _started_at,
+        "finished_at": finished_at,
+        "wall_s": finished_at - _started_at,
+        "host": socket.gethostname(),
+        "python": platform.python_version(),
+        "argv": sys.argv,
+        "peak_rss_mb": {"self": peak_rss_mb(), "children": peak_rss_mb(children=True)},
+        "stages": stages or {},
+        "metrics": metrics,
+    }
+
+
+def _atomic_write(path, text):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def write_report(report, path=None):
+    path = path or os.path.join(RUNS_DIR, f"{report['run_id']}.json")
+    _atomic_write(path, json.dumps(report, ensure_ascii=False, indent=2))
+    return path
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Prometheus text exposition format, for node_exporter's textfile collector
+def to_prometheus(report):
+    series = [
+        ("calls_total", "counter", "Calls per instrumented operation", "calls"),
+        ("errors_total", "counter", "Failed calls per instrumented operation", "errors"),
+        ("wall_seconds_total", "counter", "Wall time spent per instrumented operation", "wall_s"),
+        ("max_seconds", "gauge", "Slowest single call per instrumented operation", "max_s"),
+        ("items_total", "counter", "Items processed per instrumented operation", "items"),
+        ("peak_rss_megabytes", "gauge", "Peak RSS seen at the end of the operation", "peak_rss_mb"),
+    ]
+    lines = []
+    for suffix, kind, help_text, key in series:
+        metric = f"{PROM_PREFIX}_op_{suffix}"
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        for name, m in report["metrics"].items():
+            lines.append(f'{metric}{{op="{_label(name)}"}} {m[key]}')
+
+    metric = f"{PROM_PREFIX}_llm_tokens_total"
+    lines += [f"# HELP {metric} LLM tokens per instrumented operation", f"# TYPE {metric} counter"]
+    for name, m in report["metrics"].items():
+        if m["prompt_tokens"] or m["completion_tokens"]:
+            lines.append(f'{metric}{{op="{_label(name)}",kind="prompt"}} {m["prompt_tokens"]}')
+            lines.append(f'{metric}{{op="{_label(name)}",kind="completion"}} {m["completion_tokens"]}')
+
+    metric = f"{PROM_PREFIX}_stage_ok"
+    lines += [f"# HELP {metric} 1 if the stage ran or was skipped as fresh, 0 otherwise", f"# TYPE {metric} gauge"]
+    for name, status in report["stages"].items():
+        lines.append(f'{metric}{{stage="{_label(name)}",status="{_label(status)}"}} '
+                     f'{int(status in ("done", "skipped"))}')
+
+    lines += [
+        f"# HELP {PROM_PREFIX}_run_wall_seconds Wall time of the whole run",
+        f"# TYPE {PROM_PREFIX}_run_wall_seconds gauge",
+        f"{PROM_PREFIX}_run_wall_seconds {report['wall_s']}",
+        f"# HELP {PROM_PREFIX}_run_peak_rss_megabytes Peak RSS of the run and of its largest child process",
+        f"# TYPE {PROM_PREFIX}_run_peak_rss_megabytes gauge",
+    ]
+    # Left out where the platform does not report it
+    lines += [
+        f'{PROM_PREFIX}_run_peak_rss_megabytes{{process="{process}"}} {peak}'
+        for process, peak in report["peak_rss_mb"].items() if peak is not None
+    ]
+    lines += [
+        f"# HELP {PROM_PREFIX}_run_finished_timestamp_seconds When the run finished",
+        f"# TYPE {PROM_PREFIX}_run_finished_timestamp_seconds gauge",
+        f"{PROM_PREFIX}_run_finished_timestamp_seconds {report['finished_at']}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(report, path):
+    _atomic_write(path, to_prometheus(report))
+    return path
@@ -0,0 +1,173 @@
+# pipeline.py
+# A small stage scheduler. Stages declare what they read and what they
+# write; a stage whose inputs hash to the same fingerprint as on its last
+# successful run is skipped, and stages that do not depend on each other
+# run at the same time.
+
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from utils import perf
+from utils.db_utils import get_connection
+
+
+# === Inputs ===
+# Each input is a callable that feeds its current state into a hash.
+
+def query(sql, params=()):
+    # Rows of a query against the store, streamed so large tables are not held in memory
+    def feed(digest):
+        for row in get_connection().execute(sql, params):
+            digest.update(repr(row).encode("utf-8"))
+    feed.label = sql
+    return feed
+
+
+def file(path):
+    def feed(digest):
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+        else:
+            digest.update(b"<missing>")
+    feed.label = path
+    return feed
+
+
+def value(obj):
+    # Settings that change a stage's result (model, backend, thresholds)
+    def feed(digest):
+        digest.update(repr(obj).encode("utf-8"))
+    feed.label = repr(obj)
+    return feed
+
+
+class Stage:
+    def __init__(self, name, run, after=(), inputs=None, outputs=(), groups=()):
+        self.name = name
+        # Returning counts as success and records the fingerprint; a stage
+        # that could not do all of its work must raise
+        self.run = run
+        # Stages that must finish first when they are part of the same run
+        self.after = tuple(after)
+        # None means the stage reads something we cannot fingerprint (a website)
+        # and always runs
+        self.inputs = inputs
+        # Files the stage writes; a missing one forces a rerun
+        self.outputs = tuple(outputs)
+        # Names that select several stages at once (--stages scrape)
+        self.groups = tuple(groups)
+
+    def fingerprint(self):
+        if self.inputs is None:
+            return None
+        digest = hashlib.sha256(self.name.encode("utf-8"))
+        for feed in self.inputs:
+            digest.update(b"\x00")
+            feed(digest)
+        return digest.hexdigest()
+
+
+class Pipeline:
+    def __init__(self, stages, concurrency=4):
+        self.stages = {stage.name: stage for stage in stages}
+        self.concurrency = concurrency
+        # Outcome of every stage in the last run: done, skipped, failed or blocked
+        self.status = {}
+        for stage in stages:
+            unknown = [name for name in stage.after if name not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages: {', '.join(unknown)}")
+
+    # Turn stage and group names into stage names, in declaration order
+    def resolve(self, names):
+        wanted = set()
+        for name in names:
+            matches = [s.name for s in self.stages.values() if name == s.name or name in s.groups]
+            if not matches:
+                raise ValueError(f"Unknown stage {name!r}; choose from {', '.join(self.names())}")
+            wanted.update(matches)
+        return [name for name in self.stages if name in wanted]
+
+    def names(self):
+        groups = {g for s in self.stages.values() for g in s.groups}
+        return list(self.stages) + sorted(groups)
+
+    def is_fresh(self, stage, fingerprint):
+        if fingerprint is None:
+            return False
+        if any(not os.path.exists(path) for path in stage.outputs):
+            return False
+        row = get_connection().execute(
+            "SELECT fingerprint FROM stage_state WHERE stage = ?", (stage.name,)
+        ).fetchone()
+        return row is not None and row[0] == fingerprint
+
+    def record(self, stage, fingerprint, started):
+        # The fingerprint is the one taken before the run, so rows that arrive
+        # while the stage works still make it stale next time
+        conn = get_connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO stage_state (stage, fingerprint, finished_at, duration) VALUES (?, ?, ?, ?)",
+            (stage.name, fingerprint, time.time(), time.time() - started),
+        )
+        conn.commit()
+
+    def _execute(self, stage, force):
+        fingerprint = stage.fingerprint()
+        if not force and self.is_fresh(stage, fingerprint):
+            print(f"⏭️  {stage.name}: inputs unchanged, skipping")
+            perf.count(f"stage.{stage.name}.skipped")
+            return "skipped"
+        print(f"▶️  {stage.name}")
+        started = time.time()
+        with perf.timed(f"stage.{stage.name}"):
+            stage.run()
+        if fingerprint is not None:
+            self.record(stage, fingerprint, started)
+        print(f"✅ {stage.name} finished in {time.time() - started:.1f}s")
+        return "done"
+
+    # Run the selected stages. Dependencies outside the selection are assumed
+    # to be up to date, which is what makes `--stages report` cheap.
+    def run(self, names, force=False):
+        selected = [name for name in self.stages if name in set(names)]
+        waiting = {name: {d for d in self.stages[name].after if d in selected} for name in selected}
+        status = self.status = {}
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=max(1, self.concurrency)) as pool:
+            while waiting or running:
+                for name in [n for n, deps in waiting.items() if not deps]:
+                    del waiting[name]
+                    running[pool.submit(self._execute, self.stages[name], force)] = name
+
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        status[name] = future.result()
+                    except Exception as e:
+                        print(f"❌ {name} failed: {e}")
+                        status[name] = "failed"
+                        # Everything downstream of a failure is left alone
+                        self._block_dependents(name, waiting, status)
+                    for deps in waiting.values():
+                        deps.discard(name)
+
+        failed = [name for name, s in status.items() if s in ("failed", "blocked")]
+        if failed:
+            raise RuntimeError(f"Pipeline stages did not complete: {', '.join(failed)}")
+        return status
+
+    def _block_dependents(self, name, waiting, status):
+        for other, deps in list(waiting.items()):
+            if name in deps and other in waiting:
+                del waiting[other]
+                status[other] = "blocked"
+                self._block_dependents(other, waiting, status)
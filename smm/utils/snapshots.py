@@ -0,0 +1,95 @@
+# snapshots.py
+# Columnar snapshots of analysis DataFrames. Each snapshot is a Parquet
+# dataset partitioned by source and scrape date:
+#
+#   data/snapshots/comments/source=gazeta/scrape_date=2025-07-01/part-0.parquet
+#
+# Readers can pick columns and partitions without loading the rest, e.g.
+#
+#   pd.read_parquet("data/snapshots/comments", columns=["comment", "sentiment"],
+#                   filters=[("source", "=", "instagram")])
+
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNAPSHOT_DIR = os.path.join(BASE_DIR, "data", "snapshots")
+PARTITIONS = ["source", "scrape_date"]
+UNKNOWN_DATE = "unknown"
+# Low-cardinality text columns stored dictionary-encoded
+CATEGORICAL = {"sentiment", "mood", "dominant_sentiment", "true_sentiment", "emotion", "account_name"}
+
+
+def snapshot_path(name, directory=SNAPSHOT_DIR):
+    return os.path.join(directory, name)
+
+
+def compact(df):
+    # Smallest dtypes that hold the data: categories for labels, 32-bit
+    # numbers for counts and probabilities
+    df = df.copy()
+    for column in df.columns:
+        series = df[column]
+        if column in CATEGORICAL and series.dtype == object:
+            df[column] = series.astype("category")
+        elif pd.api.types.is_integer_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            low, high = (series.min(), series.max()) if len(series) else (0, 0)
+            if -2**31 <= low and high < 2**31:
+                df[column] = series.astype("int32")
+        elif pd.api.types.is_float_dtype(series):
+            df[column] = series.astype("float32")
+    return df
+
+
+def _with_partitions(df):
+    df = compact(df)
+    for column in PARTITIONS:
+        fallback = UNKNOWN_DATE if column == "scrape_date" else "unknown"
+        values = df[column] if column in df.columns else pd.Series(fallback, index=df.index)
+        df[column] = values.astype("string").fillna(fallback)
+    return df
+
+
+# Writes a snapshot one chunk at a time. The first chunk to reach a partition
+# replaces what the last run left there; later chunks add files next to it.
+# Partitions no chunk touches are kept.
+class SnapshotWriter:
+    def __init__(self, name, directory=SNAPSHOT_DIR):
+        self.path = snapshot_path(name, directory)
+        self.written = set()
+        self.chunks = 0
+
+    def write(self, df):
+        df = _with_partitions(df)
+        keys = pd.MultiIndex.from_frame(df[PARTITIONS])
+        seen = keys.isin(list(self.written))
+        for part, behavior in ((df[~seen], "delete_matching"), (df[seen], "overwrite_or_ignore")):
+            if len(part):
+                ds.write_dataset(
+                    pa.Table.from_pandas(part, preserve_index=False), self.path, format="parquet",
+                    partitioning=PARTITIONS, partitioning_flavor="hive", existing_data_behavior=behavior,
+                    basename_template=f"part-{self.chunks}-{{i}}.parquet",
+                )
+        self.written.update(keys)
+        self.chunks += 1
+        return self.path
+
+
+# Write df as the named snapshot. Partitions present in df replace the same
+# partitions on disk; other dates and sources are kept.
+def write_snapshot(df, name, directory=SNAPSHOT_DIR):
+    return SnapshotWriter(name, directory).write(df)
+
+
+# Load a snapshot, reading only the requested columns and the partitions
+# that match `where` (e.g. {"source": "instagram"}).
+def read_snapshot(name, columns=None, where=None, directory=SNAPSHOT_DIR):
+    dataset = ds.dataset(snapshot_path(name, directory), format="parquet", partitioning="hive")
+    expression = None
+    for column, value in (where or {}).items():
+        term = ds.field(column) == value
+        expression = term if expression is None else expression & term
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()